@@ -0,0 +1,86 @@
+import os
+import time
+import random
+
+import numpy as np
+
+from fastapi_gpt5_backend import extract_detector_features, ParsedDocument, _FEATURE_CACHE
+
+BENCH_SIZES = [int(x) for x in os.getenv("BENCH_SIZES", "500,1000,3000,5000").split(",") if x.strip()]
+BENCH_REPEATS = int(os.getenv("BENCH_REPEATS", "10"))
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+
+SAMPLE_SENTENCES = [
+    "It is important to note that technology plays a crucial role in today's world.",
+    "I remember when I was a kid, we didn't have phones at the dinner table.",
+    "However, the data suggests a more complicated picture than most reports admit.",
+    "Moreover, a wide range of factors might affect the final outcome.",
+    "Honestly, I think it's fine.",
+    "Why would anyone design a system that way?",
+    "The results (see Table 3) were significant at the 5% level.",
+    "Well, you know, it's kind of complicated...",
+    "In conclusion, this highlights the need for further research.",
+    "Nairobi's 2024 budget grew by 12% compared to the previous year.",
+    "We are not sure; they are, however, confident about the timeline.",
+    "Short one.",
+]
+
+
+def build_document(n_words: int, seed: int) -> str:
+    """Synthetic essay of roughly `n_words` words split into paragraphs."""
+    rng = random.Random(seed)
+    paras = []
+    words = 0
+    while words < n_words:
+        para = []
+        for _ in range(rng.randint(3, 7)):
+            s = rng.choice(SAMPLE_SENTENCES)
+            para.append(s)
+            words += len(s.split())
+        paras.append(" ".join(para))
+    return "\n\n".join(paras)
+
+
+def time_call(fn, text: str, repeats: int) -> np.ndarray:
+    fn(text)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(text)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    return np.array(timings, dtype=np.float64)
+
+
+def extract_uncached(text: str):
+    # time the real work, not a feature cache hit
+    _FEATURE_CACHE.clear()
+    return extract_detector_features(text)
+
+
+def main():
+    print("====================================")
+    print("Detector feature extraction benchmark")
+    print(f"Repeats per size: {BENCH_REPEATS}")
+    print("====================================")
+    print(f"{'words':>8} {'chars':>8} {'parse ms':>10} {'extract ms':>11} {'p95 ms':>9} {'words/s':>10}")
+
+    for n_words in BENCH_SIZES:
+        text = build_document(n_words, BENCH_SEED)
+        parse_ms = time_call(ParsedDocument, text, BENCH_REPEATS)
+        extract_ms = time_call(extract_uncached, text, BENCH_REPEATS)
+
+        actual_words = len(ParsedDocument(text).words)
+        p50 = float(np.median(extract_ms))
+        p95 = float(np.percentile(extract_ms, 95))
+        rate = actual_words / (p50 / 1000.0) if p50 else 0.0
+
+        print(
+            f"{actual_words:>8} {len(text):>8} {np.median(parse_ms):>10.2f} "
+            f"{p50:>11.2f} {p95:>9.2f} {rate:>10.0f}"
+        )
+
+    print("====================================")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+import json
+import glob
+
+from fastapi_gpt5_backend import LANG_NAMES, LANG_PROFILE_SIZE, char_trigram_counts
+
+SAMPLES_DIR = os.getenv("LANG_SAMPLES_DIR", "lang_samples")  # one <iso code>.txt per language
+OUT_PATH = os.getenv("LANG_PROFILES_PATH", "lang_profiles.json")
+
+
+def main():
+    paths = sorted(glob.glob(os.path.join(SAMPLES_DIR, "*.txt")))
+    if not paths:
+        print(f"No samples found in {SAMPLES_DIR}")
+        sys.exit(1)
+
+    print("====================================")
+    print("Building language profiles")
+    print("====================================")
+
+    profiles = {}
+    for path in paths:
+        code = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            counts = char_trigram_counts(f.read())
+        top = counts.most_common(LANG_PROFILE_SIZE)
+        profiles[code] = {gram: n for gram, n in top}
+        print(f"{code:>4} {LANG_NAMES.get(code, '?'):<12} {sum(counts.values()):>7} trigrams, kept {len(top)}")
+
+    with open(OUT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "ngram": 3, "size": LANG_PROFILE_SIZE, "profiles": profiles}, f, ensure_ascii=False, separators=(",", ":"))
+
+    print("====================================")
+    print(f"Wrote {len(profiles)} profiles to {OUT_PATH} ({os.path.getsize(OUT_PATH) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
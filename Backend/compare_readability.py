@@ -0,0 +1,79 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+from fastapi_gpt5_backend import ParsedDocument, readability_scores
+from bench_detector_features import SAMPLE_SENTENCES, build_document
+
+DATA_PATH = os.getenv("DETECT_DATA_PATH", "detector_data/detector_data.jsonl")
+MAX_ROWS = int(os.getenv("READABILITY_MAX_ROWS", "500"))
+MIN_TEXT_CHARS = int(os.getenv("DETECT_MIN_TEXT_CHARS", "80"))
+
+# Mean absolute difference allowed against textstat before the check fails
+MAX_MEAN_FK_DIFF = float(os.getenv("READABILITY_MAX_MEAN_FK_DIFF", "1.0"))
+MAX_MEAN_FLESCH_DIFF = float(os.getenv("READABILITY_MAX_MEAN_FLESCH_DIFF", "8.0"))
+
+
+def load_texts():
+    texts = []
+    if os.path.exists(DATA_PATH):
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    text = str(json.loads(line).get("text", ""))
+                except Exception:
+                    continue
+                if len(text.strip()) >= MIN_TEXT_CHARS:
+                    texts.append(text)
+                if len(texts) >= MAX_ROWS:
+                    break
+
+    if not texts:
+        print(f"No data at {DATA_PATH}; using synthetic samples.")
+        texts = list(SAMPLE_SENTENCES)
+        texts += [build_document(n, seed) for seed in range(20) for n in (60, 250, 800)]
+    return texts
+
+
+def main():
+    try:
+        import textstat
+    except Exception:
+        print("textstat is not installed (pip install -r requirements-dev.txt); nothing to compare against.")
+        sys.exit(1)
+
+    texts = load_texts()
+    fk_diff = []
+    flesch_diff = []
+
+    for text in texts:
+        doc = ParsedDocument(text)
+        fk, flesch = readability_scores(doc.words, doc.sentence_word_counts())
+        fk_diff.append(abs(fk - textstat.flesch_kincaid_grade(doc.raw)))
+        flesch_diff.append(abs(flesch - textstat.flesch_reading_ease(doc.raw)))
+
+    fk_diff = np.array(fk_diff)
+    flesch_diff = np.array(flesch_diff)
+
+    print("====================================")
+    print("Readability parity vs textstat")
+    print(f"Texts: {len(texts)}")
+    print("====================================")
+    print(f"{'score':>8} {'mean |d|':>10} {'p95 |d|':>10} {'max |d|':>10}")
+    for name, d in (("fk_grade", fk_diff), ("flesch", flesch_diff)):
+        print(f"{name:>8} {d.mean():>10.2f} {np.percentile(d, 95):>10.2f} {d.max():>10.2f}")
+    print("====================================")
+
+    if fk_diff.mean() > MAX_MEAN_FK_DIFF or flesch_diff.mean() > MAX_MEAN_FLESCH_DIFF:
+        print("FAIL: native readability drifted too far from textstat.")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Offline stand-in for the OpenAI chat completions API, for load tests.
+# Run:   python fake_openai_server.py
+# Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+
+FAKE_OPENAI_PORT = int(os.getenv("FAKE_OPENAI_PORT", "8900"))
+
+# Median latency per kind of call (ms); actual latency is lognormal around it.
+FAKE_OPENAI_LATENCY_MS = os.getenv(
+    "FAKE_OPENAI_LATENCY_MS",
+    "judge=1800,structural=900,tiebreak=600,language=300,translate=1500,humanize=4000,chat=800",
+)
+FAKE_OPENAI_LATENCY_SIGMA = float(os.getenv("FAKE_OPENAI_LATENCY_SIGMA", "0.35"))
+FAKE_OPENAI_429_RATE = float(os.getenv("FAKE_OPENAI_429_RATE", "0.0"))  # share of calls answered with 429
+FAKE_OPENAI_RETRY_AFTER = os.getenv("FAKE_OPENAI_RETRY_AFTER", "1")
+FAKE_OPENAI_STREAM_CHUNKS = int(os.getenv("FAKE_OPENAI_STREAM_CHUNKS", "20"))
+
+LATENCY_MS = {}
+for item in FAKE_OPENAI_LATENCY_MS.split(","):
+    if "=" in item:
+        kind, _, ms = item.partition("=")
+        LATENCY_MS[kind.strip()] = float(ms)
+
+SENT_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+app = FastAPI(title="Fake OpenAI", version="0.1")
+
+stats = {"requests": 0, "rate_limited": 0, "by_kind": {}}
+
+
+def message_text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def classify(messages: list) -> str:
+    system = message_text(messages[0]) if messages and messages[0].get("role") == "system" else ""
+    user = message_text(messages[-1]) if messages else ""
+    if "forensic linguist" in system:
+        return "judge"
+    if "structural writing analyst" in system:
+        return "structural"
+    if "final decisive ruling" in system:
+        return "tiebreak"
+    if "Detect the language" in system:
+        return "language"
+    if "human writing simulator" in system:
+        return "humanize"
+    if "Translate the following English linguistic signal sets" in user:
+        return "translate"
+    return "chat"
+
+
+def text_seed(text: str) -> random.Random:
+    # same text -> same verdict, so repeated requests look like a real judge
+    return random.Random(hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest())
+
+
+def strip_quotes(text: str) -> str:
+    return text.strip().strip('"').strip()
+
+
+def judge_reply(text: str) -> dict:
+    rng = text_seed(text)
+    p = round(rng.uniform(0.05, 0.95), 3)
+    sentences = [s for s in SENT_SPLIT_RE.split(text.strip()) if s.strip()]
+    return {
+        "document_ai_probability": p,
+        "confidence": rng.choice(["low", "medium", "high"]),
+        "classification": "AI_ONLY" if p >= 0.7 else ("HUMAN_ONLY" if p <= 0.3 else "MIXED"),
+        "reasoning": "Offline judge: canned verdict.",
+        "signals": {
+            "token_predictability": round(rng.random(), 3),
+            "rhythm_uniformity": round(rng.random(), 3),
+            "structural_perfection": round(rng.random(), 3),
+            "lexical_genericness": round(rng.random(), 3),
+            "ai_transition_density": round(rng.random(), 3),
+            "semantic_specificity": round(rng.random(), 3),
+        },
+        "sentences": [
+            {"text": " ".join(s.split()[:8]), "ai_prob": round(min(max(p + rng.uniform(-0.2, 0.2), 0.0), 1.0), 3)}
+            for s in sentences[:60]
+        ],
+    }
+
+
+def structural_reply(text: str) -> dict:
+    rng = text_seed("structural" + text)
+    return {
+        "structural_ai_probability": round(rng.uniform(0.05, 0.95), 3),
+        "transition_word_count": rng.randint(0, 8),
+        "hedging_word_count": rng.randint(0, 6),
+        "rhythm_uniformity": round(rng.random(), 3),
+        "has_human_quirks": rng.random() < 0.5,
+        "is_generic": rng.random() < 0.5,
+        "structural_reasoning": "Offline judge: canned structure read.",
+    }
+
+
+def tiebreak_reply(text: str) -> dict:
+    rng = text_seed("tiebreak" + text)
+    return {"final_ai_probability": round(rng.uniform(0.05, 0.95), 3), "decisive_signal": "Offline tiebreak."}
+
+
+def language_reply(text: str) -> dict:
+    letters = [c for c in text if c.isalpha()]
+    ascii_share = sum(1 for c in letters if c.isascii()) / len(letters) if letters else 1.0
+    if ascii_share >= 0.5:
+        return {"language": "English", "code": "en", "is_english": True}
+    return {"language": "Other", "code": "xx", "is_english": False}
+
+
+def translate_reply(prompt: str) -> dict:
+    # echo the English template from the prompt back as the "translation"
+    start, end = prompt.find("{"), prompt.rfind("}")
+    try:
+        return json.loads(prompt[start:end + 1])
+    except Exception:
+        return {}
+
+
+def humanize_reply(text: str) -> str:
+    text = strip_quotes(text)
+    return text.replace("It is", "It's").replace("do not", "don't").replace("Moreover, ", "Also, ")
+
+
+def chat_reply(text: str) -> str:
+    words = text.split()
+    return "Offline reply to: " + " ".join(words[:40]) + (" ..." if len(words) > 40 else "")
+
+
+def build_reply(kind: str, messages: list) -> str:
+    user = message_text(messages[-1]) if messages else ""
+    if kind == "judge":
+        return json.dumps(judge_reply(user))
+    if kind == "structural":
+        return json.dumps(structural_reply(user))
+    if kind == "tiebreak":
+        return json.dumps(tiebreak_reply(user))
+    if kind == "language":
+        return json.dumps(language_reply(user))
+    if kind == "translate":
+        return json.dumps(translate_reply(user))
+    if kind == "humanize":
+        return humanize_reply(user)
+    return chat_reply(user)
+
+
+def sample_latency(kind: str) -> float:
+    median = LATENCY_MS.get(kind, LATENCY_MS.get("chat", 800.0))
+    return median * random.lognormvariate(0.0, FAKE_OPENAI_LATENCY_SIGMA) / 1000.0
+
+
+def usage(messages: list, reply: str) -> dict:
+    prompt_tokens = sum(len(message_text(m)) for m in messages) // 4
+    completion_tokens = len(reply) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages") or []
+    model = body.get("model", "fake")
+    kind = classify(messages)
+
+    stats["requests"] += 1
+    stats["by_kind"][kind] = stats["by_kind"].get(kind, 0) + 1
+
+    if random.random() < FAKE_OPENAI_429_RATE:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": FAKE_OPENAI_RETRY_AFTER},
+            content={"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+        )
+
+    reply = build_reply(kind, messages)
+    delay = sample_latency(kind)
+    completion_id = "chatcmpl-" + uuid.uuid4().hex[:24]
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def event_stream():
+            words = reply.split(" ")
+            n = max(1, min(FAKE_OPENAI_STREAM_CHUNKS, len(words)))
+            step = -(-len(words) // n)
+            for i in range(0, len(words), step):
+                await asyncio.sleep(delay / n)
+                piece = " ".join(words[i:i + step]) + (" " if i + step < len(words) else "")
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            done = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    await asyncio.sleep(delay)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        "usage": usage(messages, reply),
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="127.0.0.1", port=FAKE_OPENAI_PORT, log_level="warning")
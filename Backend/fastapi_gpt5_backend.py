@@ -23,6 +23,9 @@ import math
 from typing import Tuple
 import hmac
 import hashlib
+import heapq
+import itertools
+import multiprocessing
 import requests
 from datetime import datetime, timezone
 from email.mime.multipart import MIMEMultipart
@@ -30,7 +33,16 @@ from email.mime.text import MIMEText
 from fastapi import Header
 from firebase_admin import auth as firebase_auth
 from typing import Dict, List, Optional
+from collections import Counter, deque, OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cached_property, lru_cache
 import smtplib
+import sqlite3
+import sys
+import threading
+import time
 
 
 
@@ -85,12 +97,6 @@ try:
 except Exception:
     joblib = None
 
-# Optional readability library
-try:
-    import textstat
-except Exception:
-    textstat = None
-    
 # -------------------- Configuration --------------------
 
 SMTP_HOST = os.getenv("SMTP_HOST", "")
@@ -102,13 +108,16 @@ SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL", SMTP_USER)
 
 API_MODEL = os.getenv("OPENAI_MODEL", "gpt-5-nano")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # e.g. fake_openai_server.py for offline load tests
 FRONTEND_DIR = os.getenv("FRONTEND_DIR", "../Frontend")  # relative path from backend folder
 
 # Hybrid behavior
 DETECT_GPT_MODEL = os.getenv("DETECT_GPT_MODEL", "gpt-4.1")
-DETECT_USE_GPT = os.getenv("DETECT_USE_GPT", "always")
+DETECT_USE_GPT = os.getenv("DETECT_USE_GPT", "always")  # always | cascade | never
 DETECT_UNCERTAIN_LOW = float(os.getenv("DETECT_UNCERTAIN_LOW", "0.40"))
 DETECT_UNCERTAIN_HIGH = float(os.getenv("DETECT_UNCERTAIN_HIGH", "0.60"))
+DETECT_MAX_SENTENCES = int(os.getenv("DETECT_MAX_SENTENCES", "1000"))  # sentences scored per detect response
+DETECT_MAX_LATENCY_MS = int(os.getenv("DETECT_MAX_LATENCY_MS", "0"))  # default budget when a request sets none; 0 = wait for the judge
 DETECTOR_MODEL_PATH = os.getenv("DETECTOR_MODEL_PATH", "detector_artifacts/detector_lr.joblib")
 DETECTOR_VECTORS_PATH = os.getenv("DETECTOR_VECTORS_PATH", "detector_artifacts/feature_meta.joblib")
 
@@ -248,8 +257,9 @@ logger = logging.getLogger("fastapi_gpt5_backend")
 if not OPENAI_API_KEY:
     logger.warning("OPENAI_API_KEY is not set. Set it in your environment or in .env before running.")
 
-from openai import AsyncOpenAI
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+# Retries are done by OPENAI_SCHEDULER so that a backing-off call does not hold a slot.
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL, max_retries=0)
 
 # -------------------- FastAPI app --------------------
 app = FastAPI(title="GPT-5 Nano Proxy API", version="0.1")
@@ -704,40 +714,87 @@ def build_tone_instruction(tone: str) -> str:
     return "\nTone Focus: Keep it natural, clear, and human."
 
 
+_WORD_RE = re.compile(r"[A-Za-z0-9]+(?:'[A-Za-z0-9]+)?")
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+_PARA_SPLIT_RE = re.compile(r"\n\s*\n+")
+
 def _simple_sentence_split(text: str) -> List[str]:
     text = (text or "").strip()
     if not text:
         return []
-    parts = re.split(r'(?<=[.!?])\s+|\n+', text)
+    parts = _SENT_SPLIT_RE.split(text)
     sents = [p.strip() for p in parts if p and p.strip()]
     return sents if sents else [text]
 
 def _tokenize_words(text: str) -> List[str]:
-    return re.findall(r"[A-Za-z0-9]+(?:'[A-Za-z0-9]+)?", (text or "").lower())
+    return _WORD_RE.findall((text or "").lower())
 
 def _safe_div(a: float, b: float) -> float:
     return float(a) / float(b) if b else 0.0
 
-def _shannon_entropy_from_char_ngrams(text: str, n: int = 3, max_len: int = 5000) -> float:
-    t = (text or "").strip()
-    if not t:
-        return 0.0
-    t = t[:max_len]
-    if len(t) < n:
+def _shannon_entropy_from_char_ngrams(text: str, n: int = 3) -> float:
+    return CharNgramEntropy((text or "").strip(), n=n).entropy()
+
+def _entropy_from_counts(counts: np.ndarray) -> float:
+    counts = counts[counts > 0]
+    total = counts.sum()
+    if not total:
         return 0.0
+    p = counts / total
+    return float(-(p * np.log2(p + 1e-12)).sum())
+
+
+class CharNgramEntropy:
+    """
+    Character n-gram entropy engine for one text.
 
-    counts = {}
-    total = 0
-    for i in range(len(t) - n + 1):
-        ng = t[i:i+n]
-        counts[ng] = counts.get(ng, 0) + 1
-        total += 1
+    The text is encoded once into an array of integer n-gram ids (code
+    points packed 21 bits apiece) and then into dense ids, so the entropy
+    of the whole text and of any slice of it are plain bincounts over the
+    same array. No length cap: long documents are measured in full.
+    """
 
-    ent = 0.0
-    for c in counts.values():
-        p = c / total
-        ent -= p * math.log(p + 1e-12, 2)
-    return ent
+    __slots__ = ("text", "n", "_dense")
+
+    def __init__(self, text: str, n: int = 3):
+        if n < 1 or n > 3:
+            raise ValueError("CharNgramEntropy supports n in 1..3")
+        self.text = text or ""
+        self.n = n
+
+        if len(self.text) < n:
+            self._dense = np.zeros(0, dtype=np.intp)
+            return
+
+        cp = np.frombuffer(self.text.encode("utf-32-le", "surrogatepass"), dtype="<u4").astype(np.uint64)
+        m = len(cp) - n + 1
+        ids = cp[:m].copy()
+        for k in range(1, n):
+            ids <<= np.uint64(21)
+            ids |= cp[k:k + m]
+        _, self._dense = np.unique(ids, return_inverse=True)
+
+    def entropy(self, start: int = 0, end: Optional[int] = None) -> float:
+        """Entropy of the n-grams lying wholly inside text[start:end]."""
+        end = len(self.text) if end is None else min(end, len(self.text))
+        stop = end - self.n + 1
+        if stop <= start:
+            return 0.0
+        return _entropy_from_counts(np.bincount(self._dense[start:stop]))
+
+    def chunk_entropies(self, chunk_size: int) -> List[float]:
+        """
+        Entropy of consecutive `chunk_size` slices, each stripped of
+        surrounding whitespace first (as if measured as a separate text).
+        """
+        out = []
+        t = self.text
+        for i in range(0, len(t), chunk_size):
+            chunk = t[i:i + chunk_size]
+            lead = len(chunk) - len(chunk.lstrip())
+            body = chunk.strip()
+            out.append(self.entropy(i + lead, i + lead + len(body)) if body else 0.0)
+        return out
 
 def _std(values: List[float]) -> float:
     if not values:
@@ -751,13 +808,6 @@ def _mean(values: List[float]) -> float:
     arr = np.array(values, dtype=np.float32)
     return float(np.mean(arr))
 
-def _count_phrase_hits(text_lower: str, phrases: set) -> int:
-    hits = 0
-    for p in phrases:
-        if p in text_lower:
-            hits += text_lower.count(p)
-    return hits
-
 def _jaccard_overlap(a_tokens: List[str], b_tokens: List[str]) -> float:
     a = set(a_tokens) - _BASIC_STOPWORDS
     b = set(b_tokens) - _BASIC_STOPWORDS
@@ -769,38 +819,543 @@ def _paragraph_split(text: str) -> List[str]:
     text = (text or "").strip()
     if not text:
         return []
-    paras = re.split(r"\n\s*\n+", text)
+    paras = _PARA_SPLIT_RE.split(text)
     paras = [p.strip() for p in paras if p and p.strip()]
     return paras if paras else [text]
 
+def _pack_paragraphs(text: str, max_chars: int) -> List[Tuple[str, bool]]:
+    """
+    Packs whole paragraphs into chunks of at most `max_chars`. A paragraph
+    that is too long on its own is packed sentence by sentence, and a single
+    oversized sentence is cut at the character limit. Returns
+    (chunk, continues_paragraph) pairs; the flag marks a chunk that carries
+    on the paragraph of the chunk before it, so reassembly joins the two
+    with a space instead of a paragraph break.
+    """
+    max_chars = max(1, max_chars)
+    chunks: List[Tuple[str, bool]] = []
+    current: List[str] = []
+    size = 0
+
+    for para in _paragraph_split(text):
+        if len(para) <= max_chars:
+            if current and size + 2 + len(para) > max_chars:
+                chunks.append(("\n\n".join(current), False))
+                current, size = [], 0
+            current.append(para)
+            size += len(para) + (2 if size else 0)
+            continue
+
+        if current:
+            chunks.append(("\n\n".join(current), False))
+            current, size = [], 0
+        part: List[str] = []
+        part_size = 0
+        continues = False
+        for sent in _simple_sentence_split(para) or [para]:
+            for piece in (sent[i:i + max_chars] for i in range(0, len(sent), max_chars)):
+                if part and part_size + 1 + len(piece) > max_chars:
+                    chunks.append((" ".join(part), continues))
+                    part, part_size, continues = [], 0, True
+                part.append(piece)
+                part_size += len(piece) + (1 if part_size else 0)
+        if part:
+            chunks.append((" ".join(part), continues))
+
+    if current:
+        chunks.append(("\n\n".join(current), False))
+    return chunks
+
 def sentence_drift_score(sentences):
-    if len(sentences) < 2:
+    return _sentence_drift_from_tokens([_tokenize_words(s) for s in sentences])
+
+def _sentence_drift_from_tokens(sent_tokens: List[List[str]]) -> float:
+    if len(sent_tokens) < 2:
         return 0.0
 
     overlaps = []
-    for i in range(len(sentences) - 1):
-        a = set(_tokenize_words(sentences[i]))
-        b = set(_tokenize_words(sentences[i + 1]))
+    for i in range(len(sent_tokens) - 1):
+        a = set(sent_tokens[i])
+        b = set(sent_tokens[i + 1])
         overlaps.append(len(a & b) / (len(a | b) + 1e-6))
 
     return 1.0 - _mean(overlaps) if overlaps else 0.0
 
+def _split_spans(text: str, pattern: re.Pattern) -> List[Tuple[int, int]]:
+    """
+    (start, end) offsets of the pieces `pattern.split(text)` would return,
+    after stripping and dropping empty pieces.
+    """
+    spans = []
+    pos = 0
+    for m in pattern.finditer(text):
+        _append_stripped_span(text, pos, m.start(), spans)
+        pos = m.end()
+    _append_stripped_span(text, pos, len(text), spans)
+    return spans
+
+def _append_stripped_span(text: str, start: int, end: int, spans: List[Tuple[int, int]]) -> None:
+    piece = text[start:end]
+    stripped = piece.strip()
+    if stripped:
+        lead = len(piece) - len(piece.lstrip())
+        spans.append((start + lead, start + lead + len(stripped)))
+
+
+class ParsedDocument:
+    """
+    Tokenized view of a document, built once per request.
+
+    Words are produced by a single regex pass over the lowercased text.
+    Sentences and paragraphs are kept as offset arrays into that word list
+    (and paragraphs additionally as offsets into the sentence list), so
+    every feature slices the same tokens instead of re-tokenizing.
+    """
+
+    __slots__ = (
+        "raw", "lower", "words", "word_starts", "sents", "paras",
+        "sent_offsets", "para_offsets", "para_sent_offsets",
+    )
+
+    def __init__(self, text: str):
+        raw = (text or "").strip()
+        lower = raw.lower()
+
+        self.raw = raw
+        self.lower = lower
+        self.sents = _simple_sentence_split(raw)
+        self.paras = _paragraph_split(raw)
+
+        words = []
+        starts = []
+        for m in _WORD_RE.finditer(lower):
+            words.append(m.group())
+            starts.append(m.start())
+        self.words = words
+        self.word_starts = np.asarray(starts, dtype=np.int64)
+
+        # Spans are taken on the lowercased text so they line up with word_starts.
+        # Lowercasing never touches whitespace or .!? so the pieces match the
+        # ones _simple_sentence_split/_paragraph_split return for `raw`.
+        sent_starts = np.asarray([a for a, _ in _split_spans(lower, _SENT_SPLIT_RE)], dtype=np.int64)
+        para_starts = np.asarray([a for a, _ in _split_spans(lower, _PARA_SPLIT_RE)], dtype=np.int64)
+
+        self.sent_offsets = np.append(np.searchsorted(self.word_starts, sent_starts), len(words))
+        self.para_offsets = np.append(np.searchsorted(self.word_starts, para_starts), len(words))
+        self.para_sent_offsets = np.append(np.searchsorted(sent_starts, para_starts), len(sent_starts))
+
+    @property
+    def n_sents(self) -> int:
+        return len(self.sent_offsets) - 1
+
+    def sentence_word_counts(self) -> List[int]:
+        return np.diff(self.sent_offsets).tolist()
+
+    def paragraph_word_counts(self) -> List[int]:
+        return np.diff(self.para_offsets).tolist()
+
+    def sentence_tokens(self) -> List[List[str]]:
+        words = self.words
+        offs = self.sent_offsets.tolist()
+        return [words[offs[i]:offs[i + 1]] for i in range(len(offs) - 1)]
+
+    def paragraph_sentence_ranges(self) -> List[Tuple[int, int]]:
+        offs = self.para_sent_offsets.tolist()
+        return [(offs[i], offs[i + 1]) for i in range(len(offs) - 1)]
+
+
+# ---- Readability ----
+
+# Flesch constants for English (same as textstat's default configuration)
+_FRE_BASE = 206.835
+_FRE_SENTENCE_LENGTH = 1.015
+_FRE_SYLL_PER_WORD = 84.6
+
+_VOWELS = "aeiouy"
+_VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+
+@lru_cache(maxsize=65536)
+def count_syllables(word: str) -> int:
+    """
+    Heuristic English syllable count for one lowercase word token:
+    vowel groups, minus a silent final -e / -ed / -es. Numbers and words
+    without vowels count as one syllable.
+    """
+    w = word.replace("'", "")
+    groups = len(_VOWEL_GROUP_RE.findall(w))
+    if groups <= 1:
+        return 1
+
+    if w[-1] == "e":
+        # "make", "whale" but not "table" or "free"
+        if w[-2] not in _VOWELS and not (w[-2] == "l" and w[-3] not in _VOWELS):
+            groups -= 1
+    elif w[-2:] == "ed" and len(w) > 3 and w[-3] not in _VOWELS:
+        # "jumped" but not "wanted" / "needed"
+        if w[-3] not in "td":
+            groups -= 1
+    elif w[-2:] == "es" and len(w) > 3 and w[-3] not in _VOWELS:
+        # "makes" but not "boxes" / "wishes" / "places"
+        if w[-3] not in "sxzcgh":
+            groups -= 1
+    return max(1, groups)
+
+
+def _legacy_round(number: float, points: int = 0) -> float:
+    # round half away from zero, the rounding textstat applies to its scores
+    p = 10 ** points
+    return float(math.floor((number * p) + math.copysign(0.5, number))) / p
+
+
+def readability_scores(words: List[str], sent_word_counts: List[int]) -> Tuple[float, float]:
+    """
+    (Flesch-Kincaid grade, Flesch reading ease) from already tokenized words.
+
+    Follows textstat's definitions: sentences of two words or fewer are not
+    counted, average sentence length and syllables per word are rounded to
+    one decimal before the formulas are applied.
+    """
+    n_words = len(words)
+    n_sents = max(1, sum(1 for c in sent_word_counts if c > 2))
+
+    syllables = 0
+    for w, c in Counter(words).items():
+        syllables += count_syllables(w) * c
+
+    asl = _legacy_round(n_words / n_sents, 1)
+    asw = _legacy_round(syllables / n_words, 1) if n_words else 0.0
+
+    fk_grade = _legacy_round(0.39 * asl + 11.8 * asw - 15.59, 1)
+    flesch = _legacy_round(_FRE_BASE - _FRE_SENTENCE_LENGTH * asl - _FRE_SYLL_PER_WORD * asw, 2)
+    return fk_grade, flesch
+
+
+# ---- Multi-phrase matching ----
+
+# Scripts written without spaces between words: phrases are matched per character
+_UNSPACED_LANGS = {"zh", "ja", "th", "lo", "km", "my"}
+
+_UNICODE_WORD_RE = re.compile(r"\w+(?:'\w+)*")
+
+def _tokenize_unicode_words(text: str) -> List[str]:
+    return _UNICODE_WORD_RE.findall((text or "").lower())
+
+def _tokenize_chars(text: str) -> List[str]:
+    return [c for c in (text or "").lower() if not c.isspace()]
+
+
+class PhraseMatcher:
+    """
+    Aho–Corasick automaton that counts several phrase sets in one pass.
+
+    Phrases are compiled over word tokens rather than characters, so a hit
+    always starts and ends on a word boundary ("thus" does not fire inside
+    "enthusiasm"). With tokenizer=None the matcher reads the detector's own
+    word tokens (ParsedDocument.words); translated signal sets pass a
+    Unicode-aware tokenizer, or a per-character one for unspaced scripts.
+    """
+
+    __slots__ = ("set_names", "tokenizer", "_goto", "_fail", "_emit")
+
+    def __init__(self, phrase_sets: Dict[str, Any], tokenizer=None):
+        self.set_names = tuple(phrase_sets)
+        self.tokenizer = tokenizer
+        tokenize = tokenizer or _tokenize_words
+
+        goto: List[Dict[str, int]] = [{}]
+        terminal: List[List[int]] = [[]]
+        phrase_ids: Dict[Tuple[str, ...], int] = {}
+        phrase_set_idx: List[List[int]] = []
+
+        for si, name in enumerate(self.set_names):
+            for phrase in phrase_sets[name] or ():
+                toks = tuple(tokenize(str(phrase)))
+                if not toks:
+                    continue
+                pid = phrase_ids.get(toks)
+                if pid is None:
+                    pid = len(phrase_set_idx)
+                    phrase_ids[toks] = pid
+                    phrase_set_idx.append([])
+                    node = 0
+                    for t in toks:
+                        nxt = goto[node].get(t)
+                        if nxt is None:
+                            nxt = len(goto)
+                            goto[node][t] = nxt
+                            goto.append({})
+                            terminal.append([])
+                        node = nxt
+                    terminal[node].append(pid)
+                if si not in phrase_set_idx[pid]:
+                    phrase_set_idx[pid].append(si)
+
+        # Failure links (BFS); each node also inherits its suffix's outputs
+        fail = [0] * len(goto)
+        emit: List[List[int]] = [
+            [si for pid in terminal[node] for si in phrase_set_idx[pid]]
+            for node in range(len(goto))
+        ]
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for t, nxt in goto[node].items():
+                f = fail[node]
+                while f and t not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(t, 0)
+                emit[nxt] = emit[nxt] + emit[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._emit = [tuple(e) for e in emit]
+
+    def count(self, tokens: List[str]) -> Dict[str, int]:
+        """Hits per phrase set over an already tokenized text."""
+        goto, fail, emit = self._goto, self._fail, self._emit
+        counts = [0] * len(self.set_names)
+        node = 0
+        for t in tokens:
+            while node and t not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(t, 0)
+            for si in emit[node]:
+                counts[si] += 1
+        return dict(zip(self.set_names, counts))
+
+    def count_text(self, text: str) -> Dict[str, int]:
+        return self.count((self.tokenizer or _tokenize_words)(text))
+
+    def count_document(self, doc: ParsedDocument) -> Dict[str, int]:
+        if self.tokenizer is None:
+            return self.count(doc.words)
+        return self.count(self.tokenizer(doc.lower))
+
+
+# ---- Language identification ----
+
+LANG_PROFILES_PATH = os.getenv("LANG_PROFILES_PATH", "lang_profiles.json")  # built by build_lang_profiles.py
+LANG_ID_MIN_CONFIDENCE = float(os.getenv("LANG_ID_MIN_CONFIDENCE", "0.35"))  # below this, ask GPT
+# mostly-ASCII text is English unless the identifier is this sure, on at
+# least this many letters, that it is another language; names and loanwords
+# sway the trigram profiles on short English text
+LANG_ID_OVERRIDE_CONFIDENCE = float(os.getenv("LANG_ID_OVERRIDE_CONFIDENCE", "0.60"))
+LANG_ID_OVERRIDE_MIN_LETTERS = int(os.getenv("LANG_ID_OVERRIDE_MIN_LETTERS", "120"))
+LANG_ID_SAMPLE_CHARS = 600
+LANG_PROFILE_SIZE = 300  # trigrams kept per language profile
+
+LANG_NAMES = {
+    "en": "English", "es": "Spanish", "fr": "French", "de": "German", "it": "Italian",
+    "pt": "Portuguese", "nl": "Dutch", "sv": "Swedish", "pl": "Polish", "tr": "Turkish",
+    "id": "Indonesian", "sw": "Swahili", "ro": "Romanian", "cs": "Czech", "ru": "Russian",
+    "uk": "Ukrainian", "el": "Greek", "he": "Hebrew", "ar": "Arabic", "fa": "Persian",
+    "ur": "Urdu", "hi": "Hindi", "th": "Thai", "ko": "Korean", "ja": "Japanese", "zh": "Chinese",
+}
+
+_LETTER_RUN_RE = re.compile(r"[^\W\d_]+")
+
+# (first, last code point, script); anything below 0x250 that is a letter is Latin
+_SCRIPT_RANGES = (
+    (0x0370, 0x03FF, "greek"),
+    (0x0400, 0x04FF, "cyrillic"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x1E00, 0x1EFF, "latin"),
+    (0x3040, 0x30FF, "kana"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xAC00, 0xD7AF, "hangul"),
+)
+_SINGLE_LANGUAGE_SCRIPTS = {
+    "greek": "el", "hebrew": "he", "devanagari": "hi", "thai": "th", "hangul": "ko", "kana": "ja",
+}
+
+
+def char_trigram_counts(text: str) -> Counter:
+    """Character trigrams of each lowercased letter run, padded with a space on both sides."""
+    # one pass over " w1  w2 ", then drop the grams that straddle two words
+    s = " " + "  ".join(_LETTER_RUN_RE.findall((text or "").lower())) + " "
+    counts = Counter(map("".join, zip(s, s[1:], s[2:])))
+    for gram in [g for g in counts if "  " in g]:
+        del counts[gram]
+    return counts
+
+
+def _char_script(c: str) -> Optional[str]:
+    cp = ord(c)
+    if cp < 0x0250:
+        return "latin"
+    for lo, hi, script in _SCRIPT_RANGES:
+        if lo <= cp <= hi:
+            return script
+    return None
+
+
+class LanguageIdentifier:
+    """
+    Local language identification for a text sample. Scripts used by a
+    single language (Greek, Hangul, kana, ...) decide on their own; Cyrillic,
+    Arabic and Han text is narrowed down by its distinctive letters; Latin
+    text is compared with the bundled character-trigram profiles by cosine
+    similarity, and confidence is the relative margin between the best and
+    the second-best profile, scaled down for very short samples.
+    """
+
+    # samples shorter than this many letters get proportionally less confidence
+    MIN_LETTERS = 40
+    MIN_LETTERS_SCRIPT = 10  # a script used by one language is unambiguous much sooner
+
+    def __init__(self, profiles: Dict[str, Dict[str, float]]):
+        self.profiles = sorted(code for code, grams in profiles.items() if grams)
+        vocab = sorted({g for code in self.profiles for g in profiles[code]})
+        self._vocab = {g: i for i, g in enumerate(vocab)}
+        # one L2-normalized row per language, so a dot product is the cosine
+        self._matrix = np.zeros((len(self.profiles), len(vocab)), dtype=np.float64)
+        for row, code in enumerate(self.profiles):
+            for g, weight in profiles[code].items():
+                self._matrix[row, self._vocab[g]] = weight
+        norms = np.linalg.norm(self._matrix, axis=1, keepdims=True)
+        self._matrix /= np.where(norms > 0, norms, 1.0)
+
+    @classmethod
+    def load(cls, path: str) -> "LanguageIdentifier":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data.get("profiles", {}))
+        except FileNotFoundError:
+            logger.warning(f"Language profiles not found at {path}; non-ASCII text will use GPT language detection.")
+        except Exception as e:
+            logger.warning(f"Could not load language profiles from {path}: {e}")
+        return cls({})
+
+    def identify(self, text: str) -> Tuple[Optional[str], float]:
+        """(ISO 639-1 code or None, confidence in [0, 1])."""
+        letters = [c for c in (text or "") if c.isalpha()]
+        if not letters:
+            return None, 0.0
+
+        scripts = Counter(_char_script(c) for c in letters)
+        if scripts.get("kana"):
+            # Japanese mixes kana with Han; a little kana is enough to tell it from Chinese
+            script, share = "kana", (scripts["kana"] + scripts.get("han", 0)) / len(letters)
+        else:
+            script, count = scripts.most_common(1)[0]
+            share = count / len(letters)
+        length_factor = min(1.0, len(letters) / self.MIN_LETTERS)
+        script_length_factor = min(1.0, len(letters) / self.MIN_LETTERS_SCRIPT)
+
+        if script in _SINGLE_LANGUAGE_SCRIPTS:
+            return _SINGLE_LANGUAGE_SCRIPTS[script], round(share * script_length_factor, 4)
+        if script == "han":
+            return "zh", round(share * script_length_factor, 4)
+        if script == "cyrillic":
+            code = "uk" if any(c in "іїєґ" for c in letters) else "ru"
+            return code, round(0.9 * share * length_factor, 4)
+        if script == "arabic":
+            if any(c in "ٹڈڑںے" for c in letters):
+                code = "ur"
+            elif any(c in "پچژگ" for c in letters):
+                code = "fa"
+            else:
+                code = "ar"
+            return code, round(0.9 * share * length_factor, 4)
+        if script != "latin" or not self.profiles:
+            return None, 0.0
+
+        counts = char_trigram_counts(text)
+        vec = np.zeros(self._matrix.shape[1], dtype=np.float64)
+        for g, n in counts.items():
+            i = self._vocab.get(g)
+            if i is not None:
+                vec[i] = n
+        text_norm = math.sqrt(sum(n * n for n in counts.values()))
+        scores = self._matrix @ vec / text_norm
+        order = np.argsort(scores)[::-1]
+        best = float(scores[order[0]])
+        second = float(scores[order[1]]) if len(order) > 1 else 0.0
+        if best <= 0.0:
+            return None, 0.0
+        margin = (best - second) / best
+        return self.profiles[order[0]], round(min(1.0, margin * 2.0) * share * length_factor, 4)
+
+
+LANGUAGE_ID = LanguageIdentifier.load(LANG_PROFILES_PATH)
+LANG_ID_STATS: Counter = Counter()  # how each request's language was decided
+
 
 # ---- Language detection + signal translation cache ----
 _LANG_SIGNAL_CACHE: Dict[str, Dict] = {}  # cache per language code
 
+# Translated signal sets are also kept as one JSON file per language, so
+# restarts and other workers on the host reuse them instead of paying for
+# the translation again. Bump the version when the translation prompt or
+# the set keys change; files from other versions are ignored.
+LANG_SIGNALS_DIR = os.getenv("LANG_SIGNALS_DIR", "cache/lang_signals")  # empty = memory only
+LANG_SIGNALS_VERSION = "1"
+
+_SIGNAL_SET_KEYS = (
+    "stopwords", "ai_transitions", "generic_phrases", "formal_words", "informal_words",
+    "hedge_words", "contractions", "first_person_specific", "self_ref_phrases", "tone_markers",
+)
+
 async def detect_language_and_translate_signals(text: str) -> Dict:
-    # Fast-path: detect English cheaply without an API call first
-    # Sample the first 200 chars — if it's mostly ASCII letters, assume English
-    sample = (text or "")[:200]
+    # Mostly-ASCII text is taken as English first; the bundled identifier
+    # only overrides that for a long sample it is sure is another language.
+    # Other text is identified locally, and GPT is only asked when the
+    # identifier is unsure.
+    sample = (text or "")[:LANG_ID_SAMPLE_CHARS]
+    if _mostly_ascii_letters(sample[:200]):
+        code, confidence = None, 0.0
+        if sum(1 for c in sample if c.isalpha()) >= LANG_ID_OVERRIDE_MIN_LETTERS:
+            code, confidence = LANGUAGE_ID.identify(sample)
+        if code not in (None, "en") and confidence >= LANG_ID_OVERRIDE_CONFIDENCE:
+            LANG_ID_STATS["local"] += 1
+            lang_data = {"language": LANG_NAMES.get(code, code), "code": code, "is_english": False}
+        else:
+            LANG_ID_STATS["ascii"] += 1
+            lang_data = {"is_english": True, "code": "en", "language": "English"}
+    else:
+        code, confidence = LANGUAGE_ID.identify(sample)
+        if code is not None and confidence >= LANG_ID_MIN_CONFIDENCE:
+            LANG_ID_STATS["local"] += 1
+            lang_data = {"language": LANG_NAMES.get(code, code), "code": code, "is_english": code == "en"}
+        else:
+            lang_data = await _fallback_identify_language(text)
+
+    if lang_data.get("is_english", True):
+        return {"is_english": True, "code": "en", "language": "English"}
+
+    lang_code = lang_data.get("code", "unknown")
+    lang_name = lang_data.get("language", "Unknown")
+
+    # Return from cache if already translated for this language
+    if lang_code in _LANG_SIGNAL_CACHE:
+        cached = _LANG_SIGNAL_CACHE[lang_code].copy()
+        cached["is_english"] = False
+        return cached
+
+    return await _translate_signal_sets(lang_code, lang_name)
+
+
+def _mostly_ascii_letters(sample: str) -> bool:
+    # at least 90% of the letters are ASCII
     ascii_letters = sum(1 for c in sample if c.isascii() and c.isalpha())
     total_letters = sum(1 for c in sample if c.isalpha())
-    if total_letters > 0 and (ascii_letters / total_letters) >= 0.90:
-        return {"is_english": True, "code": "en", "language": "English"}
+    return total_letters > 0 and (ascii_letters / total_letters) >= 0.90
 
-    # Only call GPT for genuinely non-ASCII or ambiguous text
+
+async def _fallback_identify_language(text: str) -> Dict:
+    # Only called for non-ASCII text the local identifier is unsure about
+    LANG_ID_STATS["gpt"] += 1
     try:
-        lang_resp = await client.chat.completions.create(
+        lang_resp = await OPENAI_SCHEDULER.create(
+            "detect",
             model="gpt-4.1",
             messages=[
                 {
@@ -819,22 +1374,89 @@ async def detect_language_and_translate_signals(text: str) -> Dict:
         )
         raw = (lang_resp.choices[0].message.content or "").strip()
         raw = re.sub(r"```json|```", "", raw).strip()
-        lang_data = json.loads(raw)
+        return json.loads(raw)
     except Exception:
         # If detection fails, assume English and continue normally
         return {"is_english": True, "code": "en", "language": "English"}
 
-    if lang_data.get("is_english", True):
-        return {"is_english": True, "code": "en", "language": "English"}
 
-    lang_code = lang_data.get("code", "unknown")
-    lang_name = lang_data.get("language", "Unknown")
+def _signal_store_path(lang_code: str) -> str:
+    safe_code = re.sub(r"[^a-z0-9_-]", "_", lang_code.lower())
+    return os.path.join(LANG_SIGNALS_DIR, f"{safe_code}.v{LANG_SIGNALS_VERSION}.json")
 
-    # Return from cache if already translated for this language
-    if lang_code in _LANG_SIGNAL_CACHE:
-        cached = _LANG_SIGNAL_CACHE[lang_code].copy()
-        cached["is_english"] = False
-        return cached
+
+def _compile_signal_sets(lang_code: str, lang_name: str, translated: Dict) -> Dict:
+    result = {"is_english": False, "code": lang_code, "language": lang_name}
+    for key in _SIGNAL_SET_KEYS:
+        result[key] = set(translated.get(key, []))
+    result["phrase_matcher"] = build_signal_matcher(result)
+    return result
+
+
+def _read_signal_store(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable signal set file {path}: {e}")
+        return None
+    if stored.get("version") != LANG_SIGNALS_VERSION:
+        return None
+    return _compile_signal_sets(stored["code"], stored.get("language", stored["code"]), stored.get("signals", {}))
+
+
+def _write_signal_store(lang_code: str, lang_name: str, translated: Dict) -> None:
+    if not LANG_SIGNALS_DIR:
+        return
+    path = _signal_store_path(lang_code)
+    payload = {
+        "version": LANG_SIGNALS_VERSION,
+        "code": lang_code,
+        "language": lang_name,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "signals": {key: list(translated.get(key, [])) for key in _SIGNAL_SET_KEYS},
+    }
+    try:
+        os.makedirs(LANG_SIGNALS_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)  # atomic, so other workers never read a half-written file
+    except Exception as e:
+        logger.warning(f"Could not persist signal sets for {lang_code}: {e}")
+
+
+def preload_lang_signal_store() -> int:
+    """Loads every stored signal set of the current version into _LANG_SIGNAL_CACHE."""
+    if not LANG_SIGNALS_DIR or not os.path.isdir(LANG_SIGNALS_DIR):
+        return 0
+    loaded = 0
+    suffix = f".v{LANG_SIGNALS_VERSION}.json"
+    for name in sorted(os.listdir(LANG_SIGNALS_DIR)):
+        if not name.endswith(suffix):
+            continue
+        result = _read_signal_store(os.path.join(LANG_SIGNALS_DIR, name))
+        if result is not None:
+            _LANG_SIGNAL_CACHE[result["code"]] = result
+            loaded += 1
+    return loaded
+
+
+async def _translate_signal_sets(lang_code: str, lang_name: str) -> Dict:
+    # concurrent requests in a new language wait for one translation
+    result = await LANG_SIGNAL_FLIGHTS.run(lang_code, lambda: _load_or_translate_signal_sets(lang_code, lang_name))
+    return result.copy()
+
+
+async def _load_or_translate_signal_sets(lang_code: str, lang_name: str) -> Dict:
+    # another worker may already have translated this language
+    if LANG_SIGNALS_DIR:
+        stored = _read_signal_store(_signal_store_path(lang_code))
+        if stored is not None:
+            _LANG_SIGNAL_CACHE[lang_code] = stored
+            return stored
 
     # Ask GPT to translate all our signal sets into the detected language
     translation_prompt = f"""
@@ -867,7 +1489,8 @@ If contractions don't exist in {lang_name}, return an empty list.
 """
 
     try:
-        trans_resp = await client.chat.completions.create(
+        trans_resp = await OPENAI_SCHEDULER.create(
+            "detect",
             model="gpt-4.1",
             messages=[
                 {"role": "user", "content": translation_prompt},
@@ -882,24 +1505,11 @@ If contractions don't exist in {lang_name}, return an empty list.
         # Translation failed — fall back to English signals
         return {"is_english": True, "code": "en", "language": "English", "fallback": True}
 
-    result = {
-        "is_english": False,
-        "code": lang_code,
-        "language": lang_name,
-        "stopwords": set(translated.get("stopwords", [])),
-        "ai_transitions": set(translated.get("ai_transitions", [])),
-        "generic_phrases": set(translated.get("generic_phrases", [])),
-        "formal_words": set(translated.get("formal_words", [])),
-        "informal_words": set(translated.get("informal_words", [])),
-        "hedge_words": set(translated.get("hedge_words", [])),
-        "contractions": set(translated.get("contractions", [])),
-        "first_person_specific": set(translated.get("first_person_specific", [])),
-        "self_ref_phrases": set(translated.get("self_ref_phrases", [])),
-        "tone_markers": set(translated.get("tone_markers", [])),
-    }
+    result = _compile_signal_sets(lang_code, lang_name, translated)
 
     # Cache it so we don't re-translate for every request in this language
     _LANG_SIGNAL_CACHE[lang_code] = result
+    _write_signal_store(lang_code, lang_name, translated)
     return result
 
 def calibrate_probability(p: float) -> float:
@@ -915,256 +1525,485 @@ def calibrate_probability(p: float) -> float:
 
     return max(0.0, min(calibrated, 1.0))
 
-def extract_detector_features(text: str, lang_signals: Dict = None) -> Dict[str, float]:
-    """
-    Style-focused detector features.
-    Tries to capture HOW text is written rather than WHAT it is about.
-    """
-    raw = (text or "").strip()
+# Canonical feature layout. Rows produced by the batch extractor and the
+# in-place filler follow this order; trained models record their own order
+# in feature_meta.joblib, so reordering here only affects newly trained models.
+DETECTOR_FEATURE_NAMES: Tuple[str, ...] = (
+    "n_chars", "n_words", "n_sents", "n_paras", "avg_sent_len", "std_sent_len",
+    "burstiness", "avg_para_len", "std_para_len", "para_uniformity", "avg_word_len",
+    "std_word_len", "ttr", "stop_ratio", "long_word_ratio", "short_word_ratio",
+    "contraction_ratio", "digit_ratio", "uppercase_ratio", "comma_ratio",
+    "semi_ratio", "colon_ratio", "qmark_ratio", "exclam_ratio", "quote_ratio",
+    "paren_ratio", "dash_ratio", "newline_ratio", "ellipsis_ratio",
+    "rep_bigram_ratio", "rep_trigram_ratio", "starter_diversity",
+    "starter2_diversity", "transition_ratio", "avg_adj_overlap", "std_adj_overlap",
+    "ending_diversity", "complete_sent_ratio", "char_entropy_3", "fk_grade",
+    "flesch", "personal_voice_ratio", "named_entity_density", "formality_balance",
+    "hedge_ratio", "generic_ratio", "symmetry_score", "over_coherence",
+    "burstiness_consistency", "entropy_uniformity", "tone_shift_ratio",
+    "rhythm_uniformity", "imperfection_pattern", "self_ref_ratio",
+    "concreteness_score", "sentence_drift", "is_structured_doc",
+)
+_FEATURE_INDEX: Dict[str, int] = {name: i for i, name in enumerate(DETECTOR_FEATURE_NAMES)}
+
+_BULLET_LINE_RE = re.compile(r'^\s*[-*•]\s+', re.MULTILINE)
+_NUMBERED_LINE_RE = re.compile(r'^\s*\d+[\.\)]\s+', re.MULTILINE)
+_HEADING_LINE_RE = re.compile(r'^\s*#{1,4}\s+', re.MULTILINE)
+
+_FORMAL_WORDS = {"therefore", "however", "moreover", "thus", "additionally"}
+_INFORMAL_WORDS = {"well", "honestly", "like", "you know", "kind of"}
+_HEDGE_WORDS = {"may", "might", "could", "suggests", "appears", "likely"}
+_SELF_REF_PHRASES = {
+    "i think", "i believe", "in my view", "from my perspective",
+    "personally", "i feel", "i would say"
+}
+_GENERIC_PHRASES = {
+    "in today's world", "it is important to note", "plays a crucial role",
+    "has become increasingly", "a wide range of", "various factors"
+}
+# The original list also had "now that I think about it" with a capital I,
+# which the substring check on lowercased text never matched. It stays out
+# so tone_shift_ratio keeps the values the detector model was trained on.
+_TONE_MARKERS = {
+    "honestly", "well", "anyway", "that said", "come to think of it",
+    "which is interesting"
+}
+_FIRST_PERSON_SPECIFIC = {
+    "i remember", "i was", "i saw", "i went", "i told", "i asked", "i realized"
+}
 
-    if not raw:
-        return {
-            "n_chars": 0.0,
-            "n_words": 0.0,
-            "n_sents": 0.0,
-            "n_paras": 0.0,
-        }
+# Every phrase set the feature extractor counts, keyed like the translated
+# signal sets returned by detect_language_and_translate_signals
+_PHRASE_SET_DEFAULTS = {
+    "ai_transitions": _AI_TRANSITIONS,
+    "formal_words": _FORMAL_WORDS,
+    "informal_words": _INFORMAL_WORDS,
+    "hedge_words": _HEDGE_WORDS,
+    "self_ref_phrases": _SELF_REF_PHRASES,
+    "generic_phrases": _GENERIC_PHRASES,
+    "tone_markers": _TONE_MARKERS,
+    "first_person_specific": _FIRST_PERSON_SPECIFIC,
+}
 
-    # --- Structured document detection ---
-    has_bullets = bool(re.search(r'^\s*[-*•]\s+', raw, re.MULTILINE))
-    has_numbered = bool(re.search(r'^\s*\d+[\.\)]\s+', raw, re.MULTILINE))
-    has_headings = bool(re.search(r'^\s*#{1,4}\s+', raw, re.MULTILINE))
-    is_structured_doc = float(has_bullets or has_numbered or has_headings)
+_SENTENCE_GENERIC_PHRASES = {
+    "it is important", "plays a crucial", "has become increasingly",
+    "a wide range", "various factors", "it is worth noting",
+    "this demonstrates", "this highlights"
+}
 
-    sents = _simple_sentence_split(raw)
-    paras = _paragraph_split(raw)
-    words = _tokenize_words(raw)
-    lower_raw = raw.lower()
+_DOC_PHRASE_MATCHER = PhraseMatcher(_PHRASE_SET_DEFAULTS)
+_SENTENCE_PHRASE_MATCHER = PhraseMatcher({
+    "ai_transitions": _AI_TRANSITIONS,
+    "generic_phrases": _SENTENCE_GENERIC_PHRASES,
+})
 
-    n_chars = len(raw)
-    n_words = len(words)
-    n_sents = max(len(sents), 1)
-    n_paras = max(len(paras), 1)
 
-    sent_word_lens = [len(_tokenize_words(s)) for s in sents] or [n_words]
-    para_word_lens = [len(_tokenize_words(p)) for p in paras] or [n_words]
-    word_lens = [len(w) for w in words] or [0]
+def build_signal_matcher(lang_signals: Dict) -> PhraseMatcher:
+    """Compile a (possibly translated) signal set, falling back to English per set."""
+    code = (lang_signals.get("code") or "en").lower()
+    if code in _UNSPACED_LANGS:
+        tokenizer = _tokenize_chars
+    elif code == "en":
+        tokenizer = None
+    else:
+        tokenizer = _tokenize_unicode_words
+    return PhraseMatcher(
+        {name: lang_signals.get(name, default) for name, default in _PHRASE_SET_DEFAULTS.items()},
+        tokenizer=tokenizer,
+    )
 
-    # avg_sent_len MUST be computed before para_sent_lens (used as its fallback)
-    avg_sent_len = _mean(sent_word_lens)
-    std_sent_len = _std(sent_word_lens)
-    burstiness = _safe_div(std_sent_len, avg_sent_len + 1e-6)
 
-    # --- paragraph-level variance ---
-    para_sent_lens = [
-        _mean([len(_tokenize_words(s)) for s in _simple_sentence_split(p)])
-        for p in paras
-    ] or [avg_sent_len]
+def _phrase_matcher_for(lang_signals: Dict = None) -> PhraseMatcher:
+    if not lang_signals:
+        return _DOC_PHRASE_MATCHER
+    matcher = lang_signals.get("phrase_matcher")
+    if matcher is None:
+        matcher = build_signal_matcher(lang_signals)
+    return matcher
 
-    para_variance = _std(para_sent_lens)
-    para_uniformity = 1.0 - min(para_variance / 10.0, 1.0)
 
-    avg_para_len = _mean(para_word_lens)
-    std_para_len = _std(para_word_lens)
+def _feature_columns(feature_order) -> np.ndarray:
+    """
+    Map a feature order onto indexes of a canonical row.
+    Unknown names point one past the end, at a slot that always holds 0.0.
+    """
+    n = len(DETECTOR_FEATURE_NAMES)
+    return np.array([_FEATURE_INDEX.get(k, n) for k in feature_order], dtype=np.intp)
 
-    avg_word_len = _mean(word_lens)
-    std_word_len = _std(word_lens)
 
-    uniq_words = len(set(words))
-    ttr = _safe_div(uniq_words, n_words + 1e-6)
+_EMPTY_DOC_FEATURES = frozenset({"n_chars", "n_words", "n_sents", "n_paras"})
 
-    _stopwords = lang_signals.get("stopwords", _BASIC_STOPWORDS) if lang_signals else _BASIC_STOPWORDS
-    stop_count = sum(1 for w in words if w in _stopwords)
-    stop_ratio = _safe_div(stop_count, n_words + 1e-6)
 
-    long_word_ratio = _safe_div(sum(1 for w in words if len(w) >= 7), n_words + 1e-6)
-    short_word_ratio = _safe_div(sum(1 for w in words if len(w) <= 3), n_words + 1e-6)
+class FeatureVector(Mapping):
+    """
+    Detector features of one document, backed by a float64 row in
+    DETECTOR_FEATURE_NAMES order (plus the always-zero slot unknown names
+    map to). Reads like a read-only dict of feature name -> float, so
+    callers that used the old dicts keep working without a per-request
+    dict of boxed floats being built.
+
+    `present` restricts which names exist (partial extractions, empty
+    text); absent names behave like missing dict keys.
+    """
 
-    _contractions_set = lang_signals.get("contractions", _CONTRACTIONS) if lang_signals else _CONTRACTIONS
-    contraction_count = sum(1 for w in words if w in _contractions_set)
-    contraction_ratio = _safe_div(contraction_count, n_words + 1e-6)
+    __slots__ = ("row", "_present")
 
-    digit_ratio = _safe_div(sum(1 for ch in raw if ch.isdigit()), n_chars + 1e-6)
-    uppercase_ratio = _safe_div(sum(1 for ch in raw if ch.isupper()), n_chars + 1e-6)
+    def __init__(self, row: np.ndarray, present: Optional[frozenset] = None):
+        self.row = row
+        self._present = present
 
-    # --- concreteness proxy ---
-    capital_words = sum(1 for w in words if w.istitle())
-    number_words = sum(1 for w in words if any(c.isdigit() for c in w))
-    concreteness_score = _safe_div(capital_words + number_words, n_words + 1e-6)
+    @classmethod
+    def empty(cls) -> "FeatureVector":
+        return cls(np.zeros(len(DETECTOR_FEATURE_NAMES) + 1, dtype=np.float64), _EMPTY_DOC_FEATURES)
 
-    # --- punctuation usage ---
-    comma_ratio = _safe_div(raw.count(","), n_chars + 1e-6)
-    semi_ratio = _safe_div(raw.count(";"), n_chars + 1e-6)
-    colon_ratio = _safe_div(raw.count(":"), n_chars + 1e-6)
-    qmark_ratio = _safe_div(raw.count("?"), n_chars + 1e-6)
-    exclam_ratio = _safe_div(raw.count("!"), n_chars + 1e-6)
-    quote_ratio = _safe_div(
-        raw.count('"') + raw.count("'") + raw.count("\u201c") + raw.count("\u201d"),
-        n_chars + 1e-6
-    )
-    paren_ratio = _safe_div(raw.count("(") + raw.count(")"), n_chars + 1e-6)
-    dash_ratio = _safe_div(raw.count("-") + raw.count("\u2014"), n_chars + 1e-6)
-    newline_ratio = _safe_div(raw.count("\n"), n_chars + 1e-6)
-    ellipsis_ratio = _safe_div(raw.count("..."), max(1, n_chars))
+    def __getitem__(self, name: str) -> float:
+        idx = _FEATURE_INDEX.get(name)
+        if idx is None or (self._present is not None and name not in self._present):
+            raise KeyError(name)
+        return float(self.row[idx])
 
-    # --- repetition ---
-    bigrams = list(zip(words, words[1:])) if len(words) >= 2 else []
-    trigrams = list(zip(words, words[1:], words[2:])) if len(words) >= 3 else []
+    def get(self, name: str, default=None):
+        idx = _FEATURE_INDEX.get(name)
+        if idx is None or (self._present is not None and name not in self._present):
+            return default
+        return float(self.row[idx])
 
-    bigram_counts = {}
-    for bg in bigrams:
-        bigram_counts[bg] = bigram_counts.get(bg, 0) + 1
-    trigram_counts = {}
-    for tg in trigrams:
-        trigram_counts[tg] = trigram_counts.get(tg, 0) + 1
+    def __iter__(self):
+        if self._present is None:
+            return iter(DETECTOR_FEATURE_NAMES)
+        return (k for k in DETECTOR_FEATURE_NAMES if k in self._present)
 
-    repeated_bigrams = sum(1 for v in bigram_counts.values() if v >= 2)
-    repeated_trigrams = sum(1 for v in trigram_counts.values() if v >= 2)
+    def __len__(self) -> int:
+        return len(DETECTOR_FEATURE_NAMES) if self._present is None else len(self._present)
 
-    rep_bigram_ratio = _safe_div(repeated_bigrams, len(bigrams) + 1e-6)
-    rep_trigram_ratio = _safe_div(repeated_trigrams, len(trigrams) + 1e-6)
+    def __repr__(self) -> str:
+        return f"FeatureVector({self.to_dict()!r})"
 
-    # --- sentence starter diversity ---
-    starters = []
-    starter2 = []
-    for s in sents:
-        toks = _tokenize_words(s)
-        if toks:
-            starters.append(toks[0])
-        if len(toks) >= 2:
-            starter2.append(f"{toks[0]}_{toks[1]}")
+    def to_dict(self) -> Dict[str, float]:
+        if self._present is None:
+            return dict(zip(DETECTOR_FEATURE_NAMES, self.row.tolist()))
+        return {k: self.get(k) for k in self}
 
-    starter_diversity = _safe_div(len(set(starters)), len(starters) + 1e-6)
-    starter2_diversity = _safe_div(len(set(starter2)), len(starter2) + 1e-6)
+    def columns(self, cols) -> np.ndarray:
+        """Values at `cols` (see _feature_columns); a view when `cols` is a slice."""
+        return self.row[cols]
 
-    # --- discourse / transition markers ---
-    _transitions = lang_signals.get("ai_transitions", _AI_TRANSITIONS) if lang_signals else _AI_TRANSITIONS
-    transition_hits = _count_phrase_hits(lower_raw, _transitions)
-    transition_ratio = _safe_div(transition_hits, n_sents + 1e-6)
 
-    # --- adjacent sentence overlap (coherence proxy) ---
-    overlaps = []
-    for i in range(len(sents) - 1):
-        a = _tokenize_words(sents[i])
-        b = _tokenize_words(sents[i + 1])
-        overlaps.append(_jaccard_overlap(a, b))
+def stack_feature_vectors(vectors: List[FeatureVector], feature_order: Optional[List[str]] = None) -> np.ndarray:
+    """float32 matrix with one row per vector, columns in `feature_order` (canonical by default)."""
+    cols = _feature_columns(feature_order) if feature_order else slice(0, len(DETECTOR_FEATURE_NAMES))
+    X = np.zeros((len(vectors), len(feature_order or DETECTOR_FEATURE_NAMES)), dtype=np.float32)
+    for i, fv in enumerate(vectors):
+        X[i] = fv.row[cols]
+    return X
 
-    avg_adj_overlap = _mean(overlaps)
-    std_adj_overlap = _std(overlaps)
 
-    # --- sentence ending variation ---
-    sent_endings = []
-    for s in sents:
-        s = s.strip()
-        if s.endswith("?"):
-            sent_endings.append("?")
-        elif s.endswith("!"):
-            sent_endings.append("!")
-        elif s.endswith("."):
-            sent_endings.append(".")
-        else:
-            sent_endings.append("other")
-    ending_diversity = _safe_div(len(set(sent_endings)), len(sent_endings) + 1e-6)
-    drift_score = sentence_drift_score(sents)
+def extract_detector_features(
+    text: str,
+    lang_signals: Dict = None,
+    features: Optional[List[str]] = None,
+) -> FeatureVector:
+    """
+    Style-focused detector features.
+    Tries to capture HOW text is written rather than WHAT it is about.
 
-    # --- readability (optional) ---
-    fk_grade = 0.0
-    flesch = 0.0
-    if textstat is not None and raw:
-        try:
-            fk_grade = float(textstat.flesch_kincaid_grade(raw))
-            flesch = float(textstat.flesch_reading_ease(raw))
-        except Exception:
-            fk_grade = 0.0
-            flesch = 0.0
+    With `features`, only the feature groups those names belong to are
+    computed and returned (every feature of each group, not just the ones
+    asked for). A full row already in the cache is sliced instead.
+    """
+    if features is None:
+        row = _detector_feature_row(text, lang_signals)
+        return FeatureVector(row) if row is not None else FeatureVector.empty()
+
+    if not (text or "").strip():
+        return FeatureVector.empty()
+
+    groups = feature_groups_for(features)
+    code = _lang_code(lang_signals)
+    row = _FEATURE_CACHE.get(FeatureCache.make_key(text, code)) if code else None
+    if row is None:
+        # partial rows are never cached: a later full lookup would miss fields
+        row = _profiled_feature_row(text, lang_signals, groups)
+    return _features_from_row(row, groups)
+
+
+def compute_feature_row(
+    text: str,
+    lang_signals: Dict = None,
+    groups: Optional[set] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> np.ndarray:
+    """
+    Fresh (uncached) feature row for non-empty text; `groups` and `timings`
+    as in _fill_detector_features, with tokenization timed as "parse".
+    """
+    row = np.zeros(len(DETECTOR_FEATURE_NAMES) + 1, dtype=np.float64)
+    if timings is None:
+        _fill_detector_features(ParsedDocument(text), row, lang_signals, groups)
+        return row
 
-    # --- entropy proxy ---
-    char_entropy_3 = _shannon_entropy_from_char_ngrams(raw, n=3)
+    t0 = time.perf_counter()
+    doc = ParsedDocument(text)
+    timings["parse"] = (time.perf_counter() - t0) * 1000.0
+    _fill_detector_features(doc, row, lang_signals, groups, timings)
+    return row
 
-    # --- sentence completeness proxy ---
-    complete_sent_ratio = _safe_div(
-        sum(1 for s in sents if s.strip().endswith((".", "?", "!"))),
-        len(sents) + 1e-6
-    )
 
-    # --- AI fingerprint signals ---
+def _profiled_feature_row(text: str, lang_signals: Dict = None, groups: Optional[set] = None) -> np.ndarray:
+    # compute_feature_row, recorded in FEATURE_PROFILER when profiling is on
+    if not FEATURE_PROFILER.enabled:
+        return compute_feature_row(text, lang_signals, groups)
+    timings = {}
+    row = compute_feature_row(text, lang_signals, groups, timings)
+    FEATURE_PROFILER.record(len(text.strip()), timings)
+    return row
 
-    # 1. Formality consistency (AI tends to be overly consistent)
-    formal_words = lang_signals.get("formal_words", {"therefore", "however", "moreover", "thus", "additionally"}) if lang_signals else {"therefore", "however", "moreover", "thus", "additionally"}
-    informal_words = lang_signals.get("informal_words", {"well", "honestly", "like", "you know", "kind of"}) if lang_signals else {"well", "honestly", "like", "you know", "kind of"}
 
-    formal_count = _count_phrase_hits(lower_raw, formal_words)
-    informal_count = _count_phrase_hits(lower_raw, informal_words)
-    formality_balance = _safe_div(formal_count, informal_count + 1e-6)
+def _feature_row_job(text: str, lang_signals, groups: Optional[set], profile: bool):
+    """
+    CPU_POOL job: (row, stage timings or None). Timings travel back with the
+    row so they are recorded by the serving process, not the worker.
+    `lang_signals` may be a reference from _job_signals_ref.
+    """
+    lang_signals = _worker_lang_signals(lang_signals)
+    timings = {} if profile else None
+    return compute_feature_row(text, lang_signals, groups, timings), timings
 
-    # 2. Hedging language (AI often hedges safely)
-    hedge_words = lang_signals.get("hedge_words", {"may", "might", "could", "suggests", "appears", "likely"}) if lang_signals else {"may", "might", "could", "suggests", "appears", "likely"}
-    hedge_ratio = _safe_div(
-        sum(1 for w in words if w in hedge_words),
-        n_words + 1e-6
-    )
 
-    # 3. Self-referential phrases
-    self_ref_words = lang_signals.get("self_ref_phrases", {
-        "i think", "i believe", "in my view", "from my perspective",
-        "personally", "i feel", "i would say"
-    }) if lang_signals else {
-        "i think", "i believe", "in my view", "from my perspective",
-        "personally", "i feel", "i would say"
-    }
-    self_ref_hits = _count_phrase_hits(lower_raw, self_ref_words)
-    self_ref_ratio = _safe_div(self_ref_hits, n_sents + 1e-6)
-
-    # 4. Generic phrasing (very strong AI signal)
-    generic_phrases = lang_signals.get("generic_phrases", {
-        "in today's world", "it is important to note", "plays a crucial role",
-        "has become increasingly", "a wide range of", "various factors"
-    }) if lang_signals else {
-        "in today's world", "it is important to note", "plays a crucial role",
-        "has become increasingly", "a wide range of", "various factors"
-    }
-    generic_hits = _count_phrase_hits(lower_raw, generic_phrases)
-    generic_ratio = _safe_div(generic_hits, n_sents + 1e-6)
+# Worker processes keep compiled signal sets per language code, so feature
+# jobs for translated languages carry (code, None) instead of pickling the
+# sets and their phrase automaton into every job. A worker that cannot
+# resolve a code is sent the raw sets once, as (code, sets).
+_WORKER_LANG_SIGNALS: Dict[str, Dict] = {}
 
-    # 5. Sentence symmetry (AI tends to balance sentence lengths)
-    sent_len_diff = [
-        abs(sent_word_lens[i] - sent_word_lens[i - 1])
-        for i in range(1, len(sent_word_lens))
-    ] if len(sent_word_lens) > 1 else [0.0]
-    symmetry_score = 1.0 - min(_mean(sent_len_diff) / 20.0, 1.0)
 
-    # 6. Over-coherence (AI flows too smoothly)
-    over_coherence = 1.0 - min(avg_adj_overlap / 0.8, 1.0)
+class _SignalsNotInWorker(Exception):
+    """A CPU_POOL worker was sent a language code it has no signal sets for."""
 
-    # --- Adversarial / humanizer-detection signals ---
 
-    # 1. Fake burstiness (variation that is TOO controlled)
-    burstiness_variation = _std(sent_word_lens)
-    burstiness_mean = _mean(sent_word_lens)
-    burstiness_consistency = 1.0 - min(burstiness_variation / (burstiness_mean + 1e-6), 1.0)
+def _job_signals_ref(lang_signals: Dict = None):
+    # threads and inline jobs share memory, so only process workers get a reference
+    if CPU_POOL.mode != "process" or not lang_signals or lang_signals.get("is_english", True):
+        return lang_signals
+    code = lang_signals.get("code")
+    return (code, None) if code else lang_signals
 
-    # 2. Entropy inconsistency (human text fluctuates more)
-    chunk_size = max(50, int(len(raw) / 5))
-    entropy_chunks = []
-    for i in range(0, len(raw), chunk_size):
-        chunk = raw[i:i + chunk_size]
-        entropy_chunks.append(_shannon_entropy_from_char_ngrams(chunk, n=3))
 
-    entropy_std = _std(entropy_chunks)
-    entropy_uniformity = 1.0 - min(entropy_std / 1.5, 1.0)
+def _job_signals_payload(lang_signals: Dict) -> Tuple[str, Dict]:
+    sets = {key: list(lang_signals.get(key, [])) for key in _SIGNAL_SET_KEYS}
+    sets["language"] = lang_signals.get("language", lang_signals["code"])
+    return lang_signals["code"], sets
 
-    # 3. Sudden tone shifts (AI fake drift)
-    tone_markers = list(lang_signals.get("tone_markers", {
-        "honestly", "well", "anyway", "that said", "come to think of it",
-        "now that I think about it", "which is interesting"
-    })) if lang_signals else [
-        "honestly", "well", "anyway", "that said", "come to think of it",
-        "now that I think about it", "which is interesting"
-    ]
-    tone_shift_hits = _count_phrase_hits(lower_raw, set(tone_markers))
-    tone_shift_ratio = _safe_div(tone_shift_hits, n_sents + 1e-6)
 
-    # 4. Sentence rhythm irregularity (human is messy, AI is patterned)
+def _worker_lang_signals(ref) -> Optional[Dict]:
+    if not isinstance(ref, tuple):
+        return ref
+    code, sets = ref
+    signals = _WORKER_LANG_SIGNALS.get(code)
+    if signals is None:
+        if sets is not None:
+            signals = _compile_signal_sets(code, sets["language"], sets)
+        else:
+            # sets this worker translated itself, or the file store
+            signals = _LANG_SIGNAL_CACHE.get(code)
+            if signals is None and LANG_SIGNALS_DIR:
+                signals = _read_signal_store(_signal_store_path(code))
+            if signals is None:
+                raise _SignalsNotInWorker(code)
+        _WORKER_LANG_SIGNALS[code] = signals
+    return signals
+
+
+def _features_from_row(row: np.ndarray, groups: set) -> FeatureVector:
+    return FeatureVector(row, frozenset(k for k in DETECTOR_FEATURE_NAMES if _FEATURE_GROUP_OF[k] in groups))
+
+
+def _detector_feature_row(text: str, lang_signals: Dict = None) -> Optional[np.ndarray]:
+    """
+    Canonical feature row for one text, served from the feature cache when
+    the same text was featurized before. None for empty text.
+    The row is shared with the cache and must not be modified.
+    """
+    if not (text or "").strip():
+        return None
+
+    code = _lang_code(lang_signals)
+    key = FeatureCache.make_key(text, code) if code else None
+    row = _FEATURE_CACHE.get(key) if key else None
+    if row is not None:
+        return row
+
+    row = _profiled_feature_row(text, lang_signals)
+    if key:
+        _FEATURE_CACHE.put(key, row)
+    return row
+
+
+def extract_detector_features_batch(
+    texts: List[str],
+    feature_order: Optional[List[str]] = None,
+    lang_signals: Dict = None,
+) -> np.ndarray:
+    """
+    Featurize many texts straight into a float32 matrix (one row per text,
+    columns in `feature_order`, canonical order by default).
+    No per-row dict is built: each document is written into one reused
+    scratch row and copied into its slot of the preallocated matrix.
+    Empty texts and unknown feature names come out as 0.0.
+    """
+    order = list(feature_order) if feature_order else list(DETECTOR_FEATURE_NAMES)
+    cols = _feature_columns(order)
+
+    X = np.zeros((len(texts), len(order)), dtype=np.float32)
+    scratch = np.zeros(len(DETECTOR_FEATURE_NAMES) + 1, dtype=np.float64)
+
+    profile = FEATURE_PROFILER.enabled
+    for i, text in enumerate(texts):
+        timings = {} if profile else None
+        t0 = time.perf_counter()
+        doc = ParsedDocument(text)
+        if not doc.raw:
+            continue
+        if profile:
+            timings["parse"] = (time.perf_counter() - t0) * 1000.0
+        _fill_detector_features(doc, scratch, lang_signals, timings=timings)
+        np.take(scratch, cols, out=X[i])
+        if profile:
+            FEATURE_PROFILER.record(len(doc.raw), timings)
+
+    return X
+
+
+def _fill_detector_features(
+    doc: ParsedDocument,
+    row: np.ndarray,
+    lang_signals: Dict = None,
+    groups: Optional[set] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> None:
+    """
+    Compute detector features for a non-empty document and write them into
+    `row` following DETECTOR_FEATURE_NAMES. `groups` restricts the work to
+    the named feature groups (all of them by default); other slots are left
+    untouched. With a `timings` dict, each group's wall time in ms is
+    stored under its name (shared intermediates are charged to the first
+    group that needs them).
+    """
+    ctx = _FeatureContext(doc, lang_signals)
+    for name, (_, compute) in _FEATURE_GROUPS.items():
+        if groups is None or name in groups:
+            if timings is None:
+                compute(ctx, row)
+            else:
+                t0 = time.perf_counter()
+                compute(ctx, row)
+                timings[name] = (time.perf_counter() - t0) * 1000.0
+
+
+class _FeatureContext:
+    """
+    Intermediate values shared by the feature groups of one document.
+    Each is computed the first time a group asks for it, so a partial
+    extraction only pays for what its groups actually depend on.
+    """
+
+    def __init__(self, doc: ParsedDocument, lang_signals: Dict = None):
+        self.doc = doc
+        self.lang_signals = lang_signals
+        self.raw = doc.raw
+        self.n_chars = len(doc.raw)
+        self.n_words = len(doc.words)
+        self.n_sents = max(len(doc.sents), 1)
+
+    @cached_property
+    def sent_word_lens(self) -> List[int]:
+        return self.doc.sentence_word_counts() or [self.n_words]
+
+    @cached_property
+    def sent_tokens(self) -> List[List[str]]:
+        return self.doc.sentence_tokens()
+
+    @cached_property
+    def phrase_hits(self) -> Dict[str, int]:
+        # one automaton pass counts every phrase set
+        return _phrase_matcher_for(self.lang_signals).count_document(self.doc)
+
+    @cached_property
+    def adjacent_overlaps(self) -> List[float]:
+        toks = self.sent_tokens
+        return [_jaccard_overlap(toks[i], toks[i + 1]) for i in range(len(toks) - 1)]
+
+
+# name -> (features written, compute(ctx, row)); filled in by @_feature_group
+_FEATURE_GROUPS: "OrderedDict[str, Tuple[Tuple[str, ...], Any]]" = OrderedDict()
+
+def _feature_group(name: str, features: Tuple[str, ...]):
+    def register(fn):
+        _FEATURE_GROUPS[name] = (features, fn)
+        return fn
+    return register
+
+
+@_feature_group("size", ("n_chars", "n_words", "n_sents", "n_paras"))
+def _group_size(ctx: _FeatureContext, row: np.ndarray) -> None:
+    f = _FEATURE_INDEX
+    row[f["n_chars"]] = ctx.n_chars
+    row[f["n_words"]] = ctx.n_words
+    row[f["n_sents"]] = ctx.n_sents
+    row[f["n_paras"]] = max(len(ctx.doc.paras), 1)
+
+
+@_feature_group("structure", ("is_structured_doc",))
+def _group_structure(ctx: _FeatureContext, row: np.ndarray) -> None:
+    raw = ctx.raw
+
+    # --- Structured document detection ---
+    has_bullets = bool(_BULLET_LINE_RE.search(raw))
+    has_numbered = bool(_NUMBERED_LINE_RE.search(raw))
+    has_headings = bool(_HEADING_LINE_RE.search(raw))
+    row[_FEATURE_INDEX["is_structured_doc"]] = float(has_bullets or has_numbered or has_headings)
+
+
+@_feature_group("rhythm", (
+    "avg_sent_len", "std_sent_len", "burstiness", "avg_para_len", "std_para_len",
+    "para_uniformity", "symmetry_score", "burstiness_consistency",
+    "rhythm_uniformity", "imperfection_pattern",
+))
+def _group_rhythm(ctx: _FeatureContext, row: np.ndarray) -> None:
+    doc = ctx.doc
+    sent_word_lens = ctx.sent_word_lens
+    para_word_lens = doc.paragraph_word_counts() or [ctx.n_words]
+
+    # avg_sent_len MUST be computed before para_sent_lens (used as its fallback)
+    avg_sent_len = _mean(sent_word_lens)
+    std_sent_len = _std(sent_word_lens)
+    burstiness = _safe_div(std_sent_len, avg_sent_len + 1e-6)
+
+    # --- paragraph-level variance ---
+    para_sent_lens = [
+        _mean(sent_word_lens[a:b])
+        for a, b in doc.paragraph_sentence_ranges()
+    ] or [avg_sent_len]
+
+    para_variance = _std(para_sent_lens)
+    para_uniformity = 1.0 - min(para_variance / 10.0, 1.0)
+
+    avg_para_len = _mean(para_word_lens)
+    std_para_len = _std(para_word_lens)
+
+    # Sentence symmetry (AI tends to balance sentence lengths)
+    sent_len_diff = [
+        abs(sent_word_lens[i] - sent_word_lens[i - 1])
+        for i in range(1, len(sent_word_lens))
+    ] if len(sent_word_lens) > 1 else [0.0]
+    symmetry_score = 1.0 - min(_mean(sent_len_diff) / 20.0, 1.0)
+
+    # Fake burstiness (variation that is TOO controlled)
+    burstiness_variation = _std(sent_word_lens)
+    burstiness_mean = _mean(sent_word_lens)
+    burstiness_consistency = 1.0 - min(burstiness_variation / (burstiness_mean + 1e-6), 1.0)
+
+    # Sentence rhythm irregularity (human is messy, AI is patterned)
     sentence_diffs = [
         sent_word_lens[i] - sent_word_lens[i - 1]
         for i in range(1, len(sent_word_lens))
@@ -1173,7 +2012,7 @@ def extract_detector_features(text: str, lang_signals: Dict = None) -> Dict[str,
     rhythm_std = _std(sentence_diffs)
     rhythm_uniformity = 1.0 - min(rhythm_std / 10.0, 1.0)
 
-    # 5. Imperfection placement (AI places imperfections "strategically")
+    # Imperfection placement (AI places imperfections "strategically")
     short_sent_positions = [
         i for i, l in enumerate(sent_word_lens) if l < 6
     ]
@@ -1187,100 +2026,1189 @@ def extract_detector_features(text: str, lang_signals: Dict = None) -> Dict[str,
     else:
         imperfection_pattern = 0.0
 
-    # --- Personal voice + named entity signals ---
-    first_person_specific = lang_signals.get("first_person_specific", {
-        "i remember", "i was", "i saw", "i went", "i told", "i asked", "i realized"
-    }) if lang_signals else {
-        "i remember", "i was", "i saw", "i went", "i told", "i asked", "i realized"
-    }
-    first_person_hits = _count_phrase_hits(lower_raw, first_person_specific)
-    personal_voice_ratio = _safe_div(first_person_hits, n_sents + 1e-6)
+    f = _FEATURE_INDEX
+    row[f["avg_sent_len"]] = avg_sent_len
+    row[f["std_sent_len"]] = std_sent_len
+    row[f["burstiness"]] = burstiness
+    row[f["avg_para_len"]] = avg_para_len
+    row[f["std_para_len"]] = std_para_len
+    row[f["para_uniformity"]] = para_uniformity
+    row[f["symmetry_score"]] = symmetry_score
+    row[f["burstiness_consistency"]] = burstiness_consistency
+    row[f["rhythm_uniformity"]] = rhythm_uniformity
+    row[f["imperfection_pattern"]] = imperfection_pattern
+
+
+@_feature_group("lexical", (
+    "avg_word_len", "std_word_len", "ttr", "stop_ratio", "long_word_ratio",
+    "short_word_ratio", "contraction_ratio",
+))
+def _group_lexical(ctx: _FeatureContext, row: np.ndarray) -> None:
+    words = ctx.doc.words
+    n_words = ctx.n_words
+    lang_signals = ctx.lang_signals
 
+    word_lens = [len(w) for w in words] or [0]
+    avg_word_len = _mean(word_lens)
+    std_word_len = _std(word_lens)
+
+    uniq_words = len(set(words))
+    ttr = _safe_div(uniq_words, n_words + 1e-6)
+
+    _stopwords = lang_signals.get("stopwords", _BASIC_STOPWORDS) if lang_signals else _BASIC_STOPWORDS
+    stop_count = sum(1 for w in words if w in _stopwords)
+    stop_ratio = _safe_div(stop_count, n_words + 1e-6)
+
+    long_word_ratio = _safe_div(sum(1 for w in words if len(w) >= 7), n_words + 1e-6)
+    short_word_ratio = _safe_div(sum(1 for w in words if len(w) <= 3), n_words + 1e-6)
+
+    _contractions_set = lang_signals.get("contractions", _CONTRACTIONS) if lang_signals else _CONTRACTIONS
+    contraction_count = sum(1 for w in words if w in _contractions_set)
+    contraction_ratio = _safe_div(contraction_count, n_words + 1e-6)
+
+    f = _FEATURE_INDEX
+    row[f["avg_word_len"]] = avg_word_len
+    row[f["std_word_len"]] = std_word_len
+    row[f["ttr"]] = ttr
+    row[f["stop_ratio"]] = stop_ratio
+    row[f["long_word_ratio"]] = long_word_ratio
+    row[f["short_word_ratio"]] = short_word_ratio
+    row[f["contraction_ratio"]] = contraction_ratio
+
+
+@_feature_group("surface", (
+    "digit_ratio", "uppercase_ratio", "concreteness_score", "named_entity_density",
+))
+def _group_surface(ctx: _FeatureContext, row: np.ndarray) -> None:
+    raw = ctx.raw
+    words = ctx.doc.words
+    n_words = ctx.n_words
+    n_chars = ctx.n_chars
+
+    digit_ratio = _safe_div(sum(1 for ch in raw if ch.isdigit()), n_chars + 1e-6)
+    uppercase_ratio = _safe_div(sum(1 for ch in raw if ch.isupper()), n_chars + 1e-6)
+
+    # --- concreteness proxy ---
+    capital_words = sum(1 for w in words if w.istitle())
+    number_words = sum(1 for w in words if any(c.isdigit() for c in w))
+    concreteness_score = _safe_div(capital_words + number_words, n_words + 1e-6)
+
+    # --- named entity proxy ---
     mid_sentence_caps = sum(
         1
-        for s in sents
-        for j, w in enumerate(_tokenize_words(s))
+        for toks in ctx.sent_tokens
+        for j, w in enumerate(toks)
         if j > 0 and len(w) > 0 and w[0].isupper()
     )
     named_entity_density = _safe_div(mid_sentence_caps, n_words + 1e-6)
 
-    return {
-        # size
-        "n_chars": float(n_chars),
-        "n_words": float(n_words),
-        "n_sents": float(n_sents),
-        "n_paras": float(n_paras),
-
-        # rhythm / burstiness
-        "avg_sent_len": float(avg_sent_len),
-        "std_sent_len": float(std_sent_len),
-        "burstiness": float(burstiness),
-        "avg_para_len": float(avg_para_len),
-        "std_para_len": float(std_para_len),
-        "para_uniformity": float(para_uniformity),
-
-        # word shape / lexical style
-        "avg_word_len": float(avg_word_len),
-        "std_word_len": float(std_word_len),
-        "ttr": float(ttr),
-        "stop_ratio": float(stop_ratio),
-        "long_word_ratio": float(long_word_ratio),
-        "short_word_ratio": float(short_word_ratio),
-        "contraction_ratio": float(contraction_ratio),
-        "digit_ratio": float(digit_ratio),
-        "uppercase_ratio": float(uppercase_ratio),
-
-        # punctuation / formatting
-        "comma_ratio": float(comma_ratio),
-        "semi_ratio": float(semi_ratio),
-        "colon_ratio": float(colon_ratio),
-        "qmark_ratio": float(qmark_ratio),
-        "exclam_ratio": float(exclam_ratio),
-        "quote_ratio": float(quote_ratio),
-        "paren_ratio": float(paren_ratio),
-        "dash_ratio": float(dash_ratio),
-        "newline_ratio": float(newline_ratio),
-        "ellipsis_ratio": float(ellipsis_ratio),
-
-        # repetition
-        "rep_bigram_ratio": float(rep_bigram_ratio),
-        "rep_trigram_ratio": float(rep_trigram_ratio),
-
-        # discourse / structure
-        "starter_diversity": float(starter_diversity),
-        "starter2_diversity": float(starter2_diversity),
-        "transition_ratio": float(transition_ratio),
-        "avg_adj_overlap": float(avg_adj_overlap),
-        "std_adj_overlap": float(std_adj_overlap),
-        "ending_diversity": float(ending_diversity),
-        "complete_sent_ratio": float(complete_sent_ratio),
-
-        # predictability / readability
-        "char_entropy_3": float(char_entropy_3),
-        "fk_grade": float(fk_grade),
-        "flesch": float(flesch),
-        "personal_voice_ratio": float(personal_voice_ratio),
-        "named_entity_density": float(named_entity_density),
-
-        # AI fingerprint features
-        "formality_balance": float(formality_balance),
-        "hedge_ratio": float(hedge_ratio),
-        "generic_ratio": float(generic_ratio),
-        "symmetry_score": float(symmetry_score),
-        "over_coherence": float(over_coherence),
-
-        # adversarial features
-        "burstiness_consistency": float(burstiness_consistency),
-        "entropy_uniformity": float(entropy_uniformity),
-        "tone_shift_ratio": float(tone_shift_ratio),
-        "rhythm_uniformity": float(rhythm_uniformity),
-        "imperfection_pattern": float(imperfection_pattern),
-        "self_ref_ratio": float(self_ref_ratio),
-        "concreteness_score": float(concreteness_score),
-        "sentence_drift": float(drift_score),
-        "is_structured_doc": float(is_structured_doc),
-    }
-    
+    f = _FEATURE_INDEX
+    row[f["digit_ratio"]] = digit_ratio
+    row[f["uppercase_ratio"]] = uppercase_ratio
+    row[f["concreteness_score"]] = concreteness_score
+    row[f["named_entity_density"]] = named_entity_density
+
+
+@_feature_group("punctuation", (
+    "comma_ratio", "semi_ratio", "colon_ratio", "qmark_ratio", "exclam_ratio",
+    "quote_ratio", "paren_ratio", "dash_ratio", "newline_ratio", "ellipsis_ratio",
+))
+def _group_punctuation(ctx: _FeatureContext, row: np.ndarray) -> None:
+    raw = ctx.raw
+    n_chars = ctx.n_chars
+
+    f = _FEATURE_INDEX
+    row[f["comma_ratio"]] = _safe_div(raw.count(","), n_chars + 1e-6)
+    row[f["semi_ratio"]] = _safe_div(raw.count(";"), n_chars + 1e-6)
+    row[f["colon_ratio"]] = _safe_div(raw.count(":"), n_chars + 1e-6)
+    row[f["qmark_ratio"]] = _safe_div(raw.count("?"), n_chars + 1e-6)
+    row[f["exclam_ratio"]] = _safe_div(raw.count("!"), n_chars + 1e-6)
+    row[f["quote_ratio"]] = _safe_div(
+        raw.count('"') + raw.count("'") + raw.count("“") + raw.count("”"),
+        n_chars + 1e-6
+    )
+    row[f["paren_ratio"]] = _safe_div(raw.count("(") + raw.count(")"), n_chars + 1e-6)
+    row[f["dash_ratio"]] = _safe_div(raw.count("-") + raw.count("—"), n_chars + 1e-6)
+    row[f["newline_ratio"]] = _safe_div(raw.count("\n"), n_chars + 1e-6)
+    row[f["ellipsis_ratio"]] = _safe_div(raw.count("..."), max(1, n_chars))
+
+
+@_feature_group("repetition", ("rep_bigram_ratio", "rep_trigram_ratio"))
+def _group_repetition(ctx: _FeatureContext, row: np.ndarray) -> None:
+    words = ctx.doc.words
+
+    bigrams = list(zip(words, words[1:])) if len(words) >= 2 else []
+    trigrams = list(zip(words, words[1:], words[2:])) if len(words) >= 3 else []
+
+    bigram_counts = {}
+    for bg in bigrams:
+        bigram_counts[bg] = bigram_counts.get(bg, 0) + 1
+    trigram_counts = {}
+    for tg in trigrams:
+        trigram_counts[tg] = trigram_counts.get(tg, 0) + 1
+
+    repeated_bigrams = sum(1 for v in bigram_counts.values() if v >= 2)
+    repeated_trigrams = sum(1 for v in trigram_counts.values() if v >= 2)
+
+    f = _FEATURE_INDEX
+    row[f["rep_bigram_ratio"]] = _safe_div(repeated_bigrams, len(bigrams) + 1e-6)
+    row[f["rep_trigram_ratio"]] = _safe_div(repeated_trigrams, len(trigrams) + 1e-6)
+
+
+@_feature_group("starters", (
+    "starter_diversity", "starter2_diversity", "ending_diversity", "complete_sent_ratio",
+))
+def _group_starters(ctx: _FeatureContext, row: np.ndarray) -> None:
+    sents = ctx.doc.sents
+
+    # --- sentence starter diversity ---
+    starters = []
+    starter2 = []
+    for toks in ctx.sent_tokens:
+        if toks:
+            starters.append(toks[0])
+        if len(toks) >= 2:
+            starter2.append(f"{toks[0]}_{toks[1]}")
+
+    starter_diversity = _safe_div(len(set(starters)), len(starters) + 1e-6)
+    starter2_diversity = _safe_div(len(set(starter2)), len(starter2) + 1e-6)
+
+    # --- sentence ending variation ---
+    sent_endings = []
+    for s in sents:
+        s = s.strip()
+        if s.endswith("?"):
+            sent_endings.append("?")
+        elif s.endswith("!"):
+            sent_endings.append("!")
+        elif s.endswith("."):
+            sent_endings.append(".")
+        else:
+            sent_endings.append("other")
+    ending_diversity = _safe_div(len(set(sent_endings)), len(sent_endings) + 1e-6)
+
+    # --- sentence completeness proxy ---
+    complete_sent_ratio = _safe_div(
+        sum(1 for s in sents if s.strip().endswith((".", "?", "!"))),
+        len(sents) + 1e-6
+    )
+
+    f = _FEATURE_INDEX
+    row[f["starter_diversity"]] = starter_diversity
+    row[f["starter2_diversity"]] = starter2_diversity
+    row[f["ending_diversity"]] = ending_diversity
+    row[f["complete_sent_ratio"]] = complete_sent_ratio
+
+
+@_feature_group("coherence", (
+    "avg_adj_overlap", "std_adj_overlap", "over_coherence", "sentence_drift",
+))
+def _group_coherence(ctx: _FeatureContext, row: np.ndarray) -> None:
+    # --- adjacent sentence overlap (coherence proxy) ---
+    overlaps = ctx.adjacent_overlaps
+    avg_adj_overlap = _mean(overlaps)
+    std_adj_overlap = _std(overlaps)
+
+    # Over-coherence (AI flows too smoothly)
+    over_coherence = 1.0 - min(avg_adj_overlap / 0.8, 1.0)
+
+    f = _FEATURE_INDEX
+    row[f["avg_adj_overlap"]] = avg_adj_overlap
+    row[f["std_adj_overlap"]] = std_adj_overlap
+    row[f["over_coherence"]] = over_coherence
+    row[f["sentence_drift"]] = _sentence_drift_from_tokens(ctx.sent_tokens)
+
+
+@_feature_group("phrases", (
+    "transition_ratio", "formality_balance", "hedge_ratio", "self_ref_ratio",
+    "generic_ratio", "tone_shift_ratio", "personal_voice_ratio",
+))
+def _group_phrases(ctx: _FeatureContext, row: np.ndarray) -> None:
+    hits = ctx.phrase_hits
+    n_sents = ctx.n_sents
+
+    f = _FEATURE_INDEX
+    # discourse / transition markers
+    row[f["transition_ratio"]] = _safe_div(hits["ai_transitions"], n_sents + 1e-6)
+    # Formality consistency (AI tends to be overly consistent)
+    row[f["formality_balance"]] = _safe_div(hits["formal_words"], hits["informal_words"] + 1e-6)
+    # Hedging language (AI often hedges safely)
+    row[f["hedge_ratio"]] = _safe_div(hits["hedge_words"], ctx.n_words + 1e-6)
+    # Self-referential phrases
+    row[f["self_ref_ratio"]] = _safe_div(hits["self_ref_phrases"], n_sents + 1e-6)
+    # Generic phrasing (very strong AI signal)
+    row[f["generic_ratio"]] = _safe_div(hits["generic_phrases"], n_sents + 1e-6)
+    # Sudden tone shifts (AI fake drift)
+    row[f["tone_shift_ratio"]] = _safe_div(hits["tone_markers"], n_sents + 1e-6)
+    # Personal voice
+    row[f["personal_voice_ratio"]] = _safe_div(hits["first_person_specific"], n_sents + 1e-6)
+
+
+@_feature_group("readability", ("fk_grade", "flesch"))
+def _group_readability(ctx: _FeatureContext, row: np.ndarray) -> None:
+    # --- readability ---
+    fk_grade, flesch = readability_scores(ctx.doc.words, ctx.sent_word_lens)
+
+    f = _FEATURE_INDEX
+    row[f["fk_grade"]] = fk_grade
+    row[f["flesch"]] = flesch
+
+
+@_feature_group("entropy", ("char_entropy_3", "entropy_uniformity"))
+def _group_entropy(ctx: _FeatureContext, row: np.ndarray) -> None:
+    raw = ctx.raw
+
+    # --- entropy proxy ---
+    entropy_engine = CharNgramEntropy(raw, n=3)
+    char_entropy_3 = entropy_engine.entropy()
+
+    # Entropy inconsistency (human text fluctuates more)
+    chunk_size = max(50, int(len(raw) / 5))
+    entropy_chunks = entropy_engine.chunk_entropies(chunk_size)
+
+    entropy_std = _std(entropy_chunks)
+    entropy_uniformity = 1.0 - min(entropy_std / 1.5, 1.0)
+
+    f = _FEATURE_INDEX
+    row[f["char_entropy_3"]] = char_entropy_3
+    row[f["entropy_uniformity"]] = entropy_uniformity
+
+
+_FEATURE_GROUP_OF: Dict[str, str] = {
+    feat: name for name, (feats, _) in _FEATURE_GROUPS.items() for feat in feats
+}
+if sorted(_FEATURE_GROUP_OF) != sorted(DETECTOR_FEATURE_NAMES):
+    raise RuntimeError("Feature groups do not cover DETECTOR_FEATURE_NAMES exactly")
+
+
+def feature_groups_for(features) -> set:
+    """Groups needed to produce `features` (unknown names are ignored)."""
+    return {_FEATURE_GROUP_OF[k] for k in features if k in _FEATURE_GROUP_OF}
+
+# ---- Feature profiling ----
+
+FEATURE_PROFILE = os.getenv("FEATURE_PROFILE", "0") == "1"
+# allow POST /api/debug/profile (signed-in callers only) to switch profiling at runtime
+FEATURE_PROFILE_CONTROL = os.getenv("FEATURE_PROFILE_CONTROL", "0") == "1"
+
+# Document size buckets by characters (upper bounds; the last is open-ended)
+_PROFILE_SIZE_BUCKETS = (2000, 8000, 32000)
+# Histogram bin upper edges in ms; one extra bin counts anything slower
+_PROFILE_HIST_EDGES_MS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0)
+
+
+def _size_bucket(n_chars: int) -> str:
+    lower = 0
+    for upper in _PROFILE_SIZE_BUCKETS:
+        if n_chars < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+class FeatureProfiler:
+    """
+    Opt-in timing of feature extraction: per document-size bucket and
+    stage ("parse" plus one entry per feature group), a count, total, max
+    and a fixed-bin latency histogram. Turned on with FEATURE_PROFILE=1 or,
+    when FEATURE_PROFILE_CONTROL=1, POST /api/debug/profile; recording is
+    skipped entirely when off.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._docs: Dict[str, int] = {}
+        self._stages: Dict[Tuple[str, str], List[Any]] = {}
+        self.started_at = time.time()
+
+    def record(self, n_chars: int, timings: Dict[str, float]) -> None:
+        bucket = _size_bucket(n_chars)
+        with self._lock:
+            self._docs[bucket] = self._docs.get(bucket, 0) + 1
+            for stage, ms in timings.items():
+                entry = self._stages.get((bucket, stage))
+                if entry is None:
+                    # [count, total_ms, max_ms, histogram]
+                    entry = [0, 0.0, 0.0, [0] * (len(_PROFILE_HIST_EDGES_MS) + 1)]
+                    self._stages[(bucket, stage)] = entry
+                entry[0] += 1
+                entry[1] += ms
+                entry[2] = max(entry[2], ms)
+                entry[3][int(np.searchsorted(_PROFILE_HIST_EDGES_MS, ms))] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._stages.clear()
+            self.started_at = time.time()
+
+    @staticmethod
+    def _hist_percentile(hist: List[int], count: int, max_ms: float, q: float) -> float:
+        # upper edge of the bin holding the q-quantile, capped at the observed max
+        target = q * count
+        seen = 0
+        for i, c in enumerate(hist):
+            seen += c
+            if seen >= target and c:
+                edge = _PROFILE_HIST_EDGES_MS[i] if i < len(_PROFILE_HIST_EDGES_MS) else max_ms
+                return round(min(edge, max_ms), 3)
+        return round(max_ms, 3)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets: Dict[str, Any] = {}
+            for (bucket, stage), (count, total, max_ms, hist) in self._stages.items():
+                b = buckets.setdefault(bucket, {"docs": self._docs.get(bucket, 0), "stages": {}})
+                b["stages"][stage] = {
+                    "count": count,
+                    "total_ms": round(total, 3),
+                    "mean_ms": round(total / count, 4) if count else 0.0,
+                    "p50_ms": self._hist_percentile(hist, count, max_ms, 0.50),
+                    "p95_ms": self._hist_percentile(hist, count, max_ms, 0.95),
+                    "max_ms": round(max_ms, 3),
+                    "histogram": list(hist),
+                }
+
+        for b in buckets.values():
+            bucket_total = sum(st["total_ms"] for st in b["stages"].values()) or 1.0
+            for st in b["stages"].values():
+                st["share"] = round(st["total_ms"] / bucket_total, 4)
+
+        order = {_size_bucket(u - 1): i for i, u in enumerate(_PROFILE_SIZE_BUCKETS)}
+        return {
+            "enabled": self.enabled,
+            "since": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "histogram_edges_ms": list(_PROFILE_HIST_EDGES_MS),
+            "buckets": dict(sorted(buckets.items(), key=lambda kv: order.get(kv[0], len(order)))),
+        }
+
+
+FEATURE_PROFILER = FeatureProfiler(FEATURE_PROFILE)
+
+
+# ---- Feature cache ----
+
+# Bump whenever a change to the feature code alters feature values, so cached
+# rows from older code are never served.
+DETECTOR_FEATURE_VERSION = "5"
+
+FEATURE_CACHE_MAX_BYTES = int(os.getenv("FEATURE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+FEATURE_CACHE_SHARED_PATH = os.getenv("FEATURE_CACHE_SHARED_PATH", "")  # empty = per-worker only
+
+
+def _lang_code(lang_signals: Dict = None) -> Optional[str]:
+    # None for hand-built signal sets without a language code: not cacheable
+    return lang_signals.get("code") if lang_signals else "en"
+
+
+class SqliteKV:
+    """
+    Small key/value table in a local SQLite file.
+    WAL mode lets several uvicorn workers on one host read and write the
+    same file; every error is logged and treated as a miss. Connections are
+    opened on first use, one per thread and process, so CPU_POOL workers
+    forked after import never share the parent's connection. Calls block;
+    request handlers go through asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, table: str):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        self._pid = os.getpid()
+        try:
+            parent = os.path.dirname(os.path.abspath(path))
+            os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5.0)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"SQLite store {path}:{table} unavailable: {e}")
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # forked: connections opened by the parent are left untouched
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Tuple[bytes, float]]:
+        """(value, created_at) for a live key, else None."""
+        try:
+            row = self._conn().execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        except Exception as e:
+            logger.warning(f"SQLite read failed ({self.table}): {e}")
+            return None
+        if row is None:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: bytes) -> None:
+        try:
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"SQLite write failed ({self.table}): {e}")
+
+    def prune(self, max_rows: int, max_age: Optional[float] = None) -> None:
+        """Drop rows older than `max_age`, then the oldest beyond `max_rows`."""
+        try:
+            conn = self._conn()
+            if max_age is not None:
+                conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - max_age,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (max_rows,),
+            )
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"SQLite prune failed ({self.table}): {e}")
+
+
+class FeatureCache:
+    """
+    Bounded LRU of detector feature rows keyed by a hash of the text the
+    extractor sees, the language code and DETECTOR_FEATURE_VERSION.
+    Eviction is by bytes held. With a shared path, rows are also written
+    to a SQLite file so other workers can reuse them.
+    """
+
+    def __init__(self, max_bytes: int, shared_path: str = ""):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._shared = SqliteKV(shared_path, "feature_rows") if shared_path else None
+
+    @staticmethod
+    def make_key(text: str, lang_code: str = "en") -> str:
+        h = hashlib.sha256()
+        h.update(f"{DETECTOR_FEATURE_VERSION}\0{lang_code}\0".encode("utf-8"))
+        h.update((text or "").strip().encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        if self.max_bytes <= 0:
+            return None
+        row = self._get_memory(key)
+        if row is None and self._shared is not None:
+            row = self._from_shared(key, self._shared.get(key))
+        if row is None:
+            with self._lock:
+                self.misses += 1
+        return row
+
+    async def get_async(self, key: str) -> Optional[np.ndarray]:
+        """get() for the event loop: the shared level is read in a thread."""
+        if self.max_bytes <= 0:
+            return None
+        row = self._get_memory(key)
+        if row is None and self._shared is not None:
+            row = self._from_shared(key, await asyncio.to_thread(self._shared.get, key))
+        if row is None:
+            with self._lock:
+                self.misses += 1
+        return row
+
+    def put(self, key: str, row: np.ndarray) -> None:
+        if self.max_bytes <= 0:
+            return
+        self._remember(key, row)
+        if self._shared is not None:
+            self._shared.set(key, row.tobytes())
+
+    async def put_async(self, key: str, row: np.ndarray) -> None:
+        """put() for the event loop: the shared level is written in a thread."""
+        if self.max_bytes <= 0:
+            return
+        self._remember(key, row)
+        if self._shared is not None:
+            await asyncio.to_thread(self._shared.set, key, row.tobytes())
+
+    def _get_memory(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._entries.get(key)
+            if row is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return row
+
+    def _from_shared(self, key: str, hit: Optional[Tuple[bytes, float]]) -> Optional[np.ndarray]:
+        if hit is None:
+            return None
+        row = np.frombuffer(hit[0], dtype=np.float64).copy()
+        self._remember(key, row)
+        with self._lock:
+            self.shared_hits += 1
+        return row
+
+    def _remember(self, key: str, row: np.ndarray) -> None:
+        row.setflags(write=False)
+        size = sys.getsizeof(row) + sys.getsizeof(key)
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = row
+            self._sizes[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "shared": self._shared is not None,
+                "feature_version": DETECTOR_FEATURE_VERSION,
+            }
+
+
+_FEATURE_CACHE = FeatureCache(FEATURE_CACHE_MAX_BYTES, FEATURE_CACHE_SHARED_PATH)
+
+
+# ---- CPU worker pool ----
+
+CPU_POOL_MODE = os.getenv("CPU_POOL_MODE", "process")  # process | thread | inline
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", "64"))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+
+
+def _cpu_worker_init() -> None:
+    # workers forked from the fork server start with its RNG state; reseed so they differ
+    random.seed()
+
+
+class LatencyStats:
+    """Rolling latency samples (ms) per name, summarized for the debug endpoint."""
+
+    def __init__(self, window: int = 512):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ms: float) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {k: np.asarray(v, dtype=np.float64) for k, v in self._samples.items()}
+        return {
+            name: {
+                "count": int(v.size),
+                "p50_ms": round(float(np.percentile(v, 50)), 1),
+                "p95_ms": round(float(np.percentile(v, 95)), 1),
+                "max_ms": round(float(v.max()), 1),
+            }
+            for name, v in snapshot.items() if v.size
+        }
+
+
+class CpuPool:
+    """
+    Runs CPU-bound request work (feature extraction, sentence scoring,
+    post-processing) off the event loop so long documents do not stall
+    concurrent chat streams.
+
+    "process" (default) uses worker processes, so the work does not hold
+    the GIL the event loop needs; it falls back to threads if processes
+    cannot be started or the pool breaks. "inline" runs on the loop.
+    Workers are started by a fork server (spawned where that is missing),
+    never forked from the serving process: by the time the pool is first
+    used it runs gRPC and other threads, and forking those can deadlock.
+    At most `max_pending` jobs may be queued or running; callers beyond
+    that get a 503 instead of piling up behind a long queue.
+    Jobs must be module-level functions with picklable arguments.
+    If a worker process dies, the job it was running fails with a 503 and
+    later jobs go to a thread pool.
+    """
+
+    def __init__(self, mode: str, workers: int, max_pending: int):
+        self.mode = mode if mode in ("process", "thread", "inline") else "process"
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._latencies_ms: deque = deque(maxlen=512)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    try:
+                        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers,
+                            mp_context=multiprocessing.get_context(method),
+                            initializer=_cpu_worker_init,
+                        )
+                    except Exception as e:
+                        logger.warning(f"Process pool unavailable, using threads: {e}")
+                        self.mode = "thread"
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="cpu-pool"
+                    )
+            return self._executor
+
+    def _fall_back_to_threads(self, reason: str) -> None:
+        logger.warning(f"CPU process pool failed ({reason}); switching to threads")
+        with self._lock:
+            old = self._executor
+            self._executor = None
+            self.mode = "thread"
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        if self.mode == "inline":
+            return fn(*args)
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
+
+        self.pending += 1
+        self.submitted += 1
+        t0 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_executor(), fn, *args)
+            self.completed += 1
+            return result
+        except asyncio.CancelledError:
+            raise
+        except BrokenProcessPool as e:
+            # not retried: the job itself may be what killed the worker
+            self.failed += 1
+            self._fall_back_to_threads(str(e) or "broken pool")
+            raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+            self._latencies_ms.append((time.perf_counter() - t0) * 1000.0)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        lat = np.asarray(self._latencies_ms, dtype=np.float64)
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "job_ms_p50": round(float(np.percentile(lat, 50)), 2) if lat.size else 0.0,
+            "job_ms_p95": round(float(np.percentile(lat, 95)), 2) if lat.size else 0.0,
+        }
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a fixed sleep. Lag that
+    stays above a few milliseconds means something is blocking the loop
+    (and every open chat stream with it).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._samples_ms: deque = deque(maxlen=240)
+        self.max_ms = 0.0
+        self._task = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - t0 - self.interval) * 1000.0)
+            self._samples_ms.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        lag = np.asarray(self._samples_ms, dtype=np.float64)
+        return {
+            "running": self._task is not None,
+            "interval_ms": round(self.interval * 1000.0, 1),
+            "window": int(lag.size),
+            "last_ms": round(float(lag[-1]), 2) if lag.size else 0.0,
+            "mean_ms": round(float(lag.mean()), 2) if lag.size else 0.0,
+            "p99_ms": round(float(np.percentile(lag, 99)), 2) if lag.size else 0.0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests. The first caller for a key
+    starts the computation as a shared task; callers arriving while it
+    runs await that same task instead of starting their own.
+
+    Waiters await the task through asyncio.shield, so one disconnecting
+    client does not cancel the work for the others; the task is cancelled
+    only once every waiter has gone.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, List[Any]] = {}  # key -> [task, waiters]
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode("utf-8", "surrogatepass"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    async def run(self, key: str, factory):
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda _t, k=key, e=entry: self._forget(k, e))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+                self.abandoned += 1
+
+    def _forget(self, key: str, entry: List[Any]) -> None:
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,  # pipeline runs saved
+            "abandoned": self.abandoned,
+        }
+
+
+CPU_POOL = CpuPool(CPU_POOL_MODE, CPU_POOL_WORKERS, CPU_POOL_MAX_PENDING)
+LOOP_LAG = LoopLagMonitor(LOOP_LAG_INTERVAL)
+DETECT_FLIGHTS = SingleFlight()
+HUMANIZE_FLIGHTS = SingleFlight()
+LANG_SIGNAL_FLIGHTS = SingleFlight()
+
+
+# ---- OpenAI scheduler ----
+
+# Defaults for every model; OPENAI_MODEL_LIMITS overrides them per model as
+# "model=concurrency:rpm:tpm,..." (0 = unlimited), e.g. "gpt-4.1=8:500:30000".
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_MODEL_LIMITS = os.getenv("OPENAI_MODEL_LIMITS", "")
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_RETRY_BASE = float(os.getenv("OPENAI_RETRY_BASE", "0.5"))  # seconds
+OPENAI_RETRY_MAX = float(os.getenv("OPENAI_RETRY_MAX", "20"))  # seconds
+
+# Lower rank is served first when a model's slots are contended.
+OPENAI_PRIORITIES = {"chat": 0, "detect": 1, "humanize": 2}
+
+
+def _parse_model_limits(spec: str) -> Dict[str, Tuple[int, int, int]]:
+    limits: Dict[str, Tuple[int, int, int]] = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        model, _, values = item.partition("=")
+        try:
+            conc, rpm, tpm = (int(v) for v in values.split(":"))
+        except ValueError:
+            logger.warning(f"Ignoring malformed OPENAI_MODEL_LIMITS entry: {item!r}")
+            continue
+        limits[model.strip()] = (conc, rpm, tpm)
+    return limits
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units evenly over a minute. 0 means unlimited.
+    Callers that have to wait are served by rank (lower first), then in
+    arrival order; the best waiter is granted as soon as the bucket holds
+    enough for it, and a better-ranked arrival goes ahead of it.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    async def take(self, n: float, rank: int = 0) -> None:
+        if self.capacity <= 0:
+            return
+        n = min(n, self.capacity)
+        self._refill()
+        if not self._waiters and self.level >= n:
+            self.level -= n
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), n, fut))
+        self._grant()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.give_back(n)  # granted just as we were cancelled
+            raise
+
+    def _grant(self) -> None:
+        # grant waiters in order while the bucket covers the best one, then
+        # wake up again when it will
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._waiters:
+            _, _, n, fut = self._waiters[0]
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.level < n:
+                delay = (n - self.level) * 60.0 / self.capacity
+                self._timer = asyncio.get_running_loop().call_later(delay, self._grant)
+                return
+            heapq.heappop(self._waiters)
+            self.level -= n
+            fut.set_result(None)
+
+    def give_back(self, n: float) -> None:
+        # corrects an estimate once the real usage is known (n may be negative)
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level + n)
+        if n > 0 and self._waiters:
+            self._grant()
+
+
+class _ModelLane:
+    """Concurrency slots for one model, granted to waiters by priority."""
+
+    def __init__(self, limit: int, rpm: int, tpm: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rate_limited = 0
+
+    async def acquire(self, rank: int) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # granted just as we were cancelled: pass it on
+            raise
+
+    def release(self) -> None:
+        # hand the slot straight to the best waiter that is still waiting
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": sum(1 for _, _, f in self._waiters if not f.done()),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rate_limited": self.rate_limited,
+            "rpm_available": round(self.requests.level, 1) if self.requests.capacity else None,
+            "tpm_available": round(self.tokens.level) if self.tokens.capacity else None,
+        }
+
+
+class OpenAIScheduler:
+    """
+    Single entry point for chat completion calls. Each model gets a lane
+    with a concurrency limit and requests/tokens-per-minute buckets; when
+    the lane is full, waiters are served by priority class (chat, then
+    detect, then humanize). 429s, connection errors and 5xx responses are
+    retried with jittered exponential backoff, honouring Retry-After, and
+    without holding a slot while backing off.
+    """
+
+    def __init__(self, concurrency: int, rpm: int, tpm: int, overrides: Dict[str, Tuple[int, int, int]],
+                 max_retries: int, retry_base: float, retry_max: float):
+        self.defaults = (concurrency, rpm, tpm)
+        self.overrides = overrides
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._lanes: Dict[str, _ModelLane] = {}
+        self.queue_wait = LatencyStats()
+
+    def lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            lane = self._lanes[model] = _ModelLane(*self.overrides.get(model, self.defaults))
+        return lane
+
+    @staticmethod
+    def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+        chars = sum(len(str(m.get("content") or "")) for m in kwargs.get("messages") or [])
+        return chars // 4 + int(kwargs.get("max_tokens") or 1000)
+
+    @staticmethod
+    def _is_quota_error(err: Exception) -> bool:
+        # a 429 for an exhausted quota or billing problem, which retrying cannot fix
+        body = getattr(err, "body", None)
+        if isinstance(body, dict) and isinstance(body.get("error"), dict):
+            body = body["error"]
+        codes = {getattr(err, "code", None), getattr(err, "type", None)}
+        if isinstance(body, dict):
+            codes.update((body.get("code"), body.get("type")))
+        return "insufficient_quota" in codes
+
+    def _backoff(self, attempt: int, err: Exception) -> float:
+        retry_after = None
+        response = getattr(err, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        delay = retry_after if retry_after is not None else self.retry_base * (2 ** attempt)
+        return min(delay, self.retry_max) * random.uniform(0.5, 1.5)
+
+    async def create(self, priority: str, **kwargs):
+        """client.chat.completions.create, scheduled under `priority`."""
+        model = kwargs.get("model") or API_MODEL
+        lane = self.lane(model)
+        rank = OPENAI_PRIORITIES.get(priority, OPENAI_PRIORITIES["detect"])
+        estimate = self._estimate_tokens(kwargs)
+
+        attempt = 0
+        while True:
+            t0 = time.perf_counter()
+            # rate budget first, so a call waiting for it does not hold a slot
+            await lane.requests.take(1, rank)
+            try:
+                await lane.tokens.take(estimate, rank)
+            except BaseException:
+                lane.requests.give_back(1)
+                raise
+            try:
+                await lane.acquire(rank)
+            except BaseException:
+                lane.requests.give_back(1)
+                lane.tokens.give_back(estimate)
+                raise
+            self.queue_wait.record(f"{model}/{priority}", (time.perf_counter() - t0) * 1000.0)
+
+            try:
+                resp = await client.chat.completions.create(**kwargs)
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                lane.release()
+                if isinstance(e, RateLimitError):
+                    lane.rate_limited += 1
+                if attempt >= self.max_retries or (isinstance(e, RateLimitError) and self._is_quota_error(e)):
+                    lane.failed += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                lane.retried += 1
+                logger.warning(f"OpenAI {model} call failed ({type(e).__name__}); retry {attempt} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                lane.release()
+                lane.failed += 1
+                raise
+
+            if kwargs.get("stream"):
+                return self._held_stream(lane, resp)
+
+            lane.release()
+            lane.completed += 1
+            usage = getattr(resp, "usage", None)
+            used = getattr(usage, "total_tokens", None)
+            if isinstance(used, int):
+                lane.tokens.give_back(estimate - used)
+            return resp
+
+    @staticmethod
+    async def _held_stream(lane: _ModelLane, stream):
+        # a streamed call keeps its slot until the stream is drained or closed
+        try:
+            async for chunk in stream:
+                yield chunk
+            lane.completed += 1
+        finally:
+            lane.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": {model: lane.stats() for model, lane in self._lanes.items()},
+            "queue_wait": self.queue_wait.stats(),
+        }
+
+
+OPENAI_SCHEDULER = OpenAIScheduler(
+    OPENAI_MAX_CONCURRENCY, OPENAI_RPM, OPENAI_TPM, _parse_model_limits(OPENAI_MODEL_LIMITS),
+    OPENAI_MAX_RETRIES, OPENAI_RETRY_BASE, OPENAI_RETRY_MAX,
+)
+
+# Fire-and-forget tasks are kept referenced here until they finish
+_BACKGROUND_TASKS: set = set()
+
+
+def spawn_background(coro) -> None:
+    task = asyncio.ensure_future(coro)
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+
+async def extract_detector_features_async(
+    text: str,
+    lang_signals: Dict = None,
+    features: Optional[List[str]] = None,
+) -> FeatureVector:
+    """
+    extract_detector_features for request handlers: the feature cache is
+    consulted and filled here, only the computation runs on CPU_POOL.
+    """
+    if not (text or "").strip():
+        return FeatureVector.empty()
+
+    groups = feature_groups_for(features) if features is not None else None
+    code = _lang_code(lang_signals)
+    key = FeatureCache.make_key(text, code) if code else None
+    row = await _FEATURE_CACHE.get_async(key) if key else None
+
+    if row is None:
+        profile = FEATURE_PROFILER.enabled
+        try:
+            row, timings = await CPU_POOL.run(_feature_row_job, text, _job_signals_ref(lang_signals), groups, profile)
+        except _SignalsNotInWorker:
+            row, timings = await CPU_POOL.run(_feature_row_job, text, _job_signals_payload(lang_signals), groups, profile)
+        if timings is not None:
+            FEATURE_PROFILER.record(len(text.strip()), timings)
+        if key and groups is None:
+            await _FEATURE_CACHE.put_async(key, row)
+
+    if groups is None:
+        return FeatureVector(row)
+    return _features_from_row(row, groups)
+
+
+async def warm_feature_cache(text: str, lang_signals: Dict = None) -> None:
+    """Featurize `text` ahead of time so a later detect on it is a cache hit."""
+    try:
+        await extract_detector_features_async(text, lang_signals)
+    except Exception as e:
+        logger.warning(f"Feature cache warm-up failed: {e}")
+
+
+# Features read by looks_ai_like / build_feature_corrections, so the
+# humanizer can skip the groups neither of them looks at.
+LOOKS_AI_FEATURES = ("burstiness", "ttr", "char_entropy_3", "starter_diversity", "rep_bigram_ratio")
+CORRECTION_FEATURES = LOOKS_AI_FEATURES + ("avg_adj_overlap", "comma_ratio", "contraction_ratio")
+
+
 def looks_ai_like(f):
     return (
         f.get("burstiness", 1) < 0.35 or
@@ -1292,98 +3220,568 @@ def looks_ai_like(f):
     
 
 
-def apply_contractions(text: str) -> str:
-    for pattern, repl in CONTRACTION_MAP.items():
-        text = re.sub(pattern, repl, text, flags=re.IGNORECASE)
-    return text
+# ---- Incremental features ----
+# Feature state for a text held as a list of sentences, updated under
+# sentence edits in time proportional to the edited region: word, n-gram
+# and character trigram tables and the sentence statistics are adjusted
+# for the sentences that went out and came in instead of being recomputed.
+# Covers the features the humanizer loop reads. Values match
+# extract_detector_features on text() up to float32 rounding, provided each
+# sentence but the last ends in . ! or ? (otherwise the detector reads it
+# and the next one as a single sentence).
 
+_HUMANIZE_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
 
-def apply_human_postprocessing(text: str) -> str:
-    
-    # ---- Detect and preserve structured formatting ----
-    has_bullets = bool(re.search(r'^\s*[-*•]\s+', text, re.MULTILINE))
-    has_numbered = bool(re.search(r'^\s*\d+[\.\)]\s+', text, re.MULTILINE))
-    has_headings = bool(re.search(r'^\s*#{1,4}\s+', text, re.MULTILINE))
-    is_structured = has_bullets or has_numbered or has_headings
+# Edit lists touching more than this share of the sentences are spliced in
+# and the tables recounted from the (already tokenized) sentences instead.
+INCREMENTAL_RECOUNT_SHARE = float(os.getenv("INCREMENTAL_RECOUNT_SHARE", "0.25"))
+
+INCREMENTAL_FEATURES = (
+    "avg_sent_len", "std_sent_len", "burstiness", "ttr", "contraction_ratio", "comma_ratio",
+    "rep_bigram_ratio", "rep_trigram_ratio", "starter_diversity", "avg_adj_overlap", "char_entropy_3",
+)
+
+
+class SentenceEdit:
+    """
+    Replaces sentences [start, end) with `sentences`. An edit list is
+    applied in order, each edit indexing the list as the edits before it
+    left it.
+    """
 
+    __slots__ = ("start", "end", "sentences")
+
+    def __init__(self, start: int, end: int, sentences: List[str]):
+        self.start = start
+        self.end = end
+        self.sentences = sentences
+
+    @classmethod
+    def replace(cls, i: int, text: str) -> "SentenceEdit":
+        return cls(i, i + 1, [text])
+
+    @classmethod
+    def insert(cls, i: int, text: str) -> "SentenceEdit":
+        return cls(i, i, [text])
+
+    @classmethod
+    def delete(cls, i: int) -> "SentenceEdit":
+        return cls(i, i + 1, [])
+
+    @classmethod
+    def merge(cls, i: int, text: str) -> "SentenceEdit":
+        # sentences i and i + 1 become `text`
+        return cls(i, i + 2, [text])
+
+    @classmethod
+    def split(cls, i: int, first: str, second: str) -> "SentenceEdit":
+        return cls(i, i + 1, [first, second])
+
+    def __repr__(self) -> str:
+        return f"SentenceEdit({self.start}, {self.end}, {self.sentences!r})"
+
+
+class _CountTable:
+    """Counts per key, with the number of keys seen twice or more and, optionally, sum(c * log2 c)."""
+
+    __slots__ = ("counts", "total", "repeated", "clogc")
+
+    def __init__(self, entropy: bool = False):
+        self.counts: Dict[Any, int] = {}
+        self.total = 0
+        self.repeated = 0
+        self.clogc = 0.0 if entropy else None
+
+    def add(self, key, delta: int) -> None:
+        old = self.counts.get(key, 0)
+        new = old + delta
+        if new:
+            self.counts[key] = new
+        else:
+            del self.counts[key]
+        self.total += delta
+        self.repeated += (new >= 2) - (old >= 2)
+        if self.clogc is not None:
+            self.clogc += (new * math.log2(new) if new > 1 else 0.0) - (old * math.log2(old) if old > 1 else 0.0)
+
+    def update(self, keys, sign: int) -> None:
+        counts = Counter(keys)
+        if sign > 0 and not self.counts:
+            # filling an empty table: no per-key bookkeeping
+            self.counts = dict(counts)
+            self.total = sum(counts.values())
+            self.repeated = sum(1 for c in counts.values() if c >= 2)
+            if self.clogc is not None:
+                self.clogc = sum(c * math.log2(c) for c in counts.values() if c > 1)
+            return
+        for key, c in counts.items():
+            self.add(key, sign * c)
+
+    def entropy(self) -> float:
+        if self.total <= 0:
+            return 0.0
+        return max(0.0, math.log2(self.total) - self.clogc / self.total)
+
+
+class _SentenceRecord:
+    # one sentence of an IncrementalFeatures state, tokenized once
+    __slots__ = ("text", "sents", "words", "commas", "contractions", "trigrams", "block_len")
+
+    def __init__(self, text: str, contractions: set):
+        self.text = text
+        # detector sentences inside this one (it also breaks at newlines)
+        self.sents = [_tokenize_words(part) for part in _simple_sentence_split(text)]
+        self.words = [w for toks in self.sents for w in toks]
+        self.commas = text.count(",")
+        self.contractions = sum(1 for w in self.words if w in contractions)
+        # character trigrams starting in this sentence or the separator after it
+        self.trigrams: List[str] = []
+        self.block_len = 0
+
+
+class IncrementalFeatures:
+    """
+    INCREMENTAL_FEATURES for `sentences` joined by `separators` (a single
+    space between each pair by default), kept current under apply(edits).
+    Separators next to an edited region become single spaces.
+    """
+
+    def __init__(self, sentences: List[str], separators: Optional[List[str]] = None, lang_signals: Dict = None):
+        if separators is None:
+            sentences = [t.strip() for t in sentences if t and t.strip()]
+            separators = [" "] * max(len(sentences) - 1, 0)
+        if len(separators) != max(len(sentences) - 1, 0):
+            raise ValueError("need one separator between each pair of sentences")
+
+        self._contractions = lang_signals.get("contractions", _CONTRACTIONS) if lang_signals else _CONTRACTIONS
+        self.units = [_SentenceRecord(t, self._contractions) for t in sentences]
+        self.seps = list(separators)
+        self._recount()
+
+    def _recount(self) -> None:
+        self._words = _CountTable()
+        self._bigrams = _CountTable()
+        self._trigrams = _CountTable()
+        self._starters = _CountTable()
+        self._chars = _CountTable(entropy=True)
+        self._contraction_count = 0
+        self._commas = 0
+        self._n_chars = 0
+        self._n_sents = 0
+        self._len_sum = 0
+        self._len_sqsum = 0
+        self._overlap_sum = 0.0
+        self._overlap_count = 0
+
+        self._count_region(self.units, [], [], None, None, 1)
+        for j in range(len(self.units)):
+            self._measure_block(j)
+        self._chars.update(itertools.chain.from_iterable(u.trigrams for u in self.units), 1)
+        self._n_chars = sum(u.block_len for u in self.units)
+
+    @classmethod
+    def from_text(cls, text: str, lang_signals: Dict = None) -> "IncrementalFeatures":
+        """Splits like the humanizer engine, keeping the whitespace between sentences."""
+        raw = (text or "").strip()
+        if not raw:
+            return cls([], [], lang_signals)
+        sentences, separators = [], []
+        pos = 0
+        for m in _HUMANIZE_SENT_SPLIT_RE.finditer(raw):
+            sentences.append(raw[pos:m.start()])
+            separators.append(m.group())
+            pos = m.end()
+        sentences.append(raw[pos:])
+        return cls(sentences, separators, lang_signals)
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    @property
+    def sentences(self) -> List[str]:
+        return [u.text for u in self.units]
+
+    def text(self) -> str:
+        parts = []
+        for j, u in enumerate(self.units):
+            parts.append(u.text)
+            if j < len(self.seps):
+                parts.append(self.seps[j])
+        return "".join(parts)
+
+    # -- edits --
+
+    def apply(self, edits: List[SentenceEdit]) -> "IncrementalFeatures":
+        touched = sum(e.end - e.start + len(e.sentences) for e in edits)
+        if touched > INCREMENTAL_RECOUNT_SHARE * max(len(self.units), 1):
+            for edit in edits:
+                self._splice(edit.start, edit.end, self._records(edit.sentences))
+            self._recount()
+            return self
+        for edit in edits:
+            self._apply_one(edit.start, edit.end, edit.sentences)
+        return self
+
+    def set_separators(self, sep: str = " ") -> "IncrementalFeatures":
+        """Sets every separator to `sep`; only the ones that change are recounted."""
+        for k in range(len(self.seps)):
+            self.set_separator(k, sep)
+        return self
+
+    def set_separator(self, k: int, sep: str) -> "IncrementalFeatures":
+        """Sets the separator after sentence k."""
+        if self.seps[k] != sep:
+            lo = max(0, k - 1)
+            for j in range(lo, k + 1):
+                self._count_block(j, -1)
+            self.seps[k] = sep
+            for j in range(lo, k + 1):
+                self._count_block(j, 1)
+        return self
+
+    def _apply_one(self, start: int, end: int, texts: List[str]) -> None:
+        n = len(self.units)
+        if not 0 <= start <= end <= n:
+            raise IndexError(f"edit [{start}, {end}) out of range for {n} sentences")
+        new_units = self._records(texts)
+
+        # context that stays put but shares n-grams / adjacency with the region
+        left_words = self._words_before(start, 2)
+        right_words = self._words_from(end, 2)
+        left_sent = self.units[start - 1].sents[-1] if start > 0 else None
+        right_sent = self.units[end].sents[0] if end < n else None
+
+        # a trigram can reach two characters into the next block, and the
+        # block before the region can change its separator
+        lo = max(0, start - 2)
+        for j in range(lo, end):
+            self._count_block(j, -1)
+        self._count_region(self.units[start:end], left_words, right_words, left_sent, right_sent, -1)
+
+        self._splice(start, end, new_units)
+
+        self._count_region(new_units, left_words, right_words, left_sent, right_sent, 1)
+        for j in range(lo, start + len(new_units)):
+            self._count_block(j, 1)
+
+    def _records(self, texts: List[str]) -> List[_SentenceRecord]:
+        return [_SentenceRecord(t.strip(), self._contractions) for t in texts if t and t.strip()]
+
+    def _splice(self, start: int, end: int, new_units: List[_SentenceRecord]) -> None:
+        # units only; separators next to the region become single spaces
+        n = len(self.units)
+        if not 0 <= start <= end <= n:
+            raise IndexError(f"edit [{start}, {end}) out of range for {n} sentences")
+        self.units[start:end] = new_units
+        m = len(self.units)
+        lo_sep, hi_sep = max(start - 1, 0), min(end, n - 1)
+        kept = len(self.seps) - max(hi_sep - lo_sep, 0)
+        self.seps[lo_sep:max(hi_sep, lo_sep)] = [" "] * max(m - 1 - kept, 0)
+
+    def _words_before(self, i: int, k: int) -> List[str]:
+        out: List[str] = []
+        j = i - 1
+        while j >= 0 and len(out) < k:
+            out[:0] = self.units[j].words[-(k - len(out)):]
+            j -= 1
+        return out
+
+    def _words_from(self, i: int, k: int) -> List[str]:
+        out: List[str] = []
+        j = i
+        while j < len(self.units) and len(out) < k:
+            out.extend(self.units[j].words[:k - len(out)])
+            j += 1
+        return out
+
+    def _count_region(self, units, left_words, right_words, left_sent, right_sent, sign: int) -> None:
+        region_words: List[str] = []
+        chain = [left_sent] if left_sent is not None else []
+        for u in units:
+            region_words.extend(u.words)
+            self._contraction_count += sign * u.contractions
+            self._commas += sign * u.commas
+            for toks in u.sents:
+                chain.append(toks)
+                self._n_sents += sign
+                self._len_sum += sign * len(toks)
+                self._len_sqsum += sign * len(toks) * len(toks)
+                if toks:
+                    self._starters.add(toks[0], sign)
+        if right_sent is not None:
+            chain.append(right_sent)
+
+        self._words.update(region_words, sign)
+
+        # n-grams over left context + region + right context, except the
+        # ones lying wholly inside either context
+        seq = left_words + region_words + right_words
+        a, b = len(left_words), len(left_words) + len(region_words)
+        lo, hi = max(a - 1, 0), min(b, len(seq) - 1)
+        self._bigrams.update(zip(seq[lo:hi], seq[lo + 1:hi + 1]), sign)
+        lo, hi = max(a - 2, 0), min(b, len(seq) - 2)
+        self._trigrams.update(zip(seq[lo:hi], seq[lo + 1:hi + 1], seq[lo + 2:hi + 2]), sign)
+
+        for x, y in zip(chain, chain[1:]):
+            self._overlap_sum += sign * _jaccard_overlap(x, y)
+            self._overlap_count += sign
+
+    def _measure_block(self, j: int) -> None:
+        u = self.units[j]
+        block = u.text + (self.seps[j] if j < len(self.seps) else "")
+        if j + 1 < len(self.units):
+            ahead = (self.units[j + 1].text + (self.seps[j + 1] if j + 1 < len(self.seps) else ""))[:2]
+        else:
+            ahead = ""
+        s = block + ahead
+        u.trigrams = [s[p:p + 3] for p in range(min(len(block), len(s) - 2))]
+        u.block_len = len(block)
+
+    def _count_block(self, j: int, sign: int) -> None:
+        u = self.units[j]
+        if sign > 0:
+            self._measure_block(j)
+        self._chars.update(u.trigrams, sign)
+        self._n_chars += sign * u.block_len
+
+    # -- features --
+
+    def features(self) -> Dict[str, float]:
+        n_words = self._words.total
+        if not self.units:
+            return {name: 0.0 for name in INCREMENTAL_FEATURES}
+
+        if self._n_sents:
+            avg_sent_len = self._len_sum / self._n_sents
+            std_sent_len = math.sqrt(max(self._len_sqsum / self._n_sents - avg_sent_len * avg_sent_len, 0.0))
+        else:
+            avg_sent_len, std_sent_len = float(n_words), 0.0
+
+        return {
+            "avg_sent_len": avg_sent_len,
+            "std_sent_len": std_sent_len,
+            "burstiness": _safe_div(std_sent_len, avg_sent_len + 1e-6),
+            "ttr": _safe_div(len(self._words.counts), n_words + 1e-6),
+            "contraction_ratio": _safe_div(self._contraction_count, n_words + 1e-6),
+            "comma_ratio": _safe_div(self._commas, self._n_chars + 1e-6),
+            "rep_bigram_ratio": _safe_div(self._bigrams.repeated, self._bigrams.total + 1e-6),
+            "rep_trigram_ratio": _safe_div(self._trigrams.repeated, self._trigrams.total + 1e-6),
+            "starter_diversity": _safe_div(len(self._starters.counts), self._starters.total + 1e-6),
+            "avg_adj_overlap": self._overlap_sum / self._overlap_count if self._overlap_count else 0.0,
+            "char_entropy_3": self._chars.entropy(),
+        }
+
+
+# ---- Humanizer rewrite engine ----
+# The local tail of a humanizer rewrite works on one sentence list for the
+# whole job instead of re-splitting the text for every step. Edits mark the
+# sentences they touch; only those are re-split afterwards, and the looks-AI
+# check reads an IncrementalFeatures state updated with just those edits.
+
+
+def _compile_contraction_map(mapping: Dict[str, str]) -> re.Pattern:
+    """
+    CONTRACTION_MAP as one alternation, so contractions are applied in one
+    scan instead of one per entry. Entries are \\b-wrapped phrases; the
+    shared word boundaries are factored out and a lookahead on the first
+    letters lets the scan skip most positions without trying every branch.
+    """
+    bodies = [p[2:-2] if p.startswith(r"\b") and p.endswith(r"\b") else None for p in mapping]
+    if any(b is None for b in bodies):
+        return re.compile("|".join(f"(?P<c{i}>{p})" for i, p in enumerate(mapping)), re.IGNORECASE)
+    branches = "|".join(f"(?P<c{i}>{b})" for i, b in enumerate(bodies))
+    firsts = {b[0].lower() for b in bodies}
+    lead = f"(?=[{''.join(sorted(firsts))}])" if all(c.isalpha() for c in firsts) else ""
+    return re.compile(rf"\b{lead}(?:{branches})\b", re.IGNORECASE)
+
+
+_CONTRACTION_RE = _compile_contraction_map(CONTRACTION_MAP)
+_CONTRACTION_REPL = {f"c{i}": repl for i, repl in enumerate(CONTRACTION_MAP.values())}
+
+_EM_DASH_RE = re.compile(r"\s*—\s*")
+_EN_DASH_RE = re.compile(r"\s*–\s*")
+_DOUBLE_COMMA_RE = re.compile(r",\s*,")
+
+_DRIFT_PHRASES = [
+    "Or at least, that's the idea.",
+    "Now that I think about it.",
+    "It's not always that simple though.",
+    "Which is interesting, actually.",
+    "Maybe that's just one way to see it."
+]
+_INTERRUPTIONS = ["Honestly,", "In a way,", "Come to think of it,", "Well,", "At least sometimes,"]
+
+
+def _is_structured_text(text: str) -> bool:
     # If the text is structured (lists, headings), skip sentence-level
     # post-processing entirely — it breaks list formatting
-    if is_structured:
-        return text
-    
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-
-    if len(sentences) < 2:
-        return text
-
-    # Use lightweight inline checks instead of full feature extraction
-    words_list = text.split()
-    n_words_local = max(len(words_list), 1)
-    sents_local = re.split(r'(?<=[.!?])\s+', text.strip())
-    sent_lens_local = [len(s.split()) for s in sents_local] if sents_local else [n_words_local]
-    avg_len_local = sum(sent_lens_local) / max(len(sent_lens_local), 1)
-    std_len_local = (sum((x - avg_len_local)**2 for x in sent_lens_local) / max(len(sent_lens_local), 1)) ** 0.5
-    burstiness_local = std_len_local / (avg_len_local + 1e-6)
-
-    # Simulate the features dict with just what post-processing needs
-    features = {
-        "burstiness": burstiness_local,
-        "avg_sent_len": avg_len_local,
-        "avg_adj_overlap": 0.3,  # neutral default — GPT already handled this
-        "contraction_ratio": sum(1 for w in words_list if "'" in w) / n_words_local,
-        "complete_sent_ratio": sum(1 for s in sents_local if s.strip().endswith((".", "?", "!"))) / max(len(sents_local), 1),
-    }
+    return bool(_BULLET_LINE_RE.search(text) or _NUMBERED_LINE_RE.search(text) or _HEADING_LINE_RE.search(text))
+
 
-    # ---- 1. Adaptive sentence merging (based on burstiness) ----
-    if features.get("burstiness", 1) < 0.45:
-        i = random.randint(0, len(sentences) - 2)
-        sentences[i] = sentences[i].rstrip(".") + " " + sentences[i + 1].lower()
-        del sentences[i + 1]
-
-    # ---- 2. Adaptive sentence splitting (low variation OR long sentences) ----
-    i = 0
-    while i < len(sentences):
-        s = sentences[i]
-        words = s.split()
-
-        if (len(words) > 20 or features.get("avg_sent_len", 0) > 18) and random.random() < 0.6:
-            split_point = random.randint(len(words)//3, 2*len(words)//3)
-            first = " ".join(words[:split_point]).strip() + "."
-            second = " ".join(words[split_point:]).strip()
-
-            sentences[i] = first
-            sentences.insert(i + 1, second)
+class HumanizerRewrite:
+    """
+    A text split once into sentences (the pieces of
+    `_HUMANIZE_SENT_SPLIT_RE.split(text.strip())`), with per-sentence
+    whitespace word counts cached. After every postprocess() the list again
+    equals the split of text(), so a second pass sees exactly what a fresh
+    split would. `features`, if given, must describe the same text; it is
+    kept current with each pass's sentence edits.
+    """
+
+    __slots__ = ("sentences", "structured", "changed", "_text", "_ws", "_features")
+
+    def __init__(self, text: str, features: Optional[IncrementalFeatures] = None):
+        self.sentences = _HUMANIZE_SENT_SPLIT_RE.split(text.strip())
+        self.structured = _is_structured_text(text)
+        self.changed = False
+        self._text = text
+        self._ws: List[Optional[Tuple[int, int]]] = [None] * len(self.sentences)
+        self._features = features
+
+    def text(self) -> str:
+        return self._text
+
+    def _ws_counts(self, i: int) -> Tuple[int, int]:
+        # (whitespace-separated words, words with an apostrophe)
+        counts = self._ws[i]
+        if counts is None:
+            words = self.sentences[i].split()
+            counts = (len(words), sum(1 for w in words if "'" in w))
+            self._ws[i] = counts
+        return counts
+
+    def postprocess(self) -> "HumanizerRewrite":
+        """Imperfection pass (merge, split, drift, interruption, fragment)."""
+        if self.structured or len(self.sentences) < 2:
+            return self
+        self.changed = True
+
+        sentences = self.sentences
+        # index of each sentence in the pre-edit list, -1 once edited
+        origin = list(range(len(sentences)))
+
+        # Use lightweight inline checks instead of full feature extraction
+        counts = [self._ws_counts(i) for i in range(len(sentences))]
+        sent_lens = [c[0] for c in counts]
+        n_words = max(sum(sent_lens), 1)
+        avg_len = sum(sent_lens) / len(sent_lens)
+        std_len = (sum((x - avg_len) ** 2 for x in sent_lens) / len(sent_lens)) ** 0.5
+        burstiness = std_len / (avg_len + 1e-6)
+        contraction_ratio = sum(c[1] for c in counts) / n_words
+        complete_sent_ratio = sum(1 for s in sentences if s.strip().endswith((".", "?", "!"))) / len(sentences)
+        avg_adj_overlap = 0.3  # neutral default — GPT already handled this
+
+        # ---- 1. Adaptive sentence merging (based on burstiness) ----
+        if burstiness < 0.45:
+            i = random.randint(0, len(sentences) - 2)
+            sentences[i] = sentences[i].rstrip(".") + " " + sentences[i + 1].lower()
+            del sentences[i + 1]
+            del sent_lens[i + 1]
+            del origin[i + 1]
+            sent_lens[i] = -1  # re-count below
+            origin[i] = -1
+
+        # ---- 2. Adaptive sentence splitting (low variation OR long sentences) ----
+        i = 0
+        while i < len(sentences):
+            n = sent_lens[i] if sent_lens[i] >= 0 else len(sentences[i].split())
+
+            if (n > 20 or avg_len > 18) and random.random() < 0.6:
+                words = sentences[i].split()
+                split_point = random.randint(len(words)//3, 2*len(words)//3)
+                sentences[i] = " ".join(words[:split_point]).strip() + "."
+                sentences.insert(i + 1, " ".join(words[split_point:]).strip())
+                sent_lens.insert(i + 1, -1)
+                origin[i] = -1
+                origin.insert(i + 1, -1)
+                i += 1
             i += 1
-        i += 1
-
-    # ---- 3. Thought drift (VERY important upgrade) ----
-    drift_phrases = [
-        "Or at least, that's the idea.",
-        "Now that I think about it.",
-        "It's not always that simple though.",
-        "Which is interesting, actually.",
-        "Maybe that's just one way to see it."
-    ]
 
-    if features.get("avg_adj_overlap", 0) > 0.5 or random.random() < 0.15:
-        i = random.randint(0, len(sentences) - 1)
-        sentences[i] = sentences[i].rstrip(".") + ". " + random.choice(drift_phrases)
+        # ---- 3. Thought drift (VERY important upgrade) ----
+        if avg_adj_overlap > 0.5 or random.random() < 0.15:
+            i = random.randint(0, len(sentences) - 1)
+            sentences[i] = sentences[i].rstrip(".") + ". " + random.choice(_DRIFT_PHRASES)
+            origin[i] = -1
+
+        # ---- 4. Controlled interruptions (NOT too frequent) ----
+        if contraction_ratio < 0.03 or random.random() < 0.3:
+            i = random.randint(0, len(sentences) - 1)
+            sentences[i] = random.choice(_INTERRUPTIONS) + " " + sentences[i].lstrip()
+            origin[i] = -1
+
+        # ---- 5. Fragment injection (only when too clean) ----
+        if complete_sent_ratio > 0.95 and random.random() < 0.4:
+            i = random.randint(0, len(sentences) - 1)
+            words = sentences[i].split()
+            if len(words) > 7:
+                sentences[i] = " ".join(words[:random.randint(3, 6)]) + "..."
+                origin[i] = -1
+
+        # the pass's output keeps any whitespace an edit left at a sentence
+        # edge; the sentence list is re-split from it
+        self._text = " ".join(sentences)
+        self.structured = _is_structured_text(self._text)  # an edit can put "2024. Now" on its own line
+        self._resplit(origin)
+        return self
+
+    def _resplit(self, origin: List[int]) -> None:
+        """
+        Restores the split invariant after edits. Untouched sentences keep
+        their caches; each run of edited ones is joined with the sentence
+        after it (an edit that dropped the final stop fuses with it) and
+        split again. The same runs, as spans of the pre-edit list, are the
+        edits passed on to the feature state.
+        """
+        sentences: List[str] = []
+        ws: List[Optional[Tuple[int, int]]] = []
+        edits: List[SentenceEdit] = []
+        pending: List[str] = []
+        old_pos = 0  # first pre-edit sentence not yet kept or replaced
+
+        n = len(self.sentences)
+        i = 0
+        while i < n:
+            if origin[i] >= 0:
+                if pending or old_pos < origin[i]:
+                    edits.append(SentenceEdit(old_pos, origin[i], pending))
+                    pending = []
+                old_pos = origin[i] + 1
+                sentences.append(self.sentences[i])
+                ws.append(self._ws[origin[i]])
+                i += 1
+                continue
+            j = i
+            while j < n and origin[j] < 0:
+                j += 1
+            end = min(j + 1, n)
+            window = " ".join(self.sentences[i:end]).strip()
+            parts = _HUMANIZE_SENT_SPLIT_RE.split(window) if window else []
+            sentences.extend(parts)
+            ws.extend([None] * len(parts))
+            pending.extend(parts)
+            i = end
+        if pending or old_pos < len(self._ws):
+            edits.append(SentenceEdit(old_pos, len(self._ws), pending))
+
+        self.sentences = sentences
+        self._ws = ws
+        if self._features is not None:
+            # right to left, so each edit's span is still in pre-edit positions
+            self._features.apply(edits[::-1]).set_separators(" ")
+
+    def stats(self) -> Dict[str, float]:
+        """INCREMENTAL_FEATURES for text(), as extract_detector_features would give them."""
+        if self._features is None:
+            self._features = IncrementalFeatures.from_text(self._text)
+        return self._features.features()
 
-    # ---- 4. Controlled interruptions (NOT too frequent) ----
-    inserts = ["Honestly,", "In a way,", "Come to think of it,", "Well,", "At least sometimes,"]
 
-    if features.get("contraction_ratio", 1) < 0.03 or random.random() < 0.3:
-        i = random.randint(0, len(sentences) - 1)
-        sentences[i] = random.choice(inserts) + " " + sentences[i].lstrip()
+def apply_contractions(text: str) -> str:
+    return _CONTRACTION_RE.sub(lambda m: _CONTRACTION_REPL[m.lastgroup], text)
 
-    # ---- 5. Fragment injection (only when too clean) ----
-    if features.get("complete_sent_ratio", 1) > 0.95 and random.random() < 0.4:
-        i = random.randint(0, len(sentences) - 1)
-        words = sentences[i].split()
-        if len(words) > 7:
-            sentences[i] = " ".join(words[:random.randint(3, 6)]) + "..."
 
-    return " ".join(sentences)
+def apply_human_postprocessing(text: str) -> str:
+    return HumanizerRewrite(text).postprocess().text()
 
 
 
@@ -1421,22 +3819,78 @@ def build_feature_corrections(features: dict) -> str:
 
 def normalize_punctuation(text: str) -> str:
     # Replace most hyphens used as dashes with commas
-    text = re.sub(r"\s*—\s*", ", ", text)  # em-dash → comma
-    text = re.sub(r"\s*–\s*", ", ", text)  # en-dash → comma
+    text = _EM_DASH_RE.sub(", ", text)  # em-dash → comma
+    text = _EN_DASH_RE.sub(", ", text)  # en-dash → comma
 
     # Clean up any double commas from replacement
-    text = re.sub(r",\s*,", ",", text)
+    text = _DOUBLE_COMMA_RE.sub(",", text)
     return text.strip()
 
+
+def finish_humanized_text(text: str, features: Optional[IncrementalFeatures] = None) -> str:
+    """
+    Local passes that close out a humanizer rewrite: imperfection
+    post-processing (twice if the result still looks AI-like), contraction
+    injection and punctuation cleanup. Runs as one CPU_POOL job. `features`
+    is an IncrementalFeatures state of `text` to update instead of building
+    one for the looks-AI check.
+    """
+    doc = HumanizerRewrite(text, features).postprocess()
+
+    # a text the first pass left alone (or that now reads as a list) is
+    # left alone by a second one, so skip the check
+    if doc.changed and not doc.structured and looks_ai_like(doc.stats()):
+        doc.postprocess()
+
+    text = apply_contractions(doc.text())
+    return normalize_punctuation(text)
+
+
+def check_or_finish_humanized_text(text: str, entropy_line: Optional[str] = None) -> Tuple[str, str]:
+    """
+    CPU_POOL job at the end of a rewrite's second pass: (corrections, "")
+    when build_feature_corrections asks for a correction pass, otherwise
+    ("", finished text). The feature state built for the check is carried
+    into finish_humanized_text, which only updates it for the sentences
+    post-processing edits.
+    """
+    features = IncrementalFeatures.from_text(text)
+    corrections = build_feature_corrections(features.features())
+    if corrections:
+        return corrections, ""
+    if entropy_line:
+        text, features = _append_entropy_line(text, features, entropy_line)
+    return "", finish_humanized_text(text, features)
+
+
+def _append_entropy_line(text: str, features: IncrementalFeatures, line: str) -> Tuple[str, IncrementalFeatures]:
+    """`text` with `line` as a paragraph of its own, and `features` (a state of `text`) made to match it."""
+    sep = text[len(text.rstrip()):] + "\n\n"
+    text += "\n\n" + line
+    last = features.units[-1].text if len(features) else ""
+    if last.endswith((".", "!", "?")) and _HUMANIZE_SENT_SPLIT_RE.split(line.strip()) == [line]:
+        # the line splits off as one more sentence
+        features.apply([SentenceEdit.insert(len(features), line)]).set_separator(len(features) - 2, sep)
+        return text, features
+    # it merges into the rewrite's last sentence, or splits into several
+    return text, IncrementalFeatures.from_text(text)
+
+
+def finish_humanized_paragraphs(text: str) -> str:
+    # finish_humanized_text flattens paragraph breaks; chunks of a long
+    # input are finished paragraph by paragraph to keep their layout
+    return "\n\n".join(finish_humanized_text(p) for p in _paragraph_split(text))
+
 # ---------------------------
 # Model loading + scoring
 # ---------------------------
 
 _DETECT_MODEL = None
 _DETECT_FEATURE_ORDER: List[str] = []
+_DETECT_FEATURE_COLS = None  # index array or slice into a feature row
 
 def load_detector_model():
-    global _DETECT_MODEL, _DETECT_FEATURE_ORDER
+    global _DETECT_MODEL, _DETECT_FEATURE_ORDER, _DETECT_FEATURE_COLS
     if joblib is None:
         logger.warning("joblib not installed; detector will run in heuristic+GPT mode only.")
         return
@@ -1446,6 +3900,11 @@ def load_detector_model():
             _DETECT_MODEL = joblib.load(DETECTOR_MODEL_PATH)
             meta = joblib.load(DETECTOR_VECTORS_PATH)
             _DETECT_FEATURE_ORDER = meta.get("feature_order", [])
+            if list(_DETECT_FEATURE_ORDER) == list(DETECTOR_FEATURE_NAMES):
+                # canonical order: model input is a view of the feature row
+                _DETECT_FEATURE_COLS = slice(0, len(DETECTOR_FEATURE_NAMES))
+            else:
+                _DETECT_FEATURE_COLS = _feature_columns(_DETECT_FEATURE_ORDER)
             logger.info(f"Loaded detector model from {DETECTOR_MODEL_PATH} with {_DETECT_FEATURE_ORDER=}")
         else:
             logger.warning("Detector model artifacts not found. Using heuristic+GPT mode until trained.")
@@ -1453,29 +3912,43 @@ def load_detector_model():
         logger.exception(f"Failed to load detector model: {e}")
         _DETECT_MODEL = None
         _DETECT_FEATURE_ORDER = []
+        _DETECT_FEATURE_COLS = None
 
 # call once at startup
 load_detector_model()
 
-def _vectorize(feats: Dict[str, float]) -> np.ndarray:
+def _vectorize(feats) -> np.ndarray:
+    if isinstance(feats, FeatureVector) and _DETECT_FEATURE_COLS is not None:
+        # no copy when the model uses the canonical feature order
+        return feats.columns(_DETECT_FEATURE_COLS).reshape(1, -1)
     # if no learned order, use sorted keys (stable)
     order = _DETECT_FEATURE_ORDER or sorted(feats.keys())
-    vec = np.array([feats.get(k, 0.0) for k in order], dtype=np.float32).reshape(1, -1)
-    return vec
+    vec = np.fromiter((feats.get(k, 0.0) for k in order), dtype=np.float32, count=len(order))
+    return vec.reshape(1, -1)
 
-def ml_ai_probability(text: str) -> Tuple[Optional[float], Dict[str, float]]:
-    feats = extract_detector_features(text)
+def ml_ai_probability(text: str, lang_signals: Dict = None) -> Tuple[Optional[float], FeatureVector]:
+    feats = extract_detector_features(text, lang_signals)
+    return ml_ai_probability_from_features(feats), feats
+
+def ml_ai_probability_from_features(feats) -> Optional[float]:
+    if _DETECT_MODEL is None:
+        return None
+    return _predict_ai(_vectorize(feats))[0]
+
+def ml_ai_probability_batch(texts: List[str], lang_signals: Dict = None) -> Optional[np.ndarray]:
+    """Bulk scoring: AI probability per text, or None when no model is loaded."""
     if _DETECT_MODEL is None:
-        return None, feats
+        return None
+    X = extract_detector_features_batch(texts, _DETECT_FEATURE_ORDER, lang_signals)
+    return _predict_ai(X)
 
+def _predict_ai(X: np.ndarray) -> List[Optional[float]]:
     try:
-        X = _vectorize(feats)
         # assumes binary classifier with predict_proba
-        p = float(_DETECT_MODEL.predict_proba(X)[0][1])  # class 1 = AI
-        return p, feats
+        return [float(p) for p in _DETECT_MODEL.predict_proba(X)[:, 1]]  # class 1 = AI
     except Exception as e:
         logger.exception(f"ML scoring failed: {e}")
-        return None, feats
+        return [None] * len(X)
 
 def heuristic_ai_probability(feats: Dict[str, float]) -> float:
     """
@@ -1574,6 +4047,141 @@ def structural_score(feats: Dict[str, float]) -> float:
 
     return max(0.0, min(score, 1.0))
 
+
+# ---- Sentence alignment ----
+
+ALIGN_PREFIX_WORDS = 3
+ALIGN_MIN_CONFIDENCE = float(os.getenv("ALIGN_MIN_CONFIDENCE", "0.5"))
+# Snippets the judge may skip before a match needs full agreement to count
+# (long documents are judged in windows, so large gaps are legitimate).
+ALIGN_MAX_SKIP = 16
+ALIGN_JUMP_MIN_WORDS = 5
+
+
+def _align_tokens(text: str) -> List[str]:
+    return _UNICODE_WORD_RE.findall((text or "").lower().replace("\u2019", "'"))
+
+
+def align_judge_sentences(sentences: List[str], snippets: List[str]) -> List[Tuple[Optional[int], float]]:
+    """
+    Matches split sentences to the judge's sentence snippets ("first ~8
+    words") in document order. Snippets are indexed by their first
+    ALIGN_PREFIX_WORDS normalized words; each sentence takes the first
+    snippet after the previous match that shares its prefix, so the
+    alignment is monotonic and runs in O(S + G).
+
+    Returns (snippet index or None, confidence) per sentence, where
+    confidence is the share of the snippet's words that agree with the
+    start of the sentence. Matches below ALIGN_MIN_CONFIDENCE are dropped,
+    and a match more than ALIGN_MAX_SKIP snippets ahead is only taken when
+    a snippet of at least ALIGN_JUMP_MIN_WORDS words agrees entirely, so one
+    stray prefix collision cannot derail the rest of the alignment.
+    """
+    snippet_tokens = [_align_tokens(s) for s in snippets]
+    index: Dict[Tuple[str, ...], List[int]] = {}
+    for j, toks in enumerate(snippet_tokens):
+        if toks:
+            index.setdefault(tuple(toks[:ALIGN_PREFIX_WORDS]), []).append(j)
+    key_lengths = sorted({len(k) for k in index}, reverse=True)
+    cursors = dict.fromkeys(index, 0)  # per prefix: first candidate not yet passed
+
+    aligned: List[Tuple[Optional[int], float]] = []
+    next_j = 0
+    for sent in sentences:
+        toks = _align_tokens(sent)
+        match: Optional[int] = None
+        confidence = 0.0
+        for n in key_lengths:
+            key = tuple(toks[:n])
+            if len(key) < n or key not in index:
+                continue
+            candidates = index[key]
+            pos = cursors[key]
+            while pos < len(candidates) and candidates[pos] < next_j:
+                pos += 1
+            cursors[key] = pos
+            if pos == len(candidates):
+                continue
+
+            j = candidates[pos]
+            snippet = snippet_tokens[j]
+            common = 0
+            for a, b in zip(snippet, toks):
+                if a != b:
+                    break
+                common += 1
+            confidence = common / len(snippet)
+            if j - next_j > ALIGN_MAX_SKIP:
+                accepted = confidence == 1.0 and len(snippet) >= ALIGN_JUMP_MIN_WORDS
+            else:
+                accepted = confidence >= ALIGN_MIN_CONFIDENCE
+            if accepted:
+                match = j
+                next_j = j + 1
+                cursors[key] = pos + 1
+            break
+
+        aligned.append((match, round(confidence, 4) if match is not None else 0.0))
+    return aligned
+
+
+_PERSONAL_WORDS = {"i", "my", "me", "we", "our", "you", "your"}
+
+
+def score_sentences(
+    sentences: List[str],
+    judge_sentences: List[Tuple[str, float]],
+    doc_avg_sent_len: Optional[float] = None,
+) -> List[Tuple[float, bool, float]]:
+    """
+    (AI probability, highlighted, match confidence) for each sentence of a
+    detect request. Sentences aligned to one the GPT judge scored take its
+    value; the rest fall back to a phrase/length/voice heuristic and get a
+    match confidence of 0. Runs as one CPU_POOL job per request.
+    """
+    alignment = align_judge_sentences(sentences, [text for text, _ in judge_sentences])
+
+    scored = []
+    for s, (match, confidence) in zip(sentences, alignment):
+        best_match_prob: Optional[float] = None
+        s_words = _tokenize_words(s)
+
+        # -------------------
+        # GPT sentence match
+        # -------------------
+        if match is not None:
+            best_match_prob = judge_sentences[match][1]
+
+        # -------------------
+        # fallback sentence heuristic
+        # -------------------
+        if best_match_prob is None:
+            s_hits = _SENTENCE_PHRASE_MATCHER.count(s_words)
+
+            s_trans = s_hits["ai_transitions"]
+            s_generic = s_hits["generic_phrases"]
+
+            s_len = len(s_words)
+            doc_avg = s_len if doc_avg_sent_len is None else doc_avg_sent_len
+            length_uniformity = 1.0 - min(abs(s_len - doc_avg) / max(doc_avg, 1), 1.0)
+
+            has_personal = any(w in _PERSONAL_WORDS for w in s_words)
+
+            best_match_prob = (
+                0.35 * min((s_trans + s_generic) / 2.0, 1.0) +
+                0.30 * length_uniformity +
+                0.35 * (0.0 if has_personal else 0.5)
+            )
+
+        # -------------------
+        # FINAL SENTENCE SCORE
+        # -------------------
+        s_prob = round(max(0.0, min(best_match_prob, 1.0)), 4)
+        highlighted = s_prob >= 0.70 and len(s_words) >= 5
+        scored.append((s_prob, highlighted, confidence))
+
+    return scored
+
 # ---------------------------
 # GPT "judge" layer
 # ---------------------------
@@ -1632,105 +4240,442 @@ CALIBRATION RULES — follow these strictly:
 - Mostly human with some AI polish or editing: 0.15–0.40
 - Clearly human (personal voice, uneven flow, idiosyncratic phrasing, real specifics): 0.02–0.15
 
-STRICT RULES:
-- Do NOT assign > 0.90 unless the text is textbook AI with zero human signals
-- Do NOT assign > 0.75 unless you have at least 3 strong independent AI signals
-- A text that sounds informal or uses contractions is NOT automatically human — check for real specificity
-- A text with good grammar is NOT automatically AI — check for personal voice and real content
-- Be accurate over being decisive. A 0.50 is acceptable when genuinely uncertain.
-- Text under 80 words: set confidence to "low" and pull score toward 0.50
+STRICT RULES:
+- Do NOT assign > 0.90 unless the text is textbook AI with zero human signals
+- Do NOT assign > 0.75 unless you have at least 3 strong independent AI signals
+- A text that sounds informal or uses contractions is NOT automatically human — check for real specificity
+- A text with good grammar is NOT automatically AI — check for personal voice and real content
+- Be accurate over being decisive. A 0.50 is acceptable when genuinely uncertain.
+- Text under 80 words: set confidence to "low" and pull score toward 0.50
+
+Be decisive. Do not cluster near 0.5 unless genuinely uncertain.
+Text under 80 words: set confidence to "low".
+"""
+
+JUDGE_LATENCY = LatencyStats()
+
+
+# Bump whenever a judge prompt or the merge logic changes, so results
+# produced by the old judge are never served.
+JUDGE_PROMPT_VERSION = "2"
+
+JUDGE_CACHE_TTL = float(os.getenv("JUDGE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds; 0 disables
+JUDGE_CACHE_MAX_ENTRIES = int(os.getenv("JUDGE_CACHE_MAX_ENTRIES", "1024"))  # in-process
+JUDGE_CACHE_MAX_ROWS = int(os.getenv("JUDGE_CACHE_MAX_ROWS", "100000"))  # SQLite file
+JUDGE_CACHE_PATH = os.getenv("JUDGE_CACHE_PATH", "")  # e.g. cache/judge_results.sqlite3; empty = in-process only
+
+# Long documents are judged as paragraph-aligned windows of about this many
+# tokens (estimated at 4 chars/token), several at a time.
+JUDGE_WINDOW_TOKENS = int(os.getenv("JUDGE_WINDOW_TOKENS", "3500"))
+JUDGE_MAX_WINDOWS = int(os.getenv("JUDGE_MAX_WINDOWS", "8"))  # judge calls per document stay bounded; 0 = every window
+JUDGE_WINDOW_CONCURRENCY = int(os.getenv("JUDGE_WINDOW_CONCURRENCY", "4"))
+
+
+class JudgeCache:
+    """
+    Merged GPT judge results keyed by a hash of the whitespace-normalized
+    text, DETECT_GPT_MODEL and JUDGE_PROMPT_VERSION. An in-process LRU sits
+    in front of an optional SQLite file that every worker on the host
+    shares; both levels expire entries after `ttl` seconds. Results are
+    stored as JSON and every hit returns a fresh dict. SQLite reads and
+    writes run in a thread, off the event loop.
+    """
+
+    PRUNE_EVERY = 256  # SQLite writes between prunes
+
+    def __init__(self, max_entries: int, ttl: float, path: str = "", max_rows: int = 100000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._shared = SqliteKV(path, "judge_results") if (path and ttl > 0) else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        normalized = " ".join((text or "").split())
+        h = hashlib.sha256()
+        h.update(f"{JUDGE_PROMPT_VERSION}\0{DETECT_GPT_MODEL}\0".encode("utf-8"))
+        h.update(normalized.encode("utf-8", "surrogatepass"))
+        return h.hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+
+        if self._shared is not None:
+            hit = await asyncio.to_thread(self._shared.get, key, self.ttl)
+            if hit is not None:
+                blob, created_at = hit
+                payload = blob.decode("utf-8") if isinstance(blob, bytes) else blob
+                # keep the row's age, so L1 does not outlive the shared entry
+                self._remember(key, payload, created_at)
+                with self._lock:
+                    self.shared_hits += 1
+                return json.loads(payload)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, key: str, result: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        payload = json.dumps(result)
+        self._remember(key, payload, time.time())
+        if self._shared is not None:
+            await asyncio.to_thread(self._shared.set, key, payload.encode("utf-8"))
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.PRUNE_EVERY == 0
+            if prune:
+                await asyncio.to_thread(self._shared.prune, self.max_rows, self.ttl)
+
+    def _remember(self, key: str, payload: str, stored_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (stored_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "shared": self._shared is not None,
+                "prompt_version": JUDGE_PROMPT_VERSION,
+            }
+
+
+_JUDGE_CACHE = JudgeCache(JUDGE_CACHE_MAX_ENTRIES, JUDGE_CACHE_TTL, JUDGE_CACHE_PATH, JUDGE_CACHE_MAX_ROWS)
+JUDGE_FLIGHTS = SingleFlight()
+
+
+async def _timed(name: str, coro, timings: Dict[str, float]):
+    # awaits `coro`, recording its wall time unless it was cancelled
+    t0 = time.perf_counter()
+    cancelled = False
+    try:
+        return await coro
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        if not cancelled:
+            ms = (time.perf_counter() - t0) * 1000.0
+            timings[name] = round(ms, 1)
+            JUDGE_LATENCY.record(name, ms)
+
+
+async def _gather_or_cancel(*coros):
+    """asyncio.gather that cancels the remaining awaitables as soon as one raises."""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+async def _judge_forensic_pass(truncated: str) -> Dict[str, Any]:
+    # ─────────────────────────────────────────
+    # PASS 1 — Full forensic analysis
+    # ─────────────────────────────────────────
+    resp = await OPENAI_SCHEDULER.create(
+        "detect",
+        model=DETECT_GPT_MODEL,
+        messages=[
+            {"role": "system", "content": DETECT_JUDGE_PROMPT},
+            {"role": "user", "content": truncated},
+        ],
+        temperature=0.1,
+        max_tokens=2000,
+    )
+
+    raw = (resp.choices[0].message.content or "").strip()
+    raw = re.sub(r"^```json\s*", "", raw)
+    raw = re.sub(r"^```\s*", "", raw)
+    raw = re.sub(r"\s*```$", "", raw)
+    raw = raw.strip()
+
+    try:
+        result = json.loads(raw)
+    except Exception:
+        m = re.search(r"\{.*\}", raw, re.S)
+        if m:
+            result = json.loads(m.group(0))
+        else:
+            raise ValueError("Judge pass 1 returned no JSON object")
+
+    return result
+
+
+async def _judge_structural_pass(truncated: str) -> Dict[str, Any]:
+    # ─────────────────────────────────────────
+    # PASS 2 — Structural + pattern deep-dive
+    # Always runs as a second independent opinion
+    # ─────────────────────────────────────────
+    resp2 = await OPENAI_SCHEDULER.create(
+        "detect",
+        model=DETECT_GPT_MODEL,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "You are a structural writing analyst specializing in AI detection. "
+                    "Ignore topic and content entirely. Focus ONLY on writing mechanics:\n\n"
+                    "1. SENTENCE RHYTHM — Are lengths too uniform? Count and compare.\n"
+                    "2. TRANSITION WORDS — Count uses of: however, furthermore, moreover, additionally, "
+                    "in conclusion, it is important to note, plays a crucial role, it is worth noting.\n"
+                    "3. PARAGRAPH STRUCTURE — Does each paragraph follow the same formula (topic → evidence → conclusion)?\n"
+                    "4. HEDGING DENSITY — Count: may, might, could, suggests, appears, arguably, it can be said.\n"
+                    "5. SPECIFICITY — Are claims backed by concrete details, names, numbers, personal experience? "
+                    "Or are they generic and surface-level?\n"
+                    "6. HUMAN QUIRKS — Any typos, self-corrections, digressions, very unusual phrasing, "
+                    "emotional tangents, or personal voice?\n\n"
+                    "Return ONLY valid JSON, no markdown:\n"
+                    "{\n"
+                    "  \"structural_ai_probability\": <float 0.0-1.0>,\n"
+                    "  \"transition_word_count\": <int>,\n"
+                    "  \"hedging_word_count\": <int>,\n"
+                    "  \"rhythm_uniformity\": <float 0.0-1.0>,\n"
+                    "  \"has_human_quirks\": <bool>,\n"
+                    "  \"is_generic\": <bool>,\n"
+                    "  \"structural_reasoning\": \"<one sentence>\"\n"
+                    "}"
+                ),
+            },
+            {"role": "user", "content": truncated},
+        ],
+        temperature=0.1,
+        max_tokens=400,
+    )
+
+    raw2 = (resp2.choices[0].message.content or "").strip()
+    raw2 = re.sub(r"```json|```", "", raw2).strip()
+
+    result2: Dict[str, Any] = {}
+    try:
+        result2 = json.loads(raw2)
+    except Exception:
+        m2 = re.search(r"\{.*\}", raw2, re.S)
+        if m2:
+            try:
+                result2 = json.loads(m2.group(0))
+            except Exception:
+                pass
+
+    return result2
+
+
+def _judge_windows(text: str, max_tokens: int = JUDGE_WINDOW_TOKENS) -> List[str]:
+    """Paragraph-aligned windows of at most `max_tokens` (~4 chars each); see _pack_paragraphs."""
+    return [window for window, _ in _pack_paragraphs(text, max(1, max_tokens) * 4)]
+
+
+def _spread(items: List[Any], k: int) -> List[Any]:
+    # k items evenly spaced over the list, always keeping the first and last; k <= 0 keeps all
+    if k <= 0 or len(items) <= k:
+        return items
+    if k <= 1:
+        return items[:1]
+    step = (len(items) - 1) / (k - 1)
+    return [items[round(i * step)] for i in range(k)]
+
+
+def _merge_window_results(windows: List[str], results: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Combines per-window judge results into one document-level result:
+    probability and signals are averaged weighted by window length, sentence
+    scores are concatenated in document order.
+    """
+    judged = [(w, r) for w, r in zip(windows, results) if isinstance(r, dict)]
+    if not judged:
+        return None
+
+    weights = np.array([len(w) for w, _ in judged], dtype=np.float64)
+    weights = (weights / weights.sum()).tolist()
 
-Be decisive. Do not cluster near 0.5 unless genuinely uncertain.
-Text under 80 words: set confidence to "low".
-"""
+    probs = []
+    for _, r in judged:
+        try:
+            probs.append(max(0.0, min(float(r.get("document_ai_probability", 0.5)), 1.0)))
+        except Exception:
+            probs.append(0.5)
+    doc_p = float(np.dot(weights, probs))
+
+    signals: Dict[str, float] = {}
+    signal_weight: Dict[str, float] = {}
+    for wt, (_, r) in zip(weights, judged):
+        for k, v in (r.get("signals") or {}).items():
+            if isinstance(v, (int, float)):
+                signals[k] = signals.get(k, 0.0) + float(v) * wt
+                signal_weight[k] = signal_weight.get(k, 0.0) + wt
+    signals = {k: round(v / signal_weight[k], 4) for k, v in signals.items()}
+
+    # confidence backed by the most text; classification only if every window agrees
+    conf_weight: Dict[str, float] = {}
+    for wt, (_, r) in zip(weights, judged):
+        conf = r.get("confidence", "medium")
+        conf_weight[conf] = conf_weight.get(conf, 0.0) + wt
+    labels = {r.get("classification") for _, r in judged}
+
+    sentences: List[Any] = []
+    for _, r in judged:
+        sentences.extend(r.get("sentences") or [])
+
+    reasoning = " || ".join(
+        f"[part {i + 1}] {r.get('reasoning', '')}" for i, (_, r) in enumerate(judged) if r.get("reasoning")
+    )
+
+    return {
+        "document_ai_probability": round(doc_p, 4),
+        "confidence": max(conf_weight, key=conf_weight.get),
+        "classification": labels.pop() if len(labels) == 1 else "MIXED",
+        "reasoning": reasoning,
+        "signals": signals,
+        "sentences": sentences,
+        "windows": [
+            {"chars": len(w), "document_ai_probability": round(p, 4)} for (w, _), p in zip(judged, probs)
+        ],
+        "windows_failed": len(windows) - len(judged),
+    }
 
-async def gpt_judge_probability(text: str) -> Optional[Dict[str, Any]]:
+
+async def gpt_judge_probability(text: str, bypass_cache: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Merged result of the judge passes, served from _JUDGE_CACHE when this
+    text was judged before. `bypass_cache` forces a fresh judgement (which
+    then replaces the cached one). None when the judge is unavailable.
+    """
     if not OPENAI_API_KEY:
         return None
 
-    truncated = text[:14000]
+    key = JudgeCache.make_key(text)
+    if bypass_cache:
+        _JUDGE_CACHE.bypassed += 1
+    else:
+        cached = await _JUDGE_CACHE.get(key)
+        if cached is not None:
+            cached["cache"] = "hit"
+            return cached
+
+    # a judge still running for this text (e.g. one left behind by a
+    # deadline-bound detect) is joined rather than paid for twice
+    result = await JUDGE_FLIGHTS.run(key, lambda: _judge_and_store(text, key))
+    if result is not None:
+        result = dict(result)
+        result["cache"] = "bypass" if bypass_cache else "miss"
+    return result
 
-    try:
-        # ─────────────────────────────────────────
-        # PASS 1 — Full forensic analysis
-        # ─────────────────────────────────────────
-        resp = await client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": DETECT_JUDGE_PROMPT},
-                {"role": "user", "content": truncated},
-            ],
-            temperature=0.1,
-            max_tokens=2000,
-        )
 
-        raw = (resp.choices[0].message.content or "").strip()
-        raw = re.sub(r"^```json\s*", "", raw)
-        raw = re.sub(r"^```\s*", "", raw)
-        raw = re.sub(r"\s*```$", "", raw)
-        raw = raw.strip()
+async def _judge_and_store(text: str, key: str) -> Optional[Dict[str, Any]]:
+    result = await _judge_document(text)
+    if result is not None:
+        latency = result.pop("latency_ms", None)
+        await _JUDGE_CACHE.put(key, result)
+        result["latency_ms"] = latency
+    return result
+
 
-        try:
-            result = json.loads(raw)
-        except Exception:
-            m = re.search(r"\{.*\}", raw, re.S)
-            if m:
-                result = json.loads(m.group(0))
-            else:
-                return None
+async def _result_within(task: "asyncio.Task", deadline: Optional[float]) -> Tuple[Any, bool]:
+    """
+    Waits for a task until `deadline` (time.monotonic()). Returns (result,
+    False) if it finished in time; otherwise (None, True) and the task is
+    left running in the background so its result reaches its cache (judge
+    verdicts, translated signal sets) for the next request.
+    """
+    if deadline is None:
+        return await task, False
+    done, _ = await asyncio.wait({task}, timeout=max(0.0, deadline - time.monotonic()))
+    if task in done:
+        return task.result(), False
+    spawn_background(task)
+    return None, True
 
-        # ─────────────────────────────────────────
-        # PASS 2 — Structural + pattern deep-dive
-        # Always runs as a second independent opinion
-        # ─────────────────────────────────────────
-        resp2 = await client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are a structural writing analyst specializing in AI detection. "
-                        "Ignore topic and content entirely. Focus ONLY on writing mechanics:\n\n"
-                        "1. SENTENCE RHYTHM — Are lengths too uniform? Count and compare.\n"
-                        "2. TRANSITION WORDS — Count uses of: however, furthermore, moreover, additionally, "
-                        "in conclusion, it is important to note, plays a crucial role, it is worth noting.\n"
-                        "3. PARAGRAPH STRUCTURE — Does each paragraph follow the same formula (topic → evidence → conclusion)?\n"
-                        "4. HEDGING DENSITY — Count: may, might, could, suggests, appears, arguably, it can be said.\n"
-                        "5. SPECIFICITY — Are claims backed by concrete details, names, numbers, personal experience? "
-                        "Or are they generic and surface-level?\n"
-                        "6. HUMAN QUIRKS — Any typos, self-corrections, digressions, very unusual phrasing, "
-                        "emotional tangents, or personal voice?\n\n"
-                        "Return ONLY valid JSON, no markdown:\n"
-                        "{\n"
-                        "  \"structural_ai_probability\": <float 0.0-1.0>,\n"
-                        "  \"transition_word_count\": <int>,\n"
-                        "  \"hedging_word_count\": <int>,\n"
-                        "  \"rhythm_uniformity\": <float 0.0-1.0>,\n"
-                        "  \"has_human_quirks\": <bool>,\n"
-                        "  \"is_generic\": <bool>,\n"
-                        "  \"structural_reasoning\": \"<one sentence>\"\n"
-                        "}"
-                    ),
-                },
-                {"role": "user", "content": truncated},
-            ],
-            temperature=0.1,
-            max_tokens=400,
-        )
 
-        raw2 = (resp2.choices[0].message.content or "").strip()
-        raw2 = re.sub(r"```json|```", "", raw2).strip()
+async def _judge_document(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Runs the judge over the whole document. Text that fits one window is
+    judged as is; longer text is split into paragraph-aligned windows that
+    are judged concurrently, JUDGE_WINDOW_CONCURRENCY at a time, and merged.
+    At most JUDGE_MAX_WINDOWS windows (spread evenly over the document) are
+    judged, so cost and wall time stay bounded for any input length; the
+    result reports how many of the windows were judged.
+    """
+    windows = _judge_windows(text)
+    if len(windows) <= 1:
+        return await _run_judge_passes(text)
 
-        result2: Dict[str, Any] = {}
-        try:
-            result2 = json.loads(raw2)
-        except Exception:
-            m2 = re.search(r"\{.*\}", raw2, re.S)
-            if m2:
-                try:
-                    result2 = json.loads(m2.group(0))
-                except Exception:
-                    pass
+    total_windows = len(windows)
+    windows = _spread(windows, JUDGE_MAX_WINDOWS)
+    limit = asyncio.Semaphore(max(1, JUDGE_WINDOW_CONCURRENCY))
+
+    window_ms: List[float] = []
+
+    async def judge_window(window: str) -> Optional[Dict[str, Any]]:
+        async with limit:
+            w0 = time.perf_counter()
+            try:
+                return await _run_judge_passes(window)
+            finally:
+                window_ms.append((time.perf_counter() - w0) * 1000.0)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(judge_window(w) for w in windows))
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    JUDGE_LATENCY.record("windowed", wall_ms)
+
+    merged = _merge_window_results(windows, results)
+    if merged is None:
+        return None
+    merged["windows_total"] = total_windows
+    merged["windows_judged"] = len(windows)
+    merged["latency_ms"] = {
+        "windowed": round(wall_ms, 1),
+        "slowest_window": round(max(window_ms, default=0.0), 1),
+    }
+    return merged
+
+
+async def _run_judge_passes(truncated: str) -> Optional[Dict[str, Any]]:
+    timings: Dict[str, float] = {}
+
+    try:
+        # Passes 1 and 2 do not depend on each other: run them side by side,
+        # and stop waiting on one as soon as the other fails.
+        result, result2 = await _gather_or_cancel(
+            _timed("pass1", _judge_forensic_pass(truncated), timings),
+            _timed("pass2", _judge_structural_pass(truncated), timings),
+        )
 
         # ─────────────────────────────────────────
         # PASS 3 — Borderline refinement
@@ -1760,8 +4705,9 @@ async def gpt_judge_probability(text: str) -> Optional[Dict[str, Any]]:
 
         if 0.30 <= blended_so_far <= 0.70 or disagreement > 0.25:
             # Passes disagree or score is genuinely borderline — bring in a tiebreaker
-            resp3 = await client.chat.completions.create(
-                model="gpt-4.1",
+            resp3 = await _timed("pass3", OPENAI_SCHEDULER.create(
+                "detect",
+                model=DETECT_GPT_MODEL,
                 messages=[
                     {
                         "role": "system",
@@ -1780,11 +4726,11 @@ async def gpt_judge_probability(text: str) -> Optional[Dict[str, Any]]:
                             "{\"final_ai_probability\": <float 0.0-1.0>, \"decisive_signal\": \"<one clear sentence>\"}"
                         ),
                     },
-                    {"role": "user", "content": truncated[:8000]},
+                    {"role": "user", "content": truncated},
                 ],
                 temperature=0.15,
                 max_tokens=120,
-            )
+            ), timings)
 
             raw3 = (resp3.choices[0].message.content or "").strip()
             raw3 = re.sub(r"```json|```", "", raw3).strip()
@@ -1837,6 +4783,7 @@ async def gpt_judge_probability(text: str) -> Optional[Dict[str, Any]]:
         result["signals"]["transition_word_count"] = float(result2.get("transition_word_count", 0))
         result["signals"]["has_human_quirks"] = 0.0 if result2.get("has_human_quirks", False) else 1.0
         result["signals"]["is_generic"] = 1.0 if result2.get("is_generic", False) else 0.0
+        result["latency_ms"] = timings
 
         return result
 
@@ -2020,12 +4967,19 @@ def process_successful_payment(
 
 class DetectRequest(BaseModel):
     document: str = Field(..., min_length=1, description="Text to detect for AI content")
+    bypass_cache: bool = Field(False, description="Re-run the GPT judge even if a cached verdict exists")
+    max_latency_ms: Optional[int] = Field(
+        None, ge=1,
+        description="Answer with the local result if the GPT judge has not finished by then; "
+        "covers language detection too, which falls back to English signals",
+    )
 
 class SentenceStats(BaseModel):
     sentence: str
     generated_prob: float
     class_probabilities: Dict[str, float]
     highlighted: bool
+    match_confidence: Optional[float] = None  # alignment to the judge's sentence; None = heuristic score
 
 class TextStats(BaseModel):
     total_sentences: int
@@ -2043,11 +4997,18 @@ class DetectResponse(BaseModel):
     subclass: Optional[dict] = None
     uncertainty_score: Optional[float] = None
     confidence_percent: Optional[float] = None
+    provisional: bool = False  # judge missed the latency budget; retry later for the full verdict
 
 # ----------------- Endpoint -----------------
 
 @app.post("/api/detect", response_model=DetectResponse)
 async def detect(req: DetectRequest):
+    # identical documents submitted while one is being scored share its result
+    key = SingleFlight.make_key((req.document or "").strip(), str(req.bypass_cache), str(req.max_latency_ms))
+    return await DETECT_FLIGHTS.run(key, lambda: _run_detect(req))
+
+
+async def _run_detect(req: DetectRequest) -> DetectResponse:
     user_text = (req.document or "").strip()
 
     if not user_text:
@@ -2055,13 +5016,52 @@ async def detect(req: DetectRequest):
 
     word_count = len(user_text.split())
 
-    # -------------------
-    # 1. ALWAYS run the GPT judge — it is now the PRIMARY engine
-    # -------------------
-    gpt_result = await gpt_judge_probability(user_text)
+    budget_ms = req.max_latency_ms or DETECT_MAX_LATENCY_MS
+    deadline = time.monotonic() + budget_ms / 1000.0 if budget_ms else None
+    provisional = False
+
+    # In "always" mode the judge does not depend on local scoring: start it
+    # now so it runs alongside language detection and feature extraction.
+    judge_task = None
+    if DETECT_USE_GPT == "always":
+        judge_task = asyncio.ensure_future(gpt_judge_probability(user_text, req.bypass_cache))
+
+    try:
+        # -------------------
+        # 1. Local tier: trained model + heuristic
+        # -------------------
+        # language detection and signal translation count against the same
+        # budget; if they miss it, score with the English signals
+        lang_task = asyncio.ensure_future(detect_language_and_translate_signals(user_text))
+        lang_signals, lang_late = await _result_within(lang_task, deadline)
+        if lang_late:
+            lang_signals = {"is_english": True, "code": "en", "language": "English"}
+        feats = await extract_detector_features_async(
+            user_text, lang_signals if not lang_signals.get("is_english") else None
+        )
+        heuristic_p = heuristic_ai_probability(feats)
+        ml_p = ml_ai_probability_from_features(feats)
+        # the score and the cascade both use the heuristic until the model is
+        # retrained on the current features; ml_p is only reported
+
+        # -------------------
+        # 2. GPT judge: always, only when the local score is uncertain, or never
+        # -------------------
+        if judge_task is None and DETECT_USE_GPT == "cascade" and DETECT_UNCERTAIN_LOW <= heuristic_p <= DETECT_UNCERTAIN_HIGH:
+            judge_task = asyncio.ensure_future(gpt_judge_probability(user_text, req.bypass_cache))
+
+        gpt_result = None
+        if judge_task is not None:
+            gpt_result, provisional = await _result_within(judge_task, deadline)
+            if provisional:
+                judge_task = None  # now owned by the background set
+    finally:
+        # local work failed or the request was cancelled: stop paying for the judge
+        if judge_task is not None and not judge_task.done():
+            judge_task.cancel()
 
     # -------------------
-    # 2. Extract GPT probability
+    # 3. Extract GPT probability
     # -------------------
     gpt_p: Optional[float] = None
     gpt_confidence = "low"
@@ -2086,13 +5086,6 @@ async def detect(req: DetectRequest):
         gpt_signals = gpt_result.get("signals", {})
         gpt_sentences_raw = gpt_result.get("sentences", [])
 
-    # -------------------
-    # 3. Heuristic as FALLBACK only (when GPT fails)
-    # -------------------
-    lang_signals = await detect_language_and_translate_signals(user_text)
-    feats = extract_detector_features(user_text, lang_signals if not lang_signals.get("is_english") else None)
-    heuristic_p = heuristic_ai_probability(feats)
-
     # ==============================
     # CORE BLEND (FIXED VERSION)
     # ==============================
@@ -2198,68 +5191,25 @@ async def detect(req: DetectRequest):
     sent_stats = []
     highlighted_count = 0
 
-    # Build a lookup from GPT sentence results by matching text prefix
-    gpt_sent_lookup: Dict[str, float] = {}
+    # GPT sentence results in document order, aligned to the split sentences
+    judge_sentences: List[Tuple[str, float]] = []
     for gs in gpt_sentences_raw:
         if isinstance(gs, dict):
-            snippet = (gs.get("text") or "").strip().lower()[:40]
+            snippet = (gs.get("text") or "").strip()
             try:
                 prob = float(gs.get("ai_prob", final_p))
                 if prob > 1.0:
                     prob = prob / 100.0
-                gpt_sent_lookup[snippet] = max(0.0, min(prob, 1.0))
+                judge_sentences.append((snippet, max(0.0, min(prob, 1.0))))
             except Exception:
                 pass
 
-    for s in sents_from_split[:200]:
-
-        snippet = s.strip().lower()[:40]
-        best_match_prob: Optional[float] = None
-
-        # -------------------
-        # GPT sentence match
-        # -------------------
-        for key, val in gpt_sent_lookup.items():
-            if snippet[:20] in key or key[:20] in snippet:
-                best_match_prob = val
-                break
-
-        # -------------------
-        # fallback sentence heuristic
-        # -------------------
-        if best_match_prob is None:
-            s_words = _tokenize_words(s)
-            s_lower = s.lower()
-
-            s_trans = _count_phrase_hits(s_lower, _AI_TRANSITIONS)
-
-            s_generic = _count_phrase_hits(s_lower, {
-                "it is important", "plays a crucial", "has become increasingly",
-                "a wide range", "various factors", "it is worth noting",
-                "this demonstrates", "this highlights"
-            })
-
-            s_len = len(s_words)
-            doc_avg = feats.get("avg_sent_len", s_len)
-            length_uniformity = 1.0 - min(abs(s_len - doc_avg) / max(doc_avg, 1), 1.0)
-
-            personal_words = {"i", "my", "me", "we", "our", "you", "your"}
-            has_personal = any(w in personal_words for w in s_words)
-
-            best_match_prob = (
-                0.35 * min((s_trans + s_generic) / 2.0, 1.0) +
-                0.30 * length_uniformity +
-                0.35 * (0.0 if has_personal else 0.5)
-            )
-
-        # -------------------
-        # FINAL SENTENCE SCORE
-        # -------------------
-        s_prob = round(max(0.0, min(best_match_prob, 1.0)), 4)
-
-        token_len = len(_tokenize_words(s))
-        highlighted = s_prob >= 0.70 and token_len >= 5
+    sents_to_score = sents_from_split[:DETECT_MAX_SENTENCES]
+    scored = await CPU_POOL.run(
+        score_sentences, sents_to_score, judge_sentences, feats.get("avg_sent_len")
+    )
 
+    for s, (s_prob, highlighted, match_confidence) in zip(sents_to_score, scored):
         if highlighted:
             highlighted_count += 1
 
@@ -2272,6 +5222,7 @@ async def detect(req: DetectRequest):
                     "HUMAN": round(1.0 - s_prob, 4),
                 },
                 highlighted=highlighted,
+                match_confidence=match_confidence if match_confidence else None,
             )
         )
 
@@ -2296,14 +5247,41 @@ async def detect(req: DetectRequest):
     # -------------------
     # 8. Writing stats
     # -------------------
+    if provisional:
+        engine = "local (GPT judge pending)"
+    elif gpt_p is None:
+        engine = "local (heuristic)"
+    elif DETECT_USE_GPT == "cascade":
+        engine = "local + GPT judge (uncertain band)"
+    else:
+        engine = "GPT-primary + heuristic-stabilizer"
+
     writing_stats = {
         "gpt_probability": round(float(gpt_p), 4) if gpt_p is not None else None,
+        "ml_probability": round(float(ml_p), 4) if ml_p is not None else None,
         "heuristic_probability": round(float(heuristic_p), 4),
         "final_probability": round(float(final_p), 4),
         "gpt_confidence": gpt_confidence,
         "word_count": word_count,
-        "engine": "GPT-primary + heuristic-stabilizer",
+        "engine": engine,
     }
+    if budget_ms:
+        writing_stats["latency_budget_ms"] = budget_ms
+    if lang_late:
+        writing_stats["language_fallback"] = "English signals (language detection missed the latency budget)"
+    if isinstance(gpt_result, dict):
+        writing_stats["judge_cache"] = gpt_result.get("cache")
+        if gpt_result.get("windows_total"):
+            # windows_judged < windows_total: JUDGE_MAX_WINDOWS left part of the document unjudged
+            judged = gpt_result.get("windows_judged", gpt_result["windows_total"])
+            writing_stats["judge_windows"] = {
+                "total": gpt_result["windows_total"],
+                "judged": judged,
+                "failed": gpt_result.get("windows_failed", 0),
+                "partial": judged < gpt_result["windows_total"],
+            }
+        if gpt_result.get("latency_ms"):
+            writing_stats["judge_latency_ms"] = gpt_result["latency_ms"]
     if gpt_signals:
         writing_stats["gpt_signals"] = gpt_signals
 
@@ -2317,9 +5295,7 @@ async def detect(req: DetectRequest):
         sentences=sent_stats,
     )
     
-    print("DEBUG GPT P:", gpt_p)
-    print("DEBUG HEURISTIC P:", heuristic_p)
-    print("DEBUG FINAL P:", final_p)
+    logger.debug(f"detect: gpt_p={gpt_p} heuristic_p={heuristic_p} final_p={final_p}")
 
     return DetectResponse(
         document=user_text,
@@ -2329,7 +5305,8 @@ async def detect(req: DetectRequest):
         text_stats=text_stats,
         subclass=None,
         uncertainty_score=uncertainty_score,
-        confidence_percent=confidence_percent
+        confidence_percent=confidence_percent,
+        provisional=provisional,
     )
     
 
@@ -2339,30 +5316,98 @@ async def reload_detector():
     return {"ok": True, "model_loaded": _DETECT_MODEL is not None, "feature_order": _DETECT_FEATURE_ORDER}
 
 
-class HumanizeRequest(BaseModel):
-    text: str = Field(..., min_length=1)
+@app.get("/api/detect/cache")
+async def detector_cache_stats():
+    return {"features": _FEATURE_CACHE.stats(), "judge": _JUDGE_CACHE.stats()}
 
-class HumanizeResponse(BaseModel):
-    humanized_text: str
-@app.post("/api/humanize", response_model=HumanizeResponse)
-async def humanize_text(req: HumanizeRequest):
-    user_text = (req.text or "").strip()
 
-    if not user_text:
-        raise HTTPException(status_code=400, detail="Empty text")
+@app.get("/api/debug/runtime")
+async def runtime_stats():
+    return {
+        "cpu_pool": CPU_POOL.stats(),
+        "loop_lag": LOOP_LAG.stats(),
+        "judge": JUDGE_LATENCY.stats(),
+        "openai": OPENAI_SCHEDULER.stats(),
+        "language_id": {
+            "profiles": LANGUAGE_ID.profiles,
+            "decided_by": dict(LANG_ID_STATS),
+            "signal_sets": sorted(_LANG_SIGNAL_CACHE),
+            "translations": LANG_SIGNAL_FLIGHTS.stats(),
+        },
+        "single_flight": {
+            "detect": DETECT_FLIGHTS.stats(),
+            "humanize": HUMANIZE_FLIGHTS.stats(),
+            "judge": JUDGE_FLIGHTS.stats(),
+        },
+    }
 
-    if len(user_text) > 20000:
-        raise HTTPException(status_code=413, detail="Text too long. Please shorten and try again.")
 
-    lang_signals = await detect_language_and_translate_signals(user_text)
-    lang_name = lang_signals.get("language", "English")
-    is_english = lang_signals.get("is_english", True)
-    
-    formatted_input = f'"""\n{user_text}\n"""'
+@app.get("/api/debug/profile")
+async def feature_profile():
+    return FEATURE_PROFILER.report()
 
-    # Detect tone + complexity
-    tone = detect_tone(user_text)
-    complexity = pick_complexity()
+
+@app.post("/api/debug/profile")
+async def configure_feature_profile(
+    enabled: Optional[bool] = None,
+    reset: bool = False,
+    authorization: str | None = Header(default=None),
+):
+    if not FEATURE_PROFILE_CONTROL:
+        raise HTTPException(status_code=403, detail="Profiling control is disabled")
+    verify_firebase_bearer_token(authorization)
+    if reset:
+        FEATURE_PROFILER.reset()
+    if enabled is not None:
+        FEATURE_PROFILER.enabled = enabled
+    return {"enabled": FEATURE_PROFILER.enabled}
+
+
+@app.on_event("startup")
+async def start_runtime_monitors():
+    LOOP_LAG.start()
+    loaded = preload_lang_signal_store()
+    if loaded:
+        logger.info(f"Preloaded translated signal sets for {loaded} language(s)")
+
+
+@app.on_event("shutdown")
+async def stop_runtime_workers():
+    LOOP_LAG.stop()
+    CPU_POOL.shutdown()
+
+
+# ---- Chunked humanization ----
+# Inputs longer than HUMANIZE_CHUNK_CHARS are rewritten as paragraph-aligned
+# chunks, HUMANIZE_CHUNK_CONCURRENCY at a time, so a 20k-character job takes
+# about as long as one chunk and no single call risks hitting max_tokens.
+HUMANIZE_MAX_CHARS = 20000
+HUMANIZE_CHUNK_CHARS = int(os.getenv("HUMANIZE_CHUNK_CHARS", "4000"))
+HUMANIZE_CHUNK_CONCURRENCY = int(os.getenv("HUMANIZE_CHUNK_CONCURRENCY", "4"))
+
+HUMANIZE_ENTROPY_LINES = [
+    "It's not completely straightforward.",
+    "There’s a bit more going on here.",
+    "That said, it depends.",
+    "Still, it's not always that simple.",
+]
+
+
+def _humanize_chunks(text: str, max_chars: int = HUMANIZE_CHUNK_CHARS) -> List[Tuple[str, bool]]:
+    """(chunk, continues_paragraph) pairs of at most `max_chars`; see _pack_paragraphs."""
+    return _pack_paragraphs(text, max_chars)
+
+
+def _join_humanized_chunks(chunks: List[Tuple[str, bool]]) -> str:
+    out: List[str] = []
+    for text, continues in chunks:
+        if out:
+            out.append(" " if continues else "\n\n")
+        out.append(text)
+    return "".join(out)
+
+
+def build_humanizer_system_prompt(word_count: int, tone: str, complexity: str, lang_name: str, is_english: bool) -> str:
     tone_instruction = build_tone_instruction(tone)
     complexity_instruction = (
         f"\nSentence Complexity: {complexity}. "
@@ -2374,16 +5419,14 @@ async def humanize_text(req: HumanizeRequest):
         "Avoid a neat 2–3 sentence balance."
     )
 
-    word_count_original = len(user_text.split())
     restructure_instruction = (
         "\nStructural Flexibility: "
         "You may restructure sentences, but do NOT expand the text. "
-        f"The original text is approximately {word_count_original} words. "
-        f"Your rewrite MUST stay within {int(word_count_original * 1.15)} words. "
+        f"The original text is approximately {word_count} words. "
+        f"Your rewrite MUST stay within {int(word_count * 1.15)} words. "
         "Do not add filler, padding, or extra sentences to reach a target length."
     )
 
-    # Full system prompt
     lang_instruction = ""
     if not is_english:
         lang_instruction = (
@@ -2392,7 +5435,7 @@ async def humanize_text(req: HumanizeRequest):
             f"Apply all humanization rules as they apply to natural {lang_name} writing patterns."
         )
 
-    sys_prompt = (
+    return (
         HUMANIZER_SYSTEM_PROMPT
         + tone_instruction
         + complexity_instruction
@@ -2401,89 +5444,311 @@ async def humanize_text(req: HumanizeRequest):
         + lang_instruction
     )
 
-    try:
-        # -------- First Pass (HIGH QUALITY) --------
-        response = await client.chat.completions.create(
+
+async def _run_humanize_passes(text: str, sys_prompt: str, finish: bool = False) -> Tuple[str, int]:
+    """
+    GPT rewrite passes for one piece of text. Returns (rewritten, passes run).
+    With `finish`, the rewrite also gets the entropy line (sometimes) and
+    finish_humanized_text before it is returned.
+    """
+    formatted_input = f'"""\n{text}\n"""'
+
+    # -------- First Pass (HIGH QUALITY) --------
+    response = await OPENAI_SCHEDULER.create(
+        "humanize",
+        model="gpt-4.1",
+        messages=[
+            {"role": "system", "content": sys_prompt},
+            {"role": "user", "content": formatted_input},
+        ],
+        temperature=random.uniform(0.65, 0.8),
+        max_tokens=3000,
+    )
+    rewritten = (response.choices[0].message.content or "").strip()
+    passes = 1
+
+    # -------- Second Pass (STRUCTURE BREAKER) --------
+    if is_weak_rewrite(text, rewritten):
+        response2 = await OPENAI_SCHEDULER.create(
+            "humanize",
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        sys_prompt
+                        + "\nMaintain the original paragraph structure. Do not merge paragraphs."
+                        + "\nRewrite again with a noticeably different structure..."
+                        + "\n- Change sentence boundaries (split/merge)."
+                        + "\n- Change sentence order when possible."
+                        + "\n- Avoid swapping just a few words."
+                        + "\n- Avoid a neat 2–3 sentence balance."
+                    )
+                },
+                {"role": "user", "content": f'"""\n{rewritten}\n"""'},
+            ],
+            temperature=random.uniform(0.9, 1.1),
+            max_tokens=3000,
+        )
+        rewritten = (response2.choices[0].message.content or "").strip()
+        passes += 1
+
+    # -------- Third Pass (FEATURE CORRECTION) --------
+    entropy_line = _pick_entropy_line() if finish else None
+    if finish:
+        # one CPU job checks the features and, when no correction pass is
+        # needed, finishes the text from the same feature state
+        corrections, finished = await CPU_POOL.run(check_or_finish_humanized_text, rewritten, entropy_line)
+        if not corrections:
+            return finished, passes
+    else:
+        features = await extract_detector_features_async(rewritten, features=CORRECTION_FEATURES)
+        corrections = build_feature_corrections(features)
+
+    if corrections:
+        response3 = await OPENAI_SCHEDULER.create(
+            "humanize",
             model="gpt-4.1",
             messages=[
-                {"role": "system", "content": sys_prompt},
-                {"role": "user", "content": formatted_input},
+                {"role": "system", "content": sys_prompt + corrections},
+                {"role": "user", "content": f'"""\n{rewritten}\n"""'},
             ],
-            temperature=random.uniform(0.65, 0.8),
+            temperature=random.uniform(0.9, 1.1),
             max_tokens=3000,
         )
-        rewritten = extract_text_from_response(response).strip()
+        rewritten = (response3.choices[0].message.content or "").strip()
+        passes += 1
 
-        # -------- Second Pass (STRUCTURE BREAKER) --------
-        if is_weak_rewrite(user_text, rewritten):
-            response2 = await client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            sys_prompt
-                            + "\nMaintain the original paragraph structure. Do not merge paragraphs."
-                            + "\nRewrite again with a noticeably different structure..."
-                            + "\n- Change sentence boundaries (split/merge)."
-                            + "\n- Change sentence order when possible."
-                            + "\n- Avoid swapping just a few words."
-                            + "\n- Avoid a neat 2–3 sentence balance."
-                        )
-                    },
-                    {"role": "user", "content": f'"""\n{rewritten}\n"""'},
-                ],
-                temperature=random.uniform(0.9, 1.1),
-                max_tokens=3000,
-            )
-            rewritten = (response2.choices[0].message.content or "").strip()
+    if finish:
+        if entropy_line:
+            rewritten += "\n\n" + entropy_line
 
-        # -------- Third Pass (FEATURE CORRECTION) --------
-        features = extract_detector_features(rewritten)
-        corrections = build_feature_corrections(features)
+        # -------- Post-processing, contractions, cleanup --------
+        rewritten = await CPU_POOL.run(finish_humanized_text, rewritten)
 
-        if corrections:
-            response3 = await client.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": sys_prompt + corrections},
-                    {"role": "user", "content": f'"""\n{rewritten}\n"""'},
-                ],
-                temperature=random.uniform(0.9, 1.1),
-                max_tokens=3000,
-            )
-            rewritten = (response3.choices[0].message.content or "").strip()
+    return rewritten, passes
+
+
+def _pick_entropy_line() -> Optional[str]:
+    # -------- Entropy Injection (NEW 🔥) --------
+    if random.random() < 0.05:
+        return random.choice(HUMANIZE_ENTROPY_LINES)
+    return None
+
+
+def _maybe_inject_entropy(text: str) -> str:
+    line = _pick_entropy_line()
+    return text + "\n\n" + line if line else text
+
+
+class HumanizeRequest(BaseModel):
+    text: str = Field(..., min_length=1)
+
+class HumanizeChunkStats(BaseModel):
+    index: int
+    chars: int
+    passes: int
+    wait_ms: float
+    rewrite_ms: float
+    finish_ms: float
+
+class HumanizeResponse(BaseModel):
+    humanized_text: str
+    chunks: Optional[List[HumanizeChunkStats]] = None
+    latency_ms: Optional[float] = None
+@app.post("/api/humanize", response_model=HumanizeResponse)
+async def humanize_text(req: HumanizeRequest):
+    # a double submit of the same text gets the rewrite already in progress
+    key = SingleFlight.make_key((req.text or "").strip())
+    return await HUMANIZE_FLIGHTS.run(key, lambda: _run_humanize(req))
 
-        # -------- Entropy Injection (NEW 🔥) --------
-        if random.random() < 0.05:
-            rewritten += "\n\n" + random.choice([
-                "It's not completely straightforward.",
-                "There’s a bit more going on here.",
-                "That said, it depends.",
-                "Still, it's not always that simple.",
-            ])
 
-        # -------- Final Post-processing (HUMAN IMPERFECTION) --------
-        rewritten = apply_human_postprocessing(rewritten)
+async def _run_humanize(req: HumanizeRequest):
+    user_text = (req.text or "").strip()
+
+    if not user_text:
+        raise HTTPException(status_code=400, detail="Empty text")
+
+    if len(user_text) > HUMANIZE_MAX_CHARS:
+        raise HTTPException(status_code=413, detail="Text too long. Please shorten and try again.")
+
+    lang_signals = await detect_language_and_translate_signals(user_text)
+    lang_name = lang_signals.get("language", "English")
+    is_english = lang_signals.get("is_english", True)
 
-        # -------- Second Pass Post-processing (NEW 🔥) --------
-        post_features = extract_detector_features(rewritten)
-        if looks_ai_like(post_features):
-            rewritten = apply_human_postprocessing(rewritten)
+    # Detect tone + complexity once, so every chunk is rewritten the same way
+    tone = detect_tone(user_text)
+    complexity = pick_complexity()
 
-        # -------- Contraction Injection --------
-        rewritten = apply_contractions(rewritten)
+    try:
+        if len(user_text) > HUMANIZE_CHUNK_CHARS:
+            result = await _humanize_chunked(user_text, tone, complexity, lang_name, is_english)
+            rewritten = result["humanized_text"]
+        else:
+            sys_prompt = build_humanizer_system_prompt(
+                len(user_text.split()), tone, complexity, lang_name, is_english
+            )
+            rewritten, _ = await _run_humanize_passes(user_text, sys_prompt, finish=True)
+            result = {"humanized_text": rewritten}
 
-        # -------- Final Cleanup --------
-        rewritten = normalize_punctuation(rewritten)
+        # Users often run detect on the result straight away: featurize it
+        # off the request path so that detect is a feature-cache hit
+        spawn_background(warm_feature_cache(rewritten, lang_signals if not is_english else None))
 
-        return {"humanized_text": rewritten}
+        return result
 
+    except HTTPException:
+        raise
     except Exception:
         logger.exception("Humanizer error")
         raise HTTPException(status_code=502, detail="Humanization failed")
 
 
+async def _rewrite_humanize_chunk(
+    index: int, chunks: List[Tuple[str, bool]], limit: asyncio.Semaphore,
+    tone: str, complexity: str, lang_name: str, is_english: bool,
+) -> Tuple[str, Dict[str, Any]]:
+    # GPT passes for one chunk; the caller finishes (post-processes) the result
+    chunk = chunks[index][0]
+    queued = time.perf_counter()
+    async with limit:
+        started = time.perf_counter()
+        sys_prompt = build_humanizer_system_prompt(
+            len(chunk.split()), tone, complexity, lang_name, is_english
+        )
+        rewritten, passes = await _run_humanize_passes(chunk, sys_prompt)
+    if index == len(chunks) - 1:
+        rewritten = _maybe_inject_entropy(rewritten)
+    stats = {
+        "index": index,
+        "chars": len(chunk),
+        "passes": passes,
+        "wait_ms": round((started - queued) * 1000.0, 1),
+        "rewrite_ms": round((time.perf_counter() - started) * 1000.0, 1),
+        "finish_ms": 0.0,
+    }
+    return rewritten, stats
+
+
+async def _humanize_chunked(user_text: str, tone: str, complexity: str, lang_name: str, is_english: bool) -> Dict[str, Any]:
+    chunks = _humanize_chunks(user_text)
+    limit = asyncio.Semaphore(max(1, HUMANIZE_CHUNK_CONCURRENCY))
+    t0 = time.perf_counter()
+
+    async def humanize_chunk(index: int) -> Tuple[str, Dict[str, Any]]:
+        rewritten, stats = await _rewrite_humanize_chunk(index, chunks, limit, tone, complexity, lang_name, is_english)
+        f0 = time.perf_counter()
+        rewritten = await CPU_POOL.run(finish_humanized_paragraphs, rewritten)
+        stats["finish_ms"] = round((time.perf_counter() - f0) * 1000.0, 1)
+        return rewritten, stats
+
+    # one failed chunk fails the whole rewrite, so stop the others early
+    results = await _gather_or_cancel(*(humanize_chunk(i) for i in range(len(chunks))))
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+
+    rewritten = _join_humanized_chunks([(text, continues) for (text, _), (_, continues) in zip(results, chunks)])
+    return {
+        "humanized_text": rewritten,
+        "chunks": [stats for _, stats in results],
+        "latency_ms": round(wall_ms, 1),
+    }
+
+
+# ---- Streaming humanization ----
+# /api/humanize/stream rewrites the text as chunks (smaller than the batch
+# endpoint's, so the first one is back quickly) and sends each paragraph as
+# soon as its chunk's last pass is done and the paragraph is post-processed.
+# The body is NDJSON, one event per line:
+#   {"type": "start", "chunks": n}
+#   {"type": "paragraph", "index": i, "text": "..."}   in document order
+#   {"type": "done", "humanized_text": "...", "chunks": [...], "latency_ms": ms}
+#   {"type": "error", "detail": "..."}                  instead of "done"
+HUMANIZE_STREAM_CHUNK_CHARS = int(os.getenv("HUMANIZE_STREAM_CHUNK_CHARS", "1500"))
+
+
+def _ndjson(event: Dict[str, Any]) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.post("/api/humanize/stream")
+async def humanize_text_stream(req: HumanizeRequest):
+    user_text = (req.text or "").strip()
+
+    if not user_text:
+        raise HTTPException(status_code=400, detail="Empty text")
+
+    if len(user_text) > HUMANIZE_MAX_CHARS:
+        raise HTTPException(status_code=413, detail="Text too long. Please shorten and try again.")
+
+    lang_signals = await detect_language_and_translate_signals(user_text)
+    lang_name = lang_signals.get("language", "English")
+    is_english = lang_signals.get("is_english", True)
+
+    tone = detect_tone(user_text)
+    complexity = pick_complexity()
+    chunks = _humanize_chunks(user_text, HUMANIZE_STREAM_CHUNK_CHARS)
+
+    async def event_stream():
+        limit = asyncio.Semaphore(max(1, HUMANIZE_CHUNK_CONCURRENCY))
+        tasks = [
+            asyncio.ensure_future(
+                _rewrite_humanize_chunk(i, chunks, limit, tone, complexity, lang_name, is_english)
+            )
+            for i in range(len(chunks))
+        ]
+        t0 = time.perf_counter()
+        paragraphs: List[str] = []
+        chunk_stats: List[Dict[str, Any]] = []
+        held: Optional[str] = None  # last paragraph of a chunk the next chunk continues
+
+        try:
+            yield _ndjson({"type": "start", "chunks": len(chunks)})
+
+            for index, task in enumerate(tasks):
+                rewritten, stats = await task
+                f0 = time.perf_counter()
+                finished = [
+                    await CPU_POOL.run(finish_humanized_text, para)
+                    for para in _paragraph_split(rewritten)
+                ] or [""]
+                stats["finish_ms"] = round((time.perf_counter() - f0) * 1000.0, 1)
+                chunk_stats.append(stats)
+
+                if held is not None:
+                    finished[0] = (held + " " + finished[0]).strip()
+                    held = None
+                if index + 1 < len(chunks) and chunks[index + 1][1]:
+                    held = finished.pop()
+
+                for para in finished:
+                    if para:
+                        yield _ndjson({"type": "paragraph", "index": len(paragraphs), "text": para})
+                        paragraphs.append(para)
+
+            if held:
+                yield _ndjson({"type": "paragraph", "index": len(paragraphs), "text": held})
+                paragraphs.append(held)
+
+            rewritten = "\n\n".join(paragraphs)
+            spawn_background(warm_feature_cache(rewritten, lang_signals if not is_english else None))
+            yield _ndjson({
+                "type": "done",
+                "humanized_text": rewritten,
+                "chunks": chunk_stats,
+                "latency_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+            })
+        except Exception:
+            logger.exception("Streaming humanizer error")
+            yield _ndjson({"type": "error", "detail": "Humanization failed"})
+        finally:
+            # client went away or a chunk failed: stop paying for the rest
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+
 
 
 @app.get("/")
@@ -2618,7 +5883,8 @@ async def chat(
 
         async def token_stream():
             try:
-                stream = await client.chat.completions.create(
+                stream = await OPENAI_SCHEDULER.create(
+                    "chat",
                     model=model_name,
                     messages=[{"role": "system", "content": CHAT_SYSTEM_PROMPT}] + messages_to_send,
                     max_tokens=max_tokens,
@@ -2652,7 +5918,8 @@ async def verify():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="OPENAI_API_KEY not configured")
 
     try:
-        resp = await client.chat.completions.create(
+        resp = await OPENAI_SCHEDULER.create(
+            "chat",
             model=API_MODEL,
             messages=[{"role": "user", "content": "Reply with the single word: pong"}],
             max_tokens=16,
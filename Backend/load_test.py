@@ -0,0 +1,244 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import subprocess
+
+import numpy as np
+import httpx
+
+# End-to-end load test for /api/detect, /api/humanize(/stream) and /api/chat.
+#
+# With LOAD_URL unset this runs fully offline: it starts fake_openai_server.py
+# and the backend (pointed at the fake server via OPENAI_BASE_URL), drives
+# them at fixed concurrency for LOAD_DURATION seconds, and shuts both down.
+# The backend still reads its own .env (Firebase service account etc.).
+# With LOAD_URL set it drives an already running backend instead.
+
+LOAD_URL = os.getenv("LOAD_URL", "")
+# detect, humanize, humanize_stream, chat
+LOAD_ENDPOINTS = [e.strip() for e in os.getenv("LOAD_ENDPOINTS", "detect,humanize,chat").split(",") if e.strip()]
+LOAD_CONCURRENCY = int(os.getenv("LOAD_CONCURRENCY", "8"))
+LOAD_DURATION = float(os.getenv("LOAD_DURATION", "30"))  # seconds
+LOAD_TIMEOUT = float(os.getenv("LOAD_TIMEOUT", "120"))  # per request, seconds
+LOAD_DISTINCT_TEXTS = int(os.getenv("LOAD_DISTINCT_TEXTS", "40"))  # fewer = more cache hits / coalescing
+LOAD_WORDS = int(os.getenv("LOAD_WORDS", "300"))
+LOAD_SEED = int(os.getenv("LOAD_SEED", "7"))
+LOAD_APP_PORT = int(os.getenv("LOAD_APP_PORT", "8800"))
+FAKE_OPENAI_PORT = int(os.getenv("FAKE_OPENAI_PORT", "8900"))
+
+SENTENCES = [
+    "It is important to note that technology plays a crucial role in today's world.",
+    "I remember when I was a kid, we didn't have phones at the dinner table.",
+    "However, the data suggests a more complicated picture than most reports admit.",
+    "Moreover, a wide range of factors might affect the final outcome.",
+    "Honestly, I think it's fine.",
+    "Why would anyone design a system that way?",
+    "The results (see Table 3) were significant at the 5% level.",
+    "In conclusion, this highlights the need for further research.",
+    "Nairobi's 2024 budget grew by 12% compared to the previous year.",
+    "We are not sure; they are, however, confident about the timeline.",
+]
+
+
+def build_texts(n: int, n_words: int, seed: int):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        paras, words = [], 0
+        while words < n_words:
+            para = [rng.choice(SENTENCES) for _ in range(rng.randint(3, 6))]
+            words += sum(len(s.split()) for s in para)
+            paras.append(" ".join(para))
+        texts.append("\n\n".join(paras))
+    return texts
+
+
+def start_stack():
+    env = dict(
+        os.environ,
+        OPENAI_BASE_URL=f"http://127.0.0.1:{FAKE_OPENAI_PORT}/v1",
+        OPENAI_API_KEY="offline-load-test",
+        FAKE_OPENAI_PORT=str(FAKE_OPENAI_PORT),
+    )
+    fake = subprocess.Popen([sys.executable, "fake_openai_server.py"], env=env)
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastapi_gpt5_backend:app",
+         "--host", "127.0.0.1", "--port", str(LOAD_APP_PORT), "--log-level", "warning"],
+        env=env,
+    )
+    return [fake, app]
+
+
+def stop_stack(procs):
+    for p in procs:
+        p.terminate()
+    for p in procs:
+        try:
+            p.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+
+def wait_until_up(url: str, procs, timeout: float = 90.0) -> None:
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if any(p.poll() is not None for p in procs):
+            raise RuntimeError("A server process exited during startup; see its output above.")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+async def one_request(client: httpx.AsyncClient, endpoint: str, text: str):
+    """(latency s, time to first content s, ok, error label)"""
+    t0 = time.perf_counter()
+    try:
+        if endpoint == "chat":
+            payload = {"prompt": "Summarize this in two sentences:\n" + text[:1500], "max_output_tokens": 256}
+            async with client.stream("POST", "/api/chat", json=payload) as r:
+                ttfb = None
+                async for _ in r.aiter_bytes():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - t0
+                status = r.status_code
+        elif endpoint == "humanize_stream":
+            # time to the first rewritten paragraph, not to the "start" event
+            async with client.stream("POST", "/api/humanize/stream", json={"text": text}) as r:
+                ttfb = None
+                status = r.status_code
+                async for line in r.aiter_lines():
+                    if ttfb is None and '"type": "paragraph"' in line:
+                        ttfb = time.perf_counter() - t0
+                    elif '"type": "error"' in line:
+                        status = 502
+        else:
+            path, payload = ("/api/detect", {"document": text}) if endpoint == "detect" else ("/api/humanize", {"text": text})
+            r = await client.post(path, json=payload)
+            ttfb = None
+            status = r.status_code
+    except httpx.HTTPError as e:
+        return time.perf_counter() - t0, None, False, type(e).__name__
+    latency = time.perf_counter() - t0
+    return latency, ttfb, status < 400, None if status < 400 else f"HTTP {status}"
+
+
+async def worker(client, texts, deadline, results, rng):
+    while time.perf_counter() < deadline:
+        endpoint = rng.choice(LOAD_ENDPOINTS)
+        latency, ttfb, ok, error = await one_request(client, endpoint, rng.choice(texts))
+        results.append((endpoint, latency, ttfb, ok, error, time.perf_counter()))
+
+
+async def sample_runtime(client, deadline, samples):
+    while time.perf_counter() < deadline:
+        try:
+            r = await client.get("/api/debug/runtime")
+            samples.append(r.json())
+        except Exception:
+            pass
+        await asyncio.sleep(1.0)
+
+
+async def run_load(base_url: str):
+    texts = build_texts(LOAD_DISTINCT_TEXTS, LOAD_WORDS, LOAD_SEED)
+    results, runtime_samples = [], []
+    limits = httpx.Limits(max_connections=LOAD_CONCURRENCY + 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=LOAD_TIMEOUT, limits=limits) as client:
+        t0 = time.perf_counter()
+        deadline = t0 + LOAD_DURATION
+        await asyncio.gather(
+            sample_runtime(client, deadline, runtime_samples),
+            *(worker(client, texts, deadline, results, random.Random(LOAD_SEED + i)) for i in range(LOAD_CONCURRENCY)),
+        )
+        elapsed = time.perf_counter() - t0
+        try:
+            final_runtime = (await client.get("/api/debug/runtime")).json()
+        except Exception:
+            final_runtime = {}
+    return results, elapsed, runtime_samples, final_runtime
+
+
+def print_report(results, elapsed, runtime_samples, final_runtime, fake_stats):
+    print("====================================")
+    print("Load test")
+    print(f"Concurrency: {LOAD_CONCURRENCY} | Duration: {elapsed:.1f}s | Distinct texts: {LOAD_DISTINCT_TEXTS}")
+    print("====================================")
+    print(f"{'endpoint':>15} {'reqs':>6} {'req/s':>7} {'err %':>6} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'ttfb p50':>9}")
+    for endpoint in LOAD_ENDPOINTS:
+        rows = [r for r in results if r[0] == endpoint]
+        if not rows:
+            continue
+        lat = np.array([r[1] for r in rows if r[3]]) if any(r[3] for r in rows) else np.array([0.0])
+        ttfb = [r[2] for r in rows if r[2] is not None]
+        errors = sum(1 for r in rows if not r[3])
+        print(
+            f"{endpoint:>15} {len(rows):>6} {len(rows) / elapsed:>7.2f} {100.0 * errors / len(rows):>6.1f} "
+            f"{np.percentile(lat, 50):>7.2f} {np.percentile(lat, 95):>7.2f} {np.percentile(lat, 99):>7.2f} "
+            f"{(np.median(ttfb) if ttfb else float('nan')):>9.2f}"
+        )
+
+    error_kinds = {}
+    for r in results:
+        if r[4]:
+            key = f"{r[0]}: {r[4]}"
+            error_kinds[key] = error_kinds.get(key, 0) + 1
+    if error_kinds:
+        print("\nErrors")
+        for key, count in sorted(error_kinds.items(), key=lambda kv: -kv[1]):
+            print(f"  {count:>5}  {key}")
+
+    lag = [s.get("loop_lag", {}) for s in runtime_samples if s.get("loop_lag")]
+    if lag:
+        print("\nEvent-loop lag (backend)")
+        print(f"  p99 over run: {max(l.get('p99_ms', 0.0) for l in lag):.1f} ms | max: {max(l.get('max_ms', 0.0) for l in lag):.1f} ms")
+
+    openai_stats = final_runtime.get("openai", {}).get("models", {})
+    if openai_stats:
+        print("\nOpenAI scheduler")
+        for model, st in openai_stats.items():
+            print(
+                f"  {model}: completed={st.get('completed')} retried={st.get('retried')} "
+                f"rate_limited={st.get('rate_limited')} failed={st.get('failed')}"
+            )
+    flights = final_runtime.get("single_flight", {})
+    if flights:
+        print("  coalesced: " + ", ".join(f"{k}={v.get('coalesced')}" for k, v in flights.items()))
+    if fake_stats:
+        print(f"\nFake OpenAI calls: {fake_stats.get('requests')} ({fake_stats.get('rate_limited')} answered 429)")
+        print("  " + ", ".join(f"{k}={v}" for k, v in sorted(fake_stats.get("by_kind", {}).items())))
+    print("====================================")
+
+
+def main():
+    procs = []
+    base_url = LOAD_URL.rstrip("/")
+    if not base_url:
+        base_url = f"http://127.0.0.1:{LOAD_APP_PORT}"
+        print("Starting fake OpenAI server and backend (offline mode)...")
+        procs = start_stack()
+    try:
+        if procs:
+            wait_until_up(f"http://127.0.0.1:{FAKE_OPENAI_PORT}/stats", procs)
+        wait_until_up(base_url + "/api/health", procs)
+
+        results, elapsed, runtime_samples, final_runtime = asyncio.run(run_load(base_url))
+
+        fake_stats = {}
+        if procs:
+            try:
+                fake_stats = httpx.get(f"http://127.0.0.1:{FAKE_OPENAI_PORT}/stats", timeout=5).json()
+            except httpx.HTTPError:
+                pass
+        print_report(results, elapsed, runtime_samples, final_runtime, fake_stats)
+    finally:
+        stop_stack(procs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+
+import requests
+
+PROFILE_URL = os.getenv("PROFILE_URL", "")  # e.g. http://localhost:8000 ; empty = profile locally
+DATA_PATH = os.getenv("DETECT_DATA_PATH", "detector_data/detector_data.jsonl")
+MAX_ROWS = int(os.getenv("PROFILE_MAX_ROWS", "500"))
+
+
+def fetch_remote(base_url: str) -> dict:
+    r = requests.get(base_url.rstrip("/") + "/api/debug/profile", timeout=10)
+    r.raise_for_status()
+    return r.json()
+
+
+def load_texts():
+    texts = []
+    if os.path.exists(DATA_PATH):
+        with open(DATA_PATH, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    texts.append(str(json.loads(line).get("text", "")))
+                except Exception:
+                    continue
+                if len(texts) >= MAX_ROWS:
+                    break
+    return texts
+
+
+def profile_local() -> dict:
+    from fastapi_gpt5_backend import FEATURE_PROFILER, extract_detector_features_batch
+    from bench_detector_features import build_document
+
+    texts = load_texts()
+    if not texts:
+        print(f"No data at {DATA_PATH}; using synthetic documents.")
+        texts = [build_document(n, seed) for seed in range(5) for n in (150, 600, 2500, 8000)]
+
+    FEATURE_PROFILER.enabled = True
+    FEATURE_PROFILER.reset()
+    extract_detector_features_batch(texts)
+    return FEATURE_PROFILER.report()
+
+
+def print_report(report: dict) -> None:
+    print("====================================")
+    print("Feature extraction profile")
+    print(f"Profiling enabled: {report.get('enabled')} | since: {report.get('since')}")
+    print("====================================")
+
+    buckets = report.get("buckets", {})
+    if not buckets:
+        print("No samples recorded. Enable with FEATURE_PROFILE=1, or with FEATURE_PROFILE_CONTROL=1 and an authenticated POST /api/debug/profile?enabled=true")
+        return
+
+    for bucket, data in buckets.items():
+        print(f"\nchars {bucket}  ({data['docs']} docs)")
+        print(f"{'stage':>12} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>9} {'share':>7}")
+        stages = sorted(data["stages"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+        for stage, st in stages:
+            print(
+                f"{stage:>12} {st['mean_ms']:>9.3f} {st['p50_ms']:>8.2f} {st['p95_ms']:>8.2f} "
+                f"{st['max_ms']:>9.2f} {st['share'] * 100:>6.1f}%"
+            )
+    print("\n====================================")
+
+
+def main():
+    if PROFILE_URL:
+        try:
+            report = fetch_remote(PROFILE_URL)
+        except Exception as e:
+            print(f"Could not fetch profile from {PROFILE_URL}: {e}")
+            sys.exit(1)
+    else:
+        report = profile_local()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
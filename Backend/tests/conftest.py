@@ -0,0 +1,29 @@
+import os
+import sys
+
+import firebase_admin
+import google.auth.credentials
+from firebase_admin import credentials
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend reads its data files relative to Backend/, like the scripts there
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+# No network, no files written outside the test run
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ["CPU_POOL_MODE"] = "inline"
+os.environ["FEATURE_CACHE_SHARED_PATH"] = ""
+os.environ["JUDGE_CACHE_PATH"] = ""
+os.environ["LANG_SIGNALS_DIR"] = ""
+
+
+class _AnonymousCredential(credentials.Base):
+    def get_credential(self):
+        return google.auth.credentials.AnonymousCredentials()
+
+
+# The backend builds its Firestore client at import; give it an app that never authenticates
+if not firebase_admin._apps:
+    firebase_admin.initialize_app(_AnonymousCredential(), {"projectId": "verihuman-tests"})
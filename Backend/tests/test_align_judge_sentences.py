@@ -0,0 +1,65 @@
+from fastapi_gpt5_backend import ALIGN_MAX_SKIP, align_judge_sentences
+
+
+def matches(aligned):
+    return [j for j, _ in aligned]
+
+
+def test_exact_snippets_align_in_order():
+    sentences = ["The cat sat on the mat.", "It was warm outside.", "Nobody minded at all."]
+    aligned = align_judge_sentences(sentences, ["The cat sat on the", "It was warm", "Nobody minded at all"])
+    assert aligned == [(0, 1.0), (1, 1.0), (2, 1.0)]
+
+
+def test_shared_prefix_sentences_each_take_their_own_snippet():
+    sentences = [
+        "The results show a clear rise in demand.",
+        "The results show no change in prices.",
+        "The results show that wages fell slightly.",
+    ]
+    snippets = [
+        "The results show a clear rise in demand",
+        "The results show no change in prices",
+        "The results show that wages fell slightly",
+    ]
+    assert align_judge_sentences(sentences, snippets) == [(0, 1.0), (1, 1.0), (2, 1.0)]
+
+
+def test_alignment_never_reaches_back_to_an_earlier_snippet():
+    # snippets out of document order: the second sentence's snippet was passed already
+    sentences = ["Rain fell all morning.", "By noon the sun came out."]
+    snippets = ["By noon the sun came out", "Rain fell all morning"]
+    assert matches(align_judge_sentences(sentences, snippets)) == [1, None]
+
+
+def test_skipped_snippet_leaves_the_sentence_unmatched():
+    sentences = ["First we packed the car.", "Then we drove north.", "Later it snowed.", "We stayed inside."]
+    snippets = ["First we packed the car", "Later it snowed", "We stayed inside"]
+    aligned = align_judge_sentences(sentences, snippets)
+    assert aligned == [(0, 1.0), (None, 0.0), (1, 1.0), (2, 1.0)]
+
+
+def test_snippets_without_a_sentence_are_skipped_over():
+    sentences = ["Prices rose again in May.", "Shoppers cut back on meat."]
+    snippets = ["Prices rose again in May", "An invented line from the judge", "Shoppers cut back on meat"]
+    assert matches(align_judge_sentences(sentences, snippets)) == [0, 2]
+
+
+def test_partial_agreement_reports_its_confidence():
+    aligned = align_judge_sentences(["We went to the old harbour today."], ["We went to the new harbour"])
+    assert aligned == [(0, round(4 / 6, 4))]
+
+
+def test_low_agreement_is_dropped():
+    aligned = align_judge_sentences(["We went home."], ["We went to a concert with friends last night"])
+    assert aligned == [(None, 0.0)]
+
+
+def test_far_jump_needs_a_full_long_match():
+    filler = [f"Filler snippet number {i} here" for i in range(ALIGN_MAX_SKIP + 2)]
+    # a stray prefix collision far ahead does not derail the alignment
+    stray = align_judge_sentences(["It was late and cold outside."], filler + ["It was late that night"])
+    assert stray == [(None, 0.0)]
+    # a snippet agreeing word for word over enough words may jump
+    jump = align_judge_sentences(["It was late and cold outside."], filler + ["It was late and cold outside"])
+    assert jump == [(len(filler), 1.0)]
@@ -0,0 +1,124 @@
+import random
+import re
+
+import pytest
+
+import fastapi_gpt5_backend as backend
+from fastapi_gpt5_backend import finish_humanized_text
+
+
+# ---- The local tail as it was before HumanizerRewrite (reference only) ----
+
+def _reference_contractions(text):
+    for pattern, repl in backend.CONTRACTION_MAP.items():
+        text = re.sub(pattern, repl, text, flags=re.IGNORECASE)
+    return text
+
+
+def _reference_postprocessing(text):
+    if (
+        backend._BULLET_LINE_RE.search(text)
+        or backend._NUMBERED_LINE_RE.search(text)
+        or backend._HEADING_LINE_RE.search(text)
+    ):
+        return text
+
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    if len(sentences) < 2:
+        return text
+
+    words_list = text.split()
+    n_words_local = max(len(words_list), 1)
+    sents_local = re.split(r'(?<=[.!?])\s+', text.strip())
+    sent_lens_local = [len(s.split()) for s in sents_local] if sents_local else [n_words_local]
+    avg_len_local = sum(sent_lens_local) / max(len(sent_lens_local), 1)
+    std_len_local = (sum((x - avg_len_local)**2 for x in sent_lens_local) / max(len(sent_lens_local), 1)) ** 0.5
+    features = {
+        "burstiness": std_len_local / (avg_len_local + 1e-6),
+        "avg_sent_len": avg_len_local,
+        "avg_adj_overlap": 0.3,
+        "contraction_ratio": sum(1 for w in words_list if "'" in w) / n_words_local,
+        "complete_sent_ratio": sum(1 for s in sents_local if s.strip().endswith((".", "?", "!"))) / max(len(sents_local), 1),
+    }
+
+    if features["burstiness"] < 0.45:
+        i = random.randint(0, len(sentences) - 2)
+        sentences[i] = sentences[i].rstrip(".") + " " + sentences[i + 1].lower()
+        del sentences[i + 1]
+
+    i = 0
+    while i < len(sentences):
+        words = sentences[i].split()
+        if (len(words) > 20 or features["avg_sent_len"] > 18) and random.random() < 0.6:
+            split_point = random.randint(len(words)//3, 2*len(words)//3)
+            sentences[i] = " ".join(words[:split_point]).strip() + "."
+            sentences.insert(i + 1, " ".join(words[split_point:]).strip())
+            i += 1
+        i += 1
+
+    drift_phrases = [
+        "Or at least, that's the idea.",
+        "Now that I think about it.",
+        "It's not always that simple though.",
+        "Which is interesting, actually.",
+        "Maybe that's just one way to see it."
+    ]
+    if features["avg_adj_overlap"] > 0.5 or random.random() < 0.15:
+        i = random.randint(0, len(sentences) - 1)
+        sentences[i] = sentences[i].rstrip(".") + ". " + random.choice(drift_phrases)
+
+    inserts = ["Honestly,", "In a way,", "Come to think of it,", "Well,", "At least sometimes,"]
+    if features["contraction_ratio"] < 0.03 or random.random() < 0.3:
+        i = random.randint(0, len(sentences) - 1)
+        sentences[i] = random.choice(inserts) + " " + sentences[i].lstrip()
+
+    if features["complete_sent_ratio"] > 0.95 and random.random() < 0.4:
+        i = random.randint(0, len(sentences) - 1)
+        words = sentences[i].split()
+        if len(words) > 7:
+            sentences[i] = " ".join(words[:random.randint(3, 6)]) + "..."
+
+    return " ".join(sentences)
+
+
+def _reference_punctuation(text):
+    text = re.sub(r"\s*—\s*", ", ", text)
+    text = re.sub(r"\s*–\s*", ", ", text)
+    text = re.sub(r",\s*,", ",", text)
+    return text.strip()
+
+
+def _reference_finish(text):
+    text = _reference_postprocessing(text)
+    if backend.looks_ai_like(backend.extract_detector_features(text, features=backend.LOOKS_AI_FEATURES)):
+        text = _reference_postprocessing(text)
+    return _reference_punctuation(_reference_contractions(text))
+
+
+TEXTS = [
+    "It is important to note that technology plays a crucial role in today's world. "
+    "Furthermore, it is essential to consider the implications. Moreover, we do not know the outcome. "
+    "It is clear that further research is needed.",
+    "I remember my grandmother's kitchen. It smelled like burnt sugar! We laughed for hours, "
+    "and I can not forget it. Why would anyone leave a place like that?",
+    "The committee reviewed the proposal in detail over several long meetings held throughout the spring "
+    "and summer months, and it concluded that the budget was not sufficient for the planned expansion of services. "
+    "They are going to revisit it. It will not be easy.",
+    "The data is clear — the trend is real – and we are not done. The data is clear. The data is clear.",
+    "- first item\n- second item\nIt is a list. It does not change.",
+    "One sentence only, with no break at all",
+    "Short. Shorter. It is what it is. Why? Because we are tired. Still, we do not stop.",
+]
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("text", TEXTS)
+def test_finish_matches_the_reference_engine(text, seed):
+    random.seed(seed)
+    expected = _reference_finish(text)
+    expected_state = random.getstate()
+
+    random.seed(seed)
+    assert finish_humanized_text(text) == expected
+    # same random draws, so later passes see the same sequence
+    assert random.getstate() == expected_state
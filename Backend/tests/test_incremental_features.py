@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+import fastapi_gpt5_backend as backend
+from fastapi_gpt5_backend import (
+    INCREMENTAL_FEATURES,
+    HumanizerRewrite,
+    IncrementalFeatures,
+    SentenceEdit,
+    extract_detector_features,
+)
+
+WORDS = ["It's", "the", "data", "we", "don't", "a", "results", "analysis", "x", "and", "word", "Why", "end",
+         "can't", "2024", "I", "Mr", "honestly", "—", "really"]
+SEPARATORS = [" ", " ", "  ", "\n", "\n\n", " \n "]
+
+
+def random_sentence(rng):
+    s = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 14)))
+    if rng.random() < 0.3:
+        s = s.replace(" ", ", ", 1)
+    return (s or rng.choice(WORDS)) + rng.choice(".!?.")
+
+
+def random_text(rng, n):
+    return "".join(random_sentence(rng) + (rng.choice(SEPARATORS) if i < n - 1 else "") for i in range(n))
+
+
+def random_edit(rng, n):
+    k = rng.random()
+    if n == 0 or k < 0.2:
+        return SentenceEdit.insert(rng.randint(0, n), random_sentence(rng))
+    if k < 0.45:
+        return SentenceEdit.replace(rng.randrange(n), random_sentence(rng))
+    if k < 0.6:
+        return SentenceEdit.delete(rng.randrange(n))
+    if k < 0.8 and n >= 2:
+        return SentenceEdit.merge(rng.randrange(n - 1), random_sentence(rng))
+    return SentenceEdit.split(rng.randrange(n), random_sentence(rng), random_sentence(rng))
+
+
+def assert_matches_extractor(stats, text):
+    expected = extract_detector_features(text, features=INCREMENTAL_FEATURES)
+    for name in INCREMENTAL_FEATURES:
+        # the extractor's rows are float32
+        assert stats[name] == pytest.approx(expected.get(name, 0.0), rel=1e-5, abs=1e-6), name
+
+
+@pytest.fixture
+def recounts(monkeypatch):
+    calls = []
+    recount = IncrementalFeatures._recount
+
+    def counting(self):
+        calls.append(len(self.units))
+        recount(self)
+
+    monkeypatch.setattr(IncrementalFeatures, "_recount", counting)
+    return calls
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_from_text_matches_extractor(seed):
+    rng = random.Random(seed)
+    for n in (0, 1, 2, 7, 25):
+        text = random_text(rng, n)
+        assert_matches_extractor(IncrementalFeatures.from_text(text).features(), text)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sparse_edits_update_in_place(seed, recounts):
+    rng = random.Random(seed)
+    state = IncrementalFeatures.from_text(random_text(rng, 30))
+    recounts.clear()
+    for _ in range(20):
+        state.apply([random_edit(rng, len(state))])
+        assert_matches_extractor(state.features(), state.text())
+    assert recounts == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_dense_edits_recount(seed, recounts):
+    rng = random.Random(100 + seed)
+    state = IncrementalFeatures.from_text(random_text(rng, 6))
+    recounts.clear()
+    for _ in range(10):
+        edits = []
+        for _ in range(3):
+            n = len(state) + sum(len(e.sentences) - (e.end - e.start) for e in edits)
+            edits.append(random_edit(rng, n))
+        state.apply(edits)
+        assert_matches_extractor(state.features(), state.text())
+    assert len(recounts) == 10
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_separator_changes(seed):
+    rng = random.Random(200 + seed)
+    state = IncrementalFeatures.from_text(random_text(rng, 12))
+    state.set_separator(3, "\n\n").set_separator(0, "  ")
+    assert_matches_extractor(state.features(), state.text())
+    state.set_separators(" ")
+    assert_matches_extractor(state.features(), state.text())
+
+
+@pytest.mark.parametrize("text", [
+    "It is a test of things. We are here now! Really, truly?",
+    # last sentence without . ! or ?: the line merges into it
+    "It is a test of things. We are here now. And then the rewrite just stops",
+    "It is a test of things. We are here now. Trailing space after it. ",
+    "One sentence only.",
+    "",
+])
+@pytest.mark.parametrize("line", ["Anyway, that's how it went.", "Short one. And another!"])
+def test_entropy_line_state_matches_text(text, line, monkeypatch):
+    features = IncrementalFeatures.from_text(text)
+    combined, features = backend._append_entropy_line(text, features, line)
+    assert combined == text + "\n\n" + line
+
+    doc = HumanizerRewrite(combined, features)
+    assert len(features) == len(doc.sentences)
+    assert_matches_extractor(doc.stats(), doc.text())
+
+    random.seed(7)
+    doc.postprocess()
+    assert_matches_extractor(doc.stats(), doc.text())
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+import fastapi_gpt5_backend as backend
+from fastapi_gpt5_backend import (
+    LANG_ID_OVERRIDE_CONFIDENCE,
+    LANG_ID_OVERRIDE_MIN_LETTERS,
+    LANGUAGE_ID,
+    detect_language_and_translate_signals,
+)
+
+# short English dominated by names and loanwords, which the trigram
+# profiles alone take for Italian, Indonesian, German, ...
+NAME_HEAVY_ENGLISH = [
+    "Tesla, Nvidia, Apple, Samsung: stocks rose 3% on Monday.",
+    "Pizza, pasta, salsa, tortilla, and burrito are popular foods.",
+    "Los Angeles, San Francisco, San Diego, Santa Barbara and Sacramento are cities in California.",
+    "Maria Rossi, Giovanni Bianchi and Luca Ferrari met Ana Souza in Milano and Roma.",
+    "Jakarta, Bandung, Surabaya and Medan are big; Kenya, Tanzania and Uganda border Lake Victoria.",
+    "Volkswagen, Siemens, Bosch and Adidas reported results from Munich, Stuttgart and Berlin yesterday.",
+    "Order: margherita pizza, penne arrabbiata, tiramisu, espresso, panna cotta, bruschetta, "
+    "calamari fritti, gelato al pistacchio, limoncello and focaccia for the table.",
+    "Hakuna Matata, Simba, Nala, Mufasa, Rafiki, Pumbaa, Timon and Zazu are characters; Jambo, "
+    "Asante sana, Karibu and Safari are words visitors to Kenya and Tanzania learn.",
+]
+
+# ASCII-only text in other languages, long enough for the identifier to overrule the ASCII check
+ASCII_NON_ENGLISH = {
+    "it": "Il governo ha approvato la nuova legge sul lavoro dopo una lunga discussione in parlamento, "
+    "e i sindacati hanno chiesto un incontro urgente con il ministro per parlare delle pensioni e dei salari.",
+    "id": "Pemerintah mengumumkan bahwa harga bahan bakar akan naik bulan depan, dan banyak warga khawatir "
+    "tentang biaya hidup yang terus meningkat di kota besar seperti Jakarta dan Surabaya.",
+    "sw": "Serikali imetangaza kwamba bei ya mafuta itapanda mwezi ujao, na wananchi wengi wana wasiwasi "
+    "kuhusu gharama ya maisha inayoendelea kuongezeka katika miji mikubwa.",
+}
+
+
+@pytest.mark.parametrize("text", NAME_HEAVY_ENGLISH)
+def test_name_heavy_english_stays_english(text, monkeypatch):
+    async def no_gpt(text):
+        raise AssertionError("GPT language detection should not be needed")
+
+    monkeypatch.setattr(backend, "_fallback_identify_language", no_gpt)
+    signals = asyncio.run(detect_language_and_translate_signals(text))
+    assert signals["is_english"] is True
+    assert signals["code"] == "en"
+
+
+@pytest.mark.parametrize("code,text", sorted(ASCII_NON_ENGLISH.items()))
+def test_identifier_overrides_ascii_check_for_long_text(code, text):
+    assert sum(1 for c in text if c.isalpha()) >= LANG_ID_OVERRIDE_MIN_LETTERS
+    found, confidence = LANGUAGE_ID.identify(text)
+    assert found == code
+    assert confidence >= LANG_ID_OVERRIDE_CONFIDENCE
@@ -0,0 +1,61 @@
+import pytest
+
+import fastapi_gpt5_backend as backend
+from fastapi_gpt5_backend import ParsedDocument, count_syllables, readability_scores
+
+SAMPLES = [
+    "The cat sat on the mat. It was a sunny day, and the children played outside until dinner.",
+    "Photosynthesis converts light energy into chemical energy, which plants store as glucose for later use.",
+    "I went home. Then I slept. Honestly, it was the best decision I made all week, and I would do it again.",
+    "Municipal infrastructure investment requires considerable administrative coordination between "
+    "regional authorities and national agencies.",
+    "We are not sure; they are, however, confident about the timeline.",
+    "Go. Now! Why would anyone design a system that way? Nobody knows, but the team shipped it anyway "
+    "and moved on to the next project.",
+]
+
+# (Flesch-Kincaid grade, Flesch reading ease) of each sample with the built-in syllable counter
+EXPECTED_SCORES = [
+    (3.3, 87.72),
+    (12.7, 30.87),
+    (1.4, 97.91),
+    (28.4, -85.55),
+    (7.6, 60.31),
+    (4.6, 84.17),
+]
+
+# dictionary syllable counts, including the silent -e / -ed / -es cases
+SYLLABLES = {
+    "make": 1, "whale": 1, "table": 2, "free": 1, "little": 2, "people": 2, "simple": 2,
+    "jumped": 1, "wanted": 2, "needed": 2, "makes": 1, "boxes": 2, "wishes": 2, "places": 2,
+    "computer": 3, "banana": 3, "beautiful": 3, "education": 4, "about": 2, "city": 2,
+    "don't": 1, "2024": 1,
+}
+
+
+def scores(text):
+    doc = ParsedDocument(text)
+    return readability_scores(doc.words, doc.sentence_word_counts())
+
+
+@pytest.mark.parametrize("word,expected", sorted(SYLLABLES.items()))
+def test_count_syllables(word, expected):
+    assert count_syllables(word) == expected
+
+
+@pytest.mark.parametrize("text,expected", list(zip(SAMPLES, EXPECTED_SCORES)))
+def test_readability_scores_are_stable(text, expected):
+    fk, flesch = scores(text)
+    assert fk == pytest.approx(expected[0], abs=0.05)
+    assert flesch == pytest.approx(expected[1], abs=0.005)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_formulas_match_textstat(text, monkeypatch):
+    # syllables aside (textstat counts pyphen hyphenation points), the
+    # sentence filtering, formulas and rounding are textstat's exactly
+    textstat = pytest.importorskip("textstat")
+    monkeypatch.setattr(backend, "count_syllables", textstat.syllable_count)
+    fk, flesch = scores(text)
+    assert fk == pytest.approx(textstat.flesch_kincaid_grade(text), abs=1e-9)
+    assert flesch == pytest.approx(textstat.flesch_reading_ease(text), abs=1e-9)
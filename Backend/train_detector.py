@@ -7,7 +7,7 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, classification_report
 
-from fastapi_gpt5_backend import extract_detector_features
+from fastapi_gpt5_backend import DETECTOR_FEATURE_NAMES, extract_detector_features_batch
 
 DATA_PATH = os.getenv("DETECT_DATA_PATH", "detector_data/detector_data.jsonl")
 OUT_DIR = os.getenv("DETECT_OUT_DIR", "detector_artifacts")
@@ -148,13 +148,8 @@ def main():
     os.makedirs(OUT_DIR, exist_ok=True)
 
     print("Extracting features...")
-    feat_dicts = [extract_detector_features(t) for t in texts]
-    feature_order = sorted(feat_dicts[0].keys())
-
-    X = np.array(
-        [[fd.get(k, 0.0) for k in feature_order] for fd in feat_dicts],
-        dtype=np.float32
-    )
+    feature_order = list(DETECTOR_FEATURE_NAMES)
+    X = extract_detector_features_batch(texts, feature_order)
     y = labels
 
     test_size = choose_test_size(len(y))